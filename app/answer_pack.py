@@ -0,0 +1,92 @@
+# app/answer_pack.py
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACK_PATH = os.getenv("ANSWER_PACK_PATH", os.path.join(BASE_DIR, "data", "answer_pack.json"))
+
+FORMAT_VERSION = 1
+
+
+class AnswerPack:
+    """
+    Precomputed LLM answers (see scripts/precompute_answers.py), keyed
+    like the response cache (make_cache_key) and tied to the dataset
+    fingerprint they were generated from. Only the answer text is kept
+    in memory; the request metadata stays in the file.
+    """
+
+    def __init__(
+        self,
+        answers: Optional[Dict[str, str]] = None,
+        fingerprint: str = "",
+        version: int = 0,
+        created: Optional[float] = None,
+        path: Optional[str] = None,
+    ):
+        self.answers = answers or {}
+        self.fingerprint = fingerprint
+        self.version = version
+        self.created = created
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str = PACK_PATH) -> "AnswerPack":
+        """Read a pack; a missing, unreadable or foreign-format file gives an empty one."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") != FORMAT_VERSION:
+                return cls(path=path)
+            answers = {key: entry["content"] for key, entry in data.get("entries", {}).items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return cls(path=path)
+        return cls(answers, data.get("dataset_fingerprint", ""), data.get("version", 0), data.get("created"), path)
+
+    def get(self, key: str, fingerprint: str) -> Optional[str]:
+        """The precomputed answer for `key`, if the pack matches the current dataset."""
+        if not self.answers or fingerprint != self.fingerprint:
+            return None
+        return self.answers.get(key)
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "version": self.version,
+            "dataset_fingerprint": self.fingerprint,
+            "created": self.created,
+            "answers": len(self.answers),
+        }
+
+
+def read_entries(path: str = PACK_PATH) -> Dict[str, Any]:
+    """Raw pack file contents ({} if missing or unreadable)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def write_pack(entries: Dict[str, Dict[str, Any]], fingerprint: str, version: int, path: str = PACK_PATH) -> None:
+    """
+    Atomically write a pack. `entries` maps cache keys to
+    {"template", "payload", "model", "max_tokens", "content"}.
+    """
+    data = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "dataset_fingerprint": fingerprint,
+        "created": time.time(),
+        "entries": entries,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
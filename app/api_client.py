@@ -0,0 +1,82 @@
+# app/api_client.py
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import requests
+
+from conversation import RECENT_TURNS
+
+# base URL of a running api_server.py; empty: main.py calls backend in-process
+API_URL = os.getenv("CHATBOT_API_URL", "").rstrip("/")
+API_TIMEOUT = float(os.getenv("CHATBOT_API_TIMEOUT", "60"))
+
+
+class ApiError(RuntimeError):
+    pass
+
+
+class ApiClient:
+    """Thin client for api_server.py (one pooled HTTP session)."""
+
+    def __init__(self, base_url: str = API_URL, timeout: float = API_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _post(self, path: str, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        resp = self.session.post(self.base_url + path, json=payload, timeout=self.timeout, stream=stream)
+        if resp.status_code != 200:
+            try:
+                error = resp.json().get("error")
+            except ValueError:
+                error = resp.text[:200]
+            raise ApiError(f"{path}: HTTP {resp.status_code}: {error}")
+        return resp
+
+    def ready(self) -> bool:
+        try:
+            return self.session.get(self.base_url + "/readyz", timeout=5).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def llm_status(self) -> Dict[str, Any]:
+        """The server's circuit breaker state (see backend.llm_status), or {"state": "unreachable"}."""
+        try:
+            return self.session.get(self.base_url + "/healthz", timeout=5).json().get("llm") or {}
+        except (requests.RequestException, ValueError):
+            return {"state": "unreachable"}
+
+    def classify(self, messages: Sequence[str]) -> List[Dict[str, Any]]:
+        return self._post("/v1/intent", {"messages": list(messages)}).json()["results"]
+
+    def role(self, name: str) -> Optional[Dict[str, Any]]:
+        resp = self.session.get(f"{self.base_url}/v1/roles/{requests.utils.quote(name, safe='')}", timeout=self.timeout)
+        return resp.json() if resp.status_code == 200 else None
+
+    def chat(self, message: str, history: Sequence[Dict[str, str]] = ()) -> Dict[str, Any]:
+        return self._post("/v1/chat", {"message": message, "history": _history(history)}).json()
+
+    def stream_chat(
+        self, message: str, history: Sequence[Dict[str, str]] = (), meta: Optional[Dict[str, Any]] = None
+    ) -> Iterator[str]:
+        """
+        Reply text chunks as the server streams them (same text as
+        chat()["reply"]). The final event (intent, role, llm status) goes
+        to `meta`.
+        """
+        payload = {"message": message, "history": _history(history), "stream": True}
+        with self._post("/v1/chat", payload, stream=True) as resp:
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "delta" in event:
+                    yield event["delta"]
+                elif event.get("done") and meta is not None:
+                    meta.update(event)
+
+
+def _history(messages: Sequence[Dict[str, str]]) -> List[Dict[str, str]]:
+    # the server only replays the last few turns
+    return [{"role": m.get("role", ""), "content": m.get("content", "")} for m in list(messages)[-2 * RECENT_TURNS:]]
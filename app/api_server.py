@@ -0,0 +1,373 @@
+# app/api_server.py
+#
+# The backend as a local HTTP API, for other services and (optionally)
+# the Streamlit UI (CHATBOT_API_URL, see api_client.py):
+#
+#     python app/api_server.py --port 8000 --workers 4
+#
+#     GET  /healthz            process is up (+ this worker's OpenRouter circuit breaker state)
+#     GET  /readyz             dataset loaded and not shutting down (503 otherwise)
+#     GET  /v1/roles           role names
+#     GET  /v1/roles/<role>    skills / roadmap / projects (name, alias or free text)
+#     POST /v1/intent          {"message": ...} or {"messages": [...]} -> intent + role per message
+#     POST /v1/chat            {"message": ..., "history": [...], "stream": false}
+#
+# The dataset, indexes and semantic model are loaded once in the parent
+# and the listening socket is bound there; workers are forked from it, so
+# they share those pages copy-on-write and the kernel spreads connections
+# across them. A worker that dies is replaced. SIGTERM / Ctrl-C stop
+# accepting, let in-flight requests finish (up to --grace seconds) and exit.
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote, urlsplit
+
+import backend
+import metrics
+from conversation import RECENT_TURNS, ConversationState
+
+API_HOST = os.getenv("CHATBOT_API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("CHATBOT_API_PORT", "8000"))
+API_WORKERS = int(os.getenv("CHATBOT_API_WORKERS", "0"))      # 0: one per CPU
+SHUTDOWN_GRACE = float(os.getenv("CHATBOT_API_GRACE", "20"))  # seconds for in-flight requests
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_BATCH = 256          # messages per /v1/intent request
+MAX_HISTORY = 2 * RECENT_TURNS
+
+log = logging.getLogger(__name__)
+
+
+# ---------------------------------------
+# Request handling
+# ---------------------------------------
+def classify(messages: List[str]) -> List[Dict[str, Any]]:
+    """Intent and roles per message; duplicates in a batch are analysed once."""
+    snapshot = backend.current_snapshot()
+    seen: Dict[str, Dict[str, Any]] = {}
+    for message in messages:
+        if message not in seen:
+            analysis = snapshot.analyze(message.strip())
+            seen[message] = {
+                "intent": analysis.intent,
+                "role": analysis.role,
+                "roles": list(analysis.roles),
+                "wants_expansion": analysis.wants_expansion,
+            }
+    return [seen[m] for m in messages]
+
+def lookup_role(name: str) -> Optional[str]:
+    role_data = backend.current_snapshot().role_data
+    if name in role_data:
+        return name
+    lowered = name.strip().lower()
+    for role in role_data.keys():
+        if role.lower() == lowered:
+            return role
+    return backend.extract_role_from_text(name)
+
+def replay(history: List[Dict[str, Any]]) -> ConversationState:
+    """
+    Rebuild the conversation state from the client's last turns, so any
+    worker can answer a follow-up without sticky sessions.
+    """
+    state = ConversationState()
+    turns = [m for m in history[-MAX_HISTORY:] if isinstance(m, dict) and isinstance(m.get("content"), str)]
+    for prev, msg in zip(turns, turns[1:]):
+        if prev.get("role") == "user" and msg.get("role") == "assistant":
+            question = prev["content"]
+            plan = backend.plan_response(question, backend.get_intent(question), state)
+            state.record(question, msg["content"], plan)
+    return state
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "ApiServer"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    # -- plumbing ------------------------------------------------------
+    def _send(self, status: int, body: bytes, ctype: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        if self.server.draining:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+        self._status = status
+
+    def _json(self, status: int, payload: Dict[str, Any]) -> None:
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+    def _error(self, status: int, error: str, code: str) -> None:
+        self._json(status, {"ok": False, "error": error, "code": code})
+
+    def _body(self) -> Optional[Dict[str, Any]]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._error(413, f"body larger than {MAX_BODY_BYTES} bytes", "too_large")
+            return None
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            self._error(400, "body must be a JSON object", "bad_request")
+            return None
+        return body
+
+    def _dispatch(self, endpoint: str, fn) -> None:
+        self._status = 500
+        started = time.perf_counter()
+        with self.server.in_flight():
+            try:
+                fn()
+            except ConnectionError:
+                raise
+            except Exception as e:
+                log.exception("%s failed", endpoint)
+                self._error(500, str(e), "internal")
+        metrics.observe("stage_seconds", time.perf_counter() - started, stage=f"api_{endpoint}")
+        metrics.inc("api_requests_total", endpoint=endpoint, status=self._status)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/healthz":
+            self._json(200, {"ok": True, "pid": os.getpid(), "llm": backend.llm_status()})
+        elif path == "/readyz":
+            ready = not self.server.draining
+            self._json(200 if ready else 503, {"ok": ready, "pid": os.getpid(), "data_version": backend.data_version()})
+        elif path == "/v1/roles":
+            self._dispatch("roles", lambda: self._json(200, {"ok": True, "roles": list(backend.current_snapshot().role_data.keys())}))
+        elif path.startswith("/v1/roles/"):
+            self._dispatch("role", lambda: self._role(unquote(path[len("/v1/roles/"):])))
+        else:
+            self._error(404, "not found", "not_found")
+
+    def do_POST(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        routes = {"/v1/intent": ("intent", self._intent), "/v1/chat": ("chat", self._chat)}
+        if path not in routes:
+            self._error(404, "not found", "not_found")
+            return
+        body = self._body()
+        if body is not None:
+            endpoint, fn = routes[path]
+            self._dispatch(endpoint, lambda: fn(body))
+
+    # -- endpoints -----------------------------------------------------
+    def _role(self, name: str) -> None:
+        role = lookup_role(name)
+        if role is None:
+            self._error(404, f"unknown role: {name}", "unknown_role")
+            return
+        record = backend.current_snapshot().role_data[role]
+        self._json(200, {
+            "ok": True,
+            "role": role,
+            "skills": list(record["skills"]),
+            "roadmap": list(record["roadmap"]),
+            "projects": list(record["projects"]),
+        })
+
+    def _intent(self, body: Dict[str, Any]) -> None:
+        single = "messages" not in body
+        messages = [body.get("message")] if single else body.get("messages")
+        if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+            self._error(400, "'message' must be a string or 'messages' a list of strings", "bad_request")
+            return
+        if len(messages) > MAX_BATCH:
+            self._error(413, f"at most {MAX_BATCH} messages per request", "too_large")
+            return
+        with metrics.span("intent"):
+            results = classify(messages)
+        self._json(200, dict(results[0], ok=True) if single else {"ok": True, "results": results})
+
+    def _chat(self, body: Dict[str, Any]) -> None:
+        message = body.get("message")
+        history = body.get("history") or []
+        if not isinstance(message, str) or not message.strip() or not isinstance(history, list):
+            self._error(400, "'message' must be a non-empty string and 'history' a list", "bad_request")
+            return
+        state = replay(history)
+        intent = backend.get_intent(message)
+        if body.get("stream"):
+            self._stream_chat(message, intent, state)
+            return
+        reply = backend.get_response(message, intent, state) or ""
+        self._json(200, {"ok": True, "reply": reply, "intent": state.last_intent, "role": state.last_role})
+
+    def _stream_chat(self, message: str, intent: str, state: ConversationState) -> None:
+        """NDJSON over chunked encoding: {"delta": ...} lines, then {"done": true, ...}."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        if self.server.draining:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self._status = 200
+
+        def write(payload: Optional[Dict[str, Any]]) -> None:
+            data = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        stream = backend.stream_response(message, intent, state)
+        try:
+            for chunk in stream:
+                write({"delta": chunk})
+        finally:
+            # a client that hung up closes the upstream LLM stream too
+            stream.close()
+        write({"done": True, "intent": state.last_intent, "role": state.last_role, "llm": backend.llm_status()})
+        write(None)
+
+    def log_message(self, *args):
+        pass
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True   # idle keep-alive connections must not block exit
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address):
+        super().__init__(address, _Handler)
+        # shared by every worker: a worker that loses the race for a
+        # connection must get EAGAIN, not block in accept()
+        self.socket.setblocking(False)
+        self.draining = False
+        self._active = 0
+        self._idle = threading.Condition()
+
+    @contextmanager
+    def in_flight(self):
+        with self._idle:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def drain(self, grace: float) -> bool:
+        """Wait (up to `grace` seconds) for in-flight requests; False on timeout."""
+        deadline = time.monotonic() + grace
+        with self._idle:
+            while self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def handle_error(self, request, client_address):
+        # clients hanging up mid-stream are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+# ---------------------------------------
+# Workers
+# ---------------------------------------
+def _run_worker(server: ApiServer, grace: float) -> None:
+    def stop(signum, frame):
+        server.draining = True
+        # shutdown() waits for serve_forever, which runs in this very thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    backend.start_watcher()
+    # this worker's own cache connection and HTTP pool, off the request path
+    backend.start_warm_up()
+    server.serve_forever()
+    if not server.drain(grace):
+        log.warning("worker %d: exiting with requests still in flight", os.getpid())
+
+def serve(host: str = API_HOST, port: int = API_PORT, workers: int = API_WORKERS, grace: float = SHUTDOWN_GRACE) -> None:
+    server = ApiServer((host, port))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or not hasattr(os, "fork"):
+        _run_worker(server, grace)
+        server.server_close()
+        return
+
+    # dataset and semantic index built once here and shared copy-on-write;
+    # nothing that holds a socket, an SQLite connection or a thread yet
+    if backend.WARM_UP:
+        log.info("warm-up before fork: %s", backend.warm_up(process_local=False))
+    # fork before any thread exists (watcher, LLM scheduler, router pool)
+    children = set()
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(server, grace)
+            except BaseException:
+                log.exception("worker %d crashed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            log.warning("worker %d exited (status %d), starting a new one", pid, status)
+            time.sleep(0.5)   # no hot loop if workers die at startup
+            spawn()
+    server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Career chatbot HTTP API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="worker processes (0: one per CPU)")
+    parser.add_argument("--grace", type=float, default=SHUTDOWN_GRACE, help="seconds to finish in-flight requests on shutdown")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    print(f"career chatbot API on http://{args.host}:{args.port} ({args.workers or os.cpu_count()} workers)", flush=True)
+    serve(args.host, args.port, args.workers, args.grace)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
+import difflib
 import json
+import logging
 import os
 import re
-from typing import Optional
+import threading
+import time
+from functools import lru_cache, partial
+from typing import Dict, Iterator, List, NamedTuple, Optional
 
 # Import LLM caller you implemented
-from llm import call_openrouter_chat
+from llm import call_openrouter_chat, call_openrouter_chat_async, stream_openrouter_chat, get_breaker, DEFAULT_MODEL, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+from model_router import get_router
+from sanitizer import get_sanitizer
+from cache import ResponseCache, make_cache_key
+from phrase_matcher import PhraseMatcher, expand_keyword_pattern
+from role_index import RoleIndex, RoleMatch, RoleTag
+from knowledge_store import load_store, source_files, stat_signature
+from answer_pack import AnswerPack, PACK_PATH
+from prefetch import PREFETCH_QUEUE_BUDGET, get_prefetcher
+from token_budget import OUTPUT_CHAR_LIMIT, estimate_messages, get_token_budget
+import metrics
 
 # ---------------------------------------
 # Load role → skills → roadmap → projects
@@ -12,36 +27,76 @@ from llm import call_openrouter_chat
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(BASE_DIR, "data", "role_skill_map.json")
 
-with open(DATA_PATH, "r", encoding="utf-8") as f:
-    ROLE_DATA = json.load(f)
+# Compiled, memory-mapped and read-only; recompiled when the JSON (or
+# data/raw/) changes. Same role_data[role]["skills"] API as the dict.
+# Nothing is loaded at import: the dataset and everything derived from it
+# are built on first use (current_snapshot(), see "Hot reload" below),
+# or ahead of time by warm_up(). ROLE_DATA, MESSAGE_MATCHER, ROLE_INDEX
+# and SEMANTIC_INDEX resolve to the current snapshot's (module __getattr__).
+_INIT_LOCK = threading.Lock()
+
+def __getattr__(name: str):
+    if name == "ROLE_DATA":
+        return current_snapshot().role_data
+    if name == "MESSAGE_MATCHER":
+        return current_snapshot().matcher
+    if name == "ROLE_INDEX":
+        return current_snapshot().role_index
+    if name == "SEMANTIC_INDEX":
+        return current_snapshot().semantic_index
+    if name == "SKILL_INDEX":
+        return current_snapshot().skill_index
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ---------------------------------------
-# SANITIZATION FUNCTION (NEW)
+# LLM answer cache (namespaced by dataset content)
 # ---------------------------------------
-def clean_llm_text(text: str) -> str:
+LLM_CACHE: Optional[ResponseCache] = None   # opened by get_llm_cache()
+
+def get_llm_cache() -> ResponseCache:
+    global LLM_CACHE
+    if LLM_CACHE is None:
+        fingerprint = current_snapshot().fingerprint
+        with _INIT_LOCK:
+            if LLM_CACHE is None:
+                LLM_CACHE = ResponseCache(namespace=fingerprint)
+    return LLM_CACHE
+
+def refresh_cache_namespace() -> None:
     """
-    Removes instruction tokens and unwanted artifacts
-    returned by some OpenRouter providers.
-    """
-    if not text:
-        return text
-
-    patterns = [
-        r"<s>", r"</s>",
-        r"\[INST\]", r"\[/INST\]",
-        r"\[B_INST\]", r"\[/B_INST\]",
-        r"<<SYS>>", r"<</SYS>>",
-        r"<\|im_start\|>", r"<\|im_end\|>",
-        r"<\|assistant\|>", r"<\|user\|>",
-        r"</?think>", r"</?think_detail>"
-    ]
+    Re-check the dataset; if its content changed, it is reloaded and
+    every cached answer generated from the old dataset is dropped.
+    """
+    reload_data()
 
-    cleaned = text
-    for pat in patterns:
-        cleaned = re.sub(pat, "", cleaned, flags=re.IGNORECASE)
+# ---------------------------------------
+# Precomputed answers (scripts/precompute_answers.py)
+# ---------------------------------------
+ANSWER_PACK: Optional[AnswerPack] = None   # loaded by get_answer_pack()
 
-    cleaned = cleaned.strip()
-    return cleaned
+def get_answer_pack() -> AnswerPack:
+    global ANSWER_PACK
+    if ANSWER_PACK is None:
+        with _INIT_LOCK:
+            if ANSWER_PACK is None:
+                ANSWER_PACK = AnswerPack.load(PACK_PATH)
+    return ANSWER_PACK
+
+def reload_answer_pack() -> AnswerPack:
+    global ANSWER_PACK
+    ANSWER_PACK = AnswerPack.load(PACK_PATH)
+    return ANSWER_PACK
+
+# ---------------------------------------
+# SANITIZATION FUNCTION (NEW)
+# ---------------------------------------
+def clean_llm_text(text: str, model: Optional[str] = None) -> str:
+    """
+    Removes instruction tokens and unwanted artifacts
+    returned by some OpenRouter providers (token list per model, see
+    sanitizer.MODEL_ARTIFACT_TOKENS).
+    """
+    return get_sanitizer(model).clean(text)
 
 # ---------------------------------------
 # Intent detection (regex-based)
@@ -62,6 +117,10 @@ INTENT_KEYWORDS = {
     "compare_roles": [
         r"\bvs\b", r"\bdifference between\b", r"\bcompare\b", r"\bversus\b"
     ],
+    "skill_roles": [
+        r"\b(which|what) (roles|jobs|careers)\b", r"\b(roles|jobs) (that|which) (need|use|require)\b",
+        r"\bwho uses\b"
+    ],
     "resume_tip": [
         r"\bresume\b", r"\bcv\b", r"\bcover letter\b", r"\bhow to write (a )?resume\b", r"\bresume tips\b"
     ],
@@ -72,60 +131,35 @@ COMPILED_INTENT_PATTERNS = {
     for intent, patterns in INTENT_KEYWORDS.items()
 }
 
+# Highest priority first: the first intent with any keyword hit wins.
+INTENT_PRIORITY = ["compare_roles", "skill_roles", "resume_tip", "skills_needed", "roadmap", "projects", "role_info"]
+
 def get_intent(message: str) -> str:
     msg = (message or "").strip()
     if not msg:
         return "general"
 
-    # High priority: compare_roles
-    for pat in COMPILED_INTENT_PATTERNS["compare_roles"]:
-        if pat.search(msg):
-            return "compare_roles"
-
-    # High priority: resume tips
-    for pat in COMPILED_INTENT_PATTERNS["resume_tip"]:
-        if pat.search(msg):
-            return "resume_tip"
-
-    # Priority order for other intents
-    priority_order = ["skills_needed", "roadmap", "projects", "role_info"]
-    for intent in priority_order:
-        for pat in COMPILED_INTENT_PATTERNS[intent]:
-            if pat.search(msg):
-                return intent
-
-    return "general"
+    with metrics.span("intent"):
+        return analyze_message(msg).intent
 
 # ---------------------------------------
 # Role extraction
 # ---------------------------------------
-def extract_role_from_text(message: str):
-    msg = (message or "").lower()
-
-    # Abbreviation mapping
-    role_aliases = {
-        "ml engineer": "Machine Learning Engineer",
-        "mle": "Machine Learning Engineer",
-        "data sci": "Data Scientist",
-        "frontend dev": "Frontend Developer",
-        "backend dev": "Backend Developer",
-        "full stack dev": "Full Stack Developer",
-        "ui ux": "UI/UX Designer",
-        "cybersec": "Cybersecurity Analyst",
-        "cloud eng": "Cloud Engineer",
-    }
-
-    # Check aliases first
-    for alias, full_role in role_aliases.items():
-        if alias in msg:
-            return full_role
-
-    # Fall back to full name detection
-    for role in ROLE_DATA.keys():
-        if role.lower() in msg:
-            return role
+# Abbreviation mapping (checked before full role names)
+ROLE_ALIASES = {
+    "ml engineer": "Machine Learning Engineer",
+    "mle": "Machine Learning Engineer",
+    "data sci": "Data Scientist",
+    "frontend dev": "Frontend Developer",
+    "backend dev": "Backend Developer",
+    "full stack dev": "Full Stack Developer",
+    "ui ux": "UI/UX Designer",
+    "cybersec": "Cybersecurity Analyst",
+    "cloud eng": "Cloud Engineer",
+}
 
-    return None
+def extract_role_from_text(message: str):
+    return analyze_message((message or "").strip()).role
 
 # ---------------------------------------
 # Helper: detect expansion request
@@ -136,7 +170,392 @@ EXPAND_KEYWORDS = re.compile(
 )
 
 def user_wants_expansion(message: str) -> bool:
-    return bool(EXPAND_KEYWORDS.search(message or ""))
+    return analyze_message((message or "").strip()).wants_expansion
+
+# ---------------------------------------
+# Single-pass message analysis
+# ---------------------------------------
+class MessageAnalysis(NamedTuple):
+    intent: str
+    wants_expansion: bool
+    role: Optional[str]
+    roles: tuple = ()       # every distinct role mentioned, in order of appearance
+    semantic: bool = False  # intent or role came from the semantic fallback
+
+def _build_message_matcher(role_data):
+    """
+    One word-level trie holding every intent keyword and expansion
+    keyword, plus the role index (aliases + names) sharing that trie.
+    """
+    matcher = PhraseMatcher()
+    for rank, intent in enumerate(INTENT_PRIORITY):
+        for pat in INTENT_KEYWORDS[intent]:
+            for phrase in expand_keyword_pattern(pat):
+                matcher.add(phrase, ("intent", rank))
+
+    for phrase in expand_keyword_pattern(EXPAND_KEYWORDS.pattern):
+        matcher.add(phrase, ("expand",))
+
+    role_index = RoleIndex(role_data.keys(), ROLE_ALIASES, matcher=matcher)
+    return matcher, role_index
+
+def scan_message(message: str) -> MessageAnalysis:
+    """
+    Intent, expansion flag and roles from a single scan of the message.
+    Same priority rules as the old per-pattern loops: highest-priority
+    intent anywhere in the message, any expansion keyword, and the
+    first alias (else first dataset role) that occurs. Unlike the old
+    substring test, a role or alias must start on a word boundary
+    ("smle" and "html engineer" no longer mean Machine Learning
+    Engineer); scripts/bench_intent.py --check holds the rest equal.
+    """
+    return current_snapshot().scan(message)
+
+def _scan_message(snapshot: "KnowledgeSnapshot", message: str) -> MessageAnalysis:
+    intent_rank = len(INTENT_PRIORITY)
+    wants_expansion = False
+    role_matches = []
+
+    low = message.lower()
+    for start, end, value in snapshot.matcher.finditer(low, lowered=True):
+        if isinstance(value, RoleTag):
+            role_matches.append(RoleMatch(value.role, start, end, value.rank, value.alias))
+        elif value[0] == "intent":
+            if value[1] < intent_rank:
+                intent_rank = value[1]
+        else:
+            wants_expansion = True
+
+    if snapshot.role_index.unindexed:
+        role_matches += snapshot.role_index.find_unindexed(low)
+
+    intent = INTENT_PRIORITY[intent_rank] if intent_rank < len(INTENT_PRIORITY) else "general"
+    if len(role_matches) <= 1:
+        roles = tuple(m.role for m in role_matches)
+        return MessageAnalysis(intent, wants_expansion, roles[0] if roles else None, roles)
+
+    return MessageAnalysis(
+        intent,
+        wants_expansion,
+        RoleIndex.best(role_matches),
+        tuple(RoleIndex.ordered(role_matches)),
+    )
+
+# ---------------------------------------
+# Semantic fallback (offline hashed TF-IDF)
+# ---------------------------------------
+# Paraphrase prototypes for each intent, matched only when no keyword hits.
+INTENT_EXAMPLES = {
+    "skills_needed": [
+        "what do I need to know", "which technologies should I learn", "tech stack and tools",
+        "what should I study", "knowledge requirements", "abilities needed",
+    ],
+    "roadmap": [
+        "where do I begin", "path to become", "plan to become", "how do I become",
+        "study plan step by step", "beginner guide",
+    ],
+    "projects": [
+        "what can I build", "portfolio ideas", "practice apps to make",
+        "hands-on exercises", "ideas to practice", "side project",
+    ],
+    "role_info": [
+        "tell me about", "what does one do", "day to day work",
+        "job description", "responsibilities", "what do they do all day",
+    ],
+    "compare_roles": [
+        "which is better", "should I choose", "pros and cons",
+        "similarities and differences", "which one should I pick",
+    ],
+    "skill_roles": [
+        "jobs that use", "careers where I would use", "what can I do with",
+        "where is it used at work", "who works with",
+    ],
+    "resume_tip": [
+        "job application", "linkedin profile", "portfolio for recruiters",
+        "internship application", "applying for jobs",
+    ],
+}
+
+SEMANTIC_ROLE_KINDS = ("role", "profile")
+ROLE_SPECIFIC_INTENTS = {"skills_needed", "roadmap", "projects", "role_info"}
+SEMANTIC_THRESHOLD = 0.08   # minimum cosine for a semantic match
+SEMANTIC_MIN_RATIO = 1.5    # best label must beat the runner-up by this factor
+# role-name / alias words too common to pin a role on by themselves
+# ("roadmap for learning linux" is not about Machine Learning Engineer)
+GENERIC_ROLE_WORDS = {"analyst", "designer", "dev", "developer", "eng", "engineer", "full", "learning"}
+ROLE_WORD_CUTOFF = 0.8      # difflib ratio for a misspelt role word ("scientst")
+
+def _semantic_entries(role_data):
+    import semantic   # numpy; only loaded once a message needs the fallback
+
+    entries = []
+    for alias, role in ROLE_ALIASES.items():
+        if role in role_data:
+            entries.append(semantic.Entry("role", role, alias))
+    for role, info in role_data.items():
+        entries.append(semantic.Entry("role", role, role))
+        profile = [role] + list(info.get("skills", [])) + list(info.get("projects", []))
+        entries.append(semantic.Entry("profile", role, " ".join(profile)))
+        for skill in info.get("skills", []):
+            entries.append(semantic.Entry("skill", role, skill))
+        for project in info.get("projects", []):
+            entries.append(semantic.Entry("project", role, project))
+    for intent, examples in INTENT_EXAMPLES.items():
+        for example in examples:
+            entries.append(semantic.Entry("intent", intent, example))
+    return entries
+
+@lru_cache(maxsize=None)
+def _role_words(role: str) -> frozenset:
+    names = [role] + [alias for alias, full_role in ROLE_ALIASES.items() if full_role == role]
+    return frozenset(w for name in names for w in re.findall(r"\w+", name.lower()) if w not in GENERIC_ROLE_WORDS)
+
+def _mentions_role_word(message: str, role: str) -> bool:
+    """The message has a distinctive word of the role's name or aliases, or a near-miss of one."""
+    words = _role_words(role)
+    return any(
+        w in words or difflib.get_close_matches(w, words, n=1, cutoff=ROLE_WORD_CUTOFF)
+        for w in set(re.findall(r"\w+", message.lower()))
+        if len(w) > 1 and w not in GENERIC_ROLE_WORDS
+    )
+
+def _semantic_pick(index: "semantic.SemanticIndex", message: str, kinds, scores) -> Optional[str]:
+    hit = index.best_label(
+        message, kinds, threshold=SEMANTIC_THRESHOLD, min_ratio=SEMANTIC_MIN_RATIO, scores=scores
+    )
+    return hit.label if hit else None
+
+def analyze_message(message: str) -> MessageAnalysis:
+    """
+    scan_message, plus a semantic fallback for whatever the keyword scan
+    could not resolve: an intent when it found none ("general"), a role
+    when it found none. Paraphrases resolved here get a deterministic
+    ROLE_DATA answer instead of the general LLM branch.
+    """
+    return current_snapshot().analyze(message)
+
+def _analyze_message(snapshot: "KnowledgeSnapshot", message: str) -> MessageAnalysis:
+    analysis = snapshot.scan(message)
+    if not message or (analysis.intent != "general" and analysis.role) or analysis.intent == "skill_roles":
+        # skill_roles names skills, not a role
+        return analysis
+
+    index = snapshot.semantic_index
+    with metrics.span("semantic"):
+        scores = index.scores(message)
+        intent, role, roles = analysis.intent, analysis.role, analysis.roles
+        if role is None:
+            role = _semantic_pick(index, message, SEMANTIC_ROLE_KINDS, scores)
+            if role and not _mentions_role_word(message, role):
+                role = None   # only skills or generic words in common
+            roles = (role,) if role else ()
+        if intent == "general":
+            guessed = _semantic_pick(index, message, ("intent",), scores)
+            # an intent that needs a role (or two) it cannot get would only ask
+            # for one; leave those to the general LLM branch
+            if guessed == "compare_roles":
+                if len(roles) >= 2:
+                    intent = guessed
+            elif guessed and (role or guessed not in ROLE_SPECIFIC_INTENTS):
+                intent = guessed
+
+    if (intent, role) == (analysis.intent, analysis.role):
+        return analysis
+    return MessageAnalysis(intent, analysis.wants_expansion, role, roles, True)
+
+# ---------------------------------------
+# Hot reload
+# ---------------------------------------
+class KnowledgeSnapshot:
+    """
+    One version of the dataset and everything derived from it (phrase
+    trie, role index, semantic index, skill index, memoised message
+    analysis). Never
+    mutated: a reload builds a new snapshot and swaps the reference, so a
+    request that grabbed the old one finishes on consistent data and the
+    analysis caches can never mix versions.
+    """
+
+    def __init__(self, version: int, role_data):
+        self.version = version
+        self.role_data = role_data
+        self.fingerprint = role_data.fingerprint
+        self.matcher, self.role_index = _build_message_matcher(role_data)
+        self._semantic_index = None
+        self._skill_index = None
+        self._build_lock = threading.Lock()
+        self.scan = lru_cache(maxsize=4096)(partial(_scan_message, self))
+        self.analyze = lru_cache(maxsize=4096)(partial(_analyze_message, self))
+
+    @property
+    def semantic_index(self) -> "semantic.SemanticIndex":
+        """Built (or loaded from its cache file) the first time a message needs it."""
+        if self._semantic_index is None:
+            with self._build_lock:
+                if self._semantic_index is None:
+                    import semantic
+                    self._semantic_index = semantic.load_or_build(_semantic_entries(self.role_data))
+        return self._semantic_index
+
+    @property
+    def skill_index(self) -> "skill_index.SkillIndex":
+        """Skill -> roles bitsets and role similarity, built the first time a question needs them."""
+        if self._skill_index is None:
+            with self._build_lock:
+                if self._skill_index is None:
+                    import skill_index
+                    self._skill_index = skill_index.SkillIndex(self.role_data)
+        return self._skill_index
+
+log = logging.getLogger(__name__)
+
+RELOAD_INTERVAL = float(os.getenv("ROLE_DATA_RELOAD_INTERVAL", "2"))
+_RELOAD_LOCK = threading.Lock()
+_SNAPSHOT: Optional[KnowledgeSnapshot] = None
+_WATCHER: Optional[threading.Thread] = None
+_WATCHER_STOP = threading.Event()
+
+def current_snapshot() -> KnowledgeSnapshot:
+    """The installed snapshot; the first call loads the dataset."""
+    snapshot = _SNAPSHOT
+    if snapshot is None:
+        snapshot = _install_first()
+    return snapshot
+
+def _install_first() -> KnowledgeSnapshot:
+    global _SNAPSHOT
+    with _RELOAD_LOCK:
+        if _SNAPSHOT is None:
+            _SNAPSHOT = KnowledgeSnapshot(1, load_store(DATA_PATH))
+        return _SNAPSHOT
+
+def data_version() -> int:
+    """Bumped on every reload that installed changed data (starts at 1)."""
+    return current_snapshot().version
+
+def reload_data(force: bool = False) -> bool:
+    """
+    Reload the dataset and rebuild every derived index, then swap them in
+    at once. The build runs without blocking readers; only concurrent
+    reloads wait for each other. Returns True if a new version was
+    installed (False when the content is unchanged).
+    """
+    global _SNAPSHOT
+    current_snapshot()   # before first use: load, then compare as usual
+    with _RELOAD_LOCK:
+        current = _SNAPSHOT
+        store = load_store(DATA_PATH)
+        if not force and store.fingerprint == current.fingerprint:
+            return False
+        snapshot = KnowledgeSnapshot(current.version + 1, store)
+        # in use: rebuild before the swap, not on a user's request
+        if current._semantic_index is not None:
+            snapshot.semantic_index
+        if current._skill_index is not None:
+            snapshot.skill_index
+
+        _SNAPSHOT = snapshot
+        if LLM_CACHE is not None:
+            LLM_CACHE.set_namespace(snapshot.fingerprint)
+    return True
+
+def _watch(interval: float) -> None:
+    last = stat_signature(source_files(DATA_PATH))
+    last_pack = stat_signature([PACK_PATH])
+    while not _WATCHER_STOP.wait(interval):
+        pack_sig = stat_signature([PACK_PATH])
+        if pack_sig != last_pack:
+            last_pack = pack_sig
+            log.info("answer pack reloaded (%d answers)", len(reload_answer_pack()))
+
+        sig = stat_signature(source_files(DATA_PATH))
+        if sig == last:
+            continue
+        last = sig
+        try:
+            if reload_data():
+                log.info("role dataset reloaded (version %d)", data_version())
+        except Exception:
+            # half-written or invalid file: keep serving the current
+            # version, retry on the next change
+            log.exception("role dataset reload failed, keeping version %d", data_version())
+
+def start_watcher(interval: Optional[float] = None) -> bool:
+    """
+    Poll the dataset files and the answer pack (stat only) every
+    `interval` seconds and reload on change. Idempotent; returns False if disabled (interval <= 0).
+    """
+    global _WATCHER
+    interval = RELOAD_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return False
+    with _RELOAD_LOCK:
+        if _WATCHER is None or not _WATCHER.is_alive():
+            _WATCHER_STOP.clear()
+            _WATCHER = threading.Thread(target=_watch, args=(interval,), name="role-data-watcher", daemon=True)
+            _WATCHER.start()
+    return True
+
+def stop_watcher() -> None:
+    _WATCHER_STOP.set()
+
+# ---------------------------------------
+# Warm-up
+# ---------------------------------------
+# CHATBOT_WARMUP=0: everything stays lazy until a request needs it
+WARM_UP = os.getenv("CHATBOT_WARMUP", "1").lower() not in ("0", "false", "no")
+_WARM_UP_THREAD: Optional[threading.Thread] = None
+
+def _warm_llm_client() -> None:
+    import llm
+    llm.get_client().session   # requests / urllib3 and the connection pool, no request sent
+
+def warm_up(process_local: bool = True) -> Dict[str, float]:
+    """
+    Build what the first request would otherwise pay for: the dataset
+    snapshot, the semantic and skill indexes (numpy) and the analysis
+    path; with `process_local` also the answer pack, the response
+    cache's SQLite connection and the OpenRouter HTTP client. A forking
+    server warms with process_local=False before fork, so workers share
+    the first part and open their own connections. Returns seconds per
+    step.
+    """
+    steps = [
+        ("dataset", current_snapshot),
+        ("semantic_index", lambda: current_snapshot().semantic_index),
+        ("skill_index", lambda: current_snapshot().skill_index),
+        ("analysis", lambda: analyze_message("what does a data scientist do all day")),
+    ]
+    if process_local:
+        steps += [("answer_pack", get_answer_pack), ("llm_cache", get_llm_cache), ("llm_client", _warm_llm_client)]
+
+    timings = {}
+    for name, fn in steps:
+        started = time.perf_counter()
+        fn()
+        timings[name] = round(time.perf_counter() - started, 6)
+    return timings
+
+def _warm_up_logged(process_local: bool) -> None:
+    try:
+        timings = warm_up(process_local)
+        log.info("warm-up done in %.3fs: %s", sum(timings.values()), timings)
+    except Exception:
+        # nothing lost: whatever failed is built on first use instead
+        log.exception("warm-up failed")
+
+def start_warm_up(process_local: bool = True) -> Optional[threading.Thread]:
+    """warm_up() on a background thread, once per process; None if disabled (CHATBOT_WARMUP=0)."""
+    global _WARM_UP_THREAD
+    if not WARM_UP:
+        return None
+    with _INIT_LOCK:
+        if _WARM_UP_THREAD is None:
+            _WARM_UP_THREAD = threading.Thread(
+                target=_warm_up_logged, args=(process_local,), name="warm-up", daemon=True
+            )
+            _WARM_UP_THREAD.start()
+    return _WARM_UP_THREAD
 
 # ---------------------------------------
 # Prompt templates
@@ -169,6 +588,13 @@ PROMPT_TEMPLATES = {
         "Role: **{role}**"
     ),
 
+    "roadmap_step": (
+        "Expand one step of a learning roadmap in short, clear Markdown.\n"
+        "Give 3–5 bullet points: what to learn, a resource type, and a small exercise.\n\n"
+        "Step {number}: {step}\n"
+        "Role: **{role}**"
+    ),
+
     "projects_expansion": (
         "The user needs expanded Markdown project descriptions.\n"
         "For each project, follow this EXACT format:\n\n"
@@ -213,130 +639,531 @@ PROMPT_TEMPLATES = {
 # ---------------------------------------
 # LLM Call wrapper (UPDATED with sanitization)
 # ---------------------------------------
-def call_llm_for_template(template_key: str, user_message: str, model: str = None, max_tokens: int = 256):
+def _build_template_messages(template_key: str, user_message, context=()):
+    """
+    (template_key, user_content, messages); `context` (earlier turns from
+    conversation.ConversationState.build_context) goes between the system
+    prompt and the question.
+    """
     system = {"role": "system", "content": SYSTEM_PROMPT_BRIEF}
 
-    if template_key in PROMPT_TEMPLATES:
-        user_content = PROMPT_TEMPLATES[template_key].format(**user_message)
-    else:
-        user_content = PROMPT_TEMPLATES["general_advice"].format(question=user_message)
+    with metrics.span("prompt"):
+        if template_key in PROMPT_TEMPLATES:
+            user_content = PROMPT_TEMPLATES[template_key].format(**user_message)
+        else:
+            template_key = "general_advice"
+            user_content = PROMPT_TEMPLATES["general_advice"].format(question=user_message)
 
     messages = [
         system,
+        *context,
         {"role": "user", "content": user_content}
     ]
+    return template_key, user_content, messages
 
-    result = call_openrouter_chat(messages=messages, model=model or None, max_tokens=max_tokens)
+def _prompt_key(user_content: str, context) -> str:
+    # context-free prompts keep their existing cache / answer-pack keys
+    if not context:
+        return user_content
+    return json.dumps([list(context), user_content], ensure_ascii=False)
 
-    if not result.get("ok"):
-        return None, result
+def _template_payload(template_key: str, user_message) -> dict:
+    return user_message if template_key in PROMPT_TEMPLATES else {"question": user_message}
+
+def _budgeted_request(template_key: str, user_message, max_tokens: Optional[int], context=()):
+    """
+    (template_key, cache_key_content, max_tokens, calls) of a template
+    request. max_tokens=None is sized by token_budget from the payload;
+    `calls` are the (messages, max_tokens, estimated_prompt_tokens) to
+    send: one, or one per part of a payload too long for the prompt
+    budget. The cache key always comes from the untrimmed prompt.
+    """
+    payload = _template_payload(template_key, user_message)
+    template_key, user_content, messages = _build_template_messages(template_key, user_message, context)
+    budget = get_token_budget()
+    max_tokens = max_tokens or budget.max_tokens(template_key, payload)
+    key_content = _prompt_key(user_content, context)
+
+    fixed = estimate_messages([messages[0], *context])
+    template = PROMPT_TEMPLATES[template_key]
+    parts = budget.fit(template_key, payload, lambda p: template.format(**p), fixed)
+    if len(parts) == 1 and parts[0] is payload:
+        return template_key, key_content, max_tokens, [(messages, max_tokens, estimate_messages(messages))]
+    calls = []
+    for part in parts:
+        _, _, part_messages = _build_template_messages(template_key, part, context)
+        part_tokens = budget.max_tokens(template_key, part)
+        if len(parts) == 1:
+            part_tokens = min(part_tokens, max_tokens)   # trimmed, not chunked
+        calls.append((part_messages, part_tokens, estimate_messages(part_messages)))
+    return template_key, key_content, max_tokens, calls
+
+def template_max_tokens(template_key: str, user_message) -> int:
+    """max_tokens call_llm_for_template sizes for this request."""
+    template_key = template_key if template_key in PROMPT_TEMPLATES else "general_advice"
+    return get_token_budget().max_tokens(template_key, _template_payload(template_key, user_message))
+
+def template_cache_key(template_key: str, user_message, model: str = None, max_tokens: Optional[int] = None) -> str:
+    """Cache / answer-pack key of a call_llm_for_template request."""
+    template_key, user_content, _ = _build_template_messages(template_key, user_message)
+    max_tokens = max_tokens or template_max_tokens(template_key, user_message)
+    return make_cache_key(template_key, user_content, model or DEFAULT_MODEL, max_tokens)
+
+def _cached_answer(cache_key: str):
+    """(content, result) from the answer pack, else the response cache, else None."""
+    content = get_answer_pack().get(cache_key, current_snapshot().fingerprint)
+    if content is not None:
+        metrics.inc("llm_cache_lookups_total", result="pack")
+        return content, {"ok": True, "content": content, "cached": True, "precomputed": True}
+    content = get_llm_cache().get(cache_key)
+    if content is not None:
+        metrics.inc("llm_cache_lookups_total", result="cache")
+        return content, {"ok": True, "content": content, "cached": True}
+    metrics.inc("llm_cache_lookups_total", result="miss")
+    return None
+
+def _adopt_prefetched(cache_key: str, namespace: str, content: Optional[str]):
+    if not content:
+        return None
+    metrics.inc("llm_cache_lookups_total", result="prefetch")
+    # read once: from here on it is an ordinary cached answer
+    get_llm_cache().set(cache_key, content, namespace=namespace)
+    return content, {"ok": True, "content": content, "cached": True, "prefetched": True}
+
+def _prefetched_answer(cache_key: str, namespace: str, priority: int):
+    """(content, result) the prefetcher parked (or is fetching) for this key, else None."""
+    prefetcher = get_prefetcher()
+    if prefetcher is None or priority > PRIORITY_INTERACTIVE:
+        return None
+    return _adopt_prefetched(cache_key, namespace, prefetcher.take(cache_key))
+
+async def _prefetched_answer_async(cache_key: str, namespace: str, priority: int):
+    prefetcher = get_prefetcher()
+    if prefetcher is None or priority > PRIORITY_INTERACTIVE:
+        return None
+    return _adopt_prefetched(cache_key, namespace, await prefetcher.take_async(cache_key))
+
+def _record_llm_result(result, template_key: Optional[str] = None, max_tokens: int = 0, estimated_prompt: int = 0) -> None:
+    """Outcome and token usage of one OpenRouter call."""
+    if template_key and result.get("ok"):
+        get_token_budget().record(template_key, result, max_tokens, estimated_prompt)
+    if not metrics.ENABLED:
+        return
+    outcome = "ok" if result.get("ok") else str(result.get("code") or result.get("error"))
+    metrics.inc("llm_calls_total", outcome=outcome)
+    usage = (result.get("raw") or {}).get("usage") or {}
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if isinstance(usage.get(kind), (int, float)):
+            metrics.inc("llm_tokens_total", usage[kind], kind=kind[:-len("_tokens")])
+
+def llm_status() -> Dict[str, object]:
+    """
+    OpenRouter circuit breaker state ("closed", "open", "half_open"; see
+    llm.CircuitBreaker). While it is not closed, LLM expansions fail at
+    once and answers fall back to ROLE_DATA / cached content.
+    """
+    breaker = get_breaker()
+    return breaker.info() if breaker is not None else {"state": "disabled"}
+
+def _joined(contents) -> str:
+    content = "\n\n".join(c for c in contents if c)
+    if len(content) > OUTPUT_CHAR_LIMIT:
+        content = content[:OUTPUT_CHAR_LIMIT] + "..."
+    return content
+
+def call_llm_for_template(
+    template_key: str,
+    user_message: str,
+    model: str = None,
+    max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+    context=(),
+    queue_budget: Optional[float] = None,
+):
+    template_key, key_content, max_tokens, calls = _budgeted_request(template_key, user_message, max_tokens, context)
+
+    routed = model is None
+    # Routed requests are keyed by DEFAULT_MODEL whichever model answers,
+    # on purpose: the key names the question, and a hedge / failover answer
+    # is as good an answer to it (the router may pick either model next
+    # time; the answer pack is keyed the same way). Pass `model` to pin
+    # both the call and the key to one model.
+    model = model or DEFAULT_MODEL
+    cache_key = make_cache_key(template_key, key_content, model, max_tokens)
+    namespace = get_llm_cache().namespace
+    if use_cache:
+        hit = _prefetched_answer(cache_key, namespace, priority) or _cached_answer(cache_key)
+        if hit is not None:
+            return hit
+
+    contents = []
+    for messages, part_tokens, estimated in calls:
+        with metrics.span("llm"):
+            if routed:
+                result = get_router().call(messages, max_tokens=part_tokens, priority=priority, queue_budget=queue_budget)
+            else:
+                result = call_openrouter_chat(
+                    messages=messages, model=model, max_tokens=part_tokens, priority=priority, queue_budget=queue_budget
+                )
+        _record_llm_result(result, template_key, part_tokens, estimated)
+
+        if not result.get("ok"):
+            return None, result
+
+        with metrics.span("sanitize"):
+            contents.append(clean_llm_text(result.get("content", ""), result.get("model", model)))
+
+    content = _joined(contents)
+
+    if use_cache and content:
+        get_llm_cache().set(cache_key, content, namespace=namespace)
+
+    return content, result
+
+async def call_llm_for_template_async(
+    template_key: str,
+    user_message,
+    model: str = None,
+    max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+    context=(),
+):
+    """asyncio version of call_llm_for_template (same cache, same output)."""
+    template_key, key_content, max_tokens, calls = _budgeted_request(template_key, user_message, max_tokens, context)
+
+    routed = model is None
+    model = model or DEFAULT_MODEL   # key as in call_llm_for_template, whoever answers
+    cache_key = make_cache_key(template_key, key_content, model, max_tokens)
+    namespace = get_llm_cache().namespace
+    if use_cache:
+        hit = await _prefetched_answer_async(cache_key, namespace, priority) or _cached_answer(cache_key)
+        if hit is not None:
+            return hit
+
+    contents = []
+    for messages, part_tokens, estimated in calls:
+        with metrics.span("llm"):
+            if routed:
+                result = await get_router().call_async(messages, max_tokens=part_tokens, priority=priority)
+            else:
+                result = await call_openrouter_chat_async(
+                    messages=messages, model=model, max_tokens=part_tokens, priority=priority
+                )
+        _record_llm_result(result, template_key, part_tokens, estimated)
+
+        if not result.get("ok"):
+            return None, result
+
+        with metrics.span("sanitize"):
+            contents.append(clean_llm_text(result.get("content", ""), result.get("model", model)))
+
+    content = _joined(contents)
+
+    if use_cache and content:
+        get_llm_cache().set(cache_key, content, namespace=namespace)
 
-    content = clean_llm_text(result.get("content", ""))
+    return content, result
+
+def stream_llm_for_template(
+    template_key: str,
+    user_message,
+    model: str = None,
+    max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+    context=(),
+):
+    """
+    Streaming call_llm_for_template: yields sanitized text chunks and
+    returns (content, result) as the generator's return value.
+    A cache hit is yielded as a single chunk.
+    """
+    template_key, key_content, max_tokens, calls = _budgeted_request(template_key, user_message, max_tokens, context)
+
+    # no hedging once tokens are flowing: the router only picks the model
+    llm_model = model or get_router().pick()
+    model = model or DEFAULT_MODEL   # key as in call_llm_for_template, whoever answers
+    cache_key = make_cache_key(template_key, key_content, model, max_tokens)
+    namespace = get_llm_cache().namespace
+    if use_cache:
+        hit = _prefetched_answer(cache_key, namespace, priority) or _cached_answer(cache_key)
+        if hit is not None:
+            yield hit[0]
+            return hit
+
+    parts = []
+    started = time.perf_counter()
+    first = True
+    for i, (messages, part_tokens, estimated) in enumerate(calls):
+        if i and parts:
+            parts.append("\n\n")
+            yield "\n\n"
+        produced = sum(len(p) for p in parts)
+        cleaner = get_sanitizer(llm_model).stream(max_chars=max(0, OUTPUT_CHAR_LIMIT - produced))
+        stream = stream_openrouter_chat(messages=messages, model=llm_model, max_tokens=part_tokens, priority=priority)
+        while True:
+            try:
+                raw = next(stream)
+            except StopIteration as stop:
+                result = stop.value
+                break
+            if first:
+                first = False
+                metrics.observe("stage_seconds", time.perf_counter() - started, stage="llm_first_chunk")
+            text = cleaner.feed(raw)
+            if text:
+                parts.append(text)
+                yield text
+
+        tail = cleaner.finish()
+        if tail:
+            parts.append(tail)
+            yield tail
+
+        _record_llm_result(result, template_key, part_tokens, estimated)
+        result["model"] = llm_model
+        if llm_model in get_router().stats:
+            get_router().record(llm_model, result)
+        if not result.get("ok"):
+            break
+
+    # includes the time the consumer spent between chunks
+    metrics.observe("stage_seconds", time.perf_counter() - started, stage="llm_stream")
+
+    content = "".join(parts)
+    if not result.get("ok"):
+        return (content or None), result
 
-    if len(content) > 4000:
-        content = content[:4000] + "..."
+    if use_cache and content:
+        get_llm_cache().set(cache_key, content, namespace=namespace)
 
     return content, result
 
 # ---------------------------------------
-# Main response generation (hybrid logic)
+# Response planning
 # ---------------------------------------
-def get_response(message: str, intent: str):
+class ResponsePlan(NamedTuple):
+    """
+    What get_response will answer, split into the deterministic part
+    (available immediately from ROLE_DATA) and an optional LLM expansion.
+    """
+    base: str
+    template_key: Optional[str] = None
+    payload: Optional[dict] = None
+    model: Optional[str] = None   # None: model_router picks (and may hedge)
+    max_tokens: Optional[int] = None   # None: sized by token_budget from the payload
+    llm_prefix: str = ""   # put in front of the LLM output
+    fallback: str = ""     # appended to base when there is no LLM output
+    intent: str = ""       # intent actually answered (after follow-up resolution)
+    role: Optional[str] = None
+    roles: tuple = ()
+    context: tuple = ()    # earlier turns sent along with the LLM call
+
+# a message that points back at the previous answer instead of naming a role
+FOLLOWUP_REFERENCE = re.compile(
+    r"\b(it|its|that|this|they|them|those|these|same|what about|how about|step\s+\d+)\b",
+    flags=re.IGNORECASE
+)
+STEP_REFERENCE = re.compile(r"\bstep\s+(\d+)\b", flags=re.IGNORECASE)
+# "... for a plumber", "... to become a chef": a role the dataset may not know
+ROLE_SLOT = re.compile(
+    r"\b(?:for|as|of|become|becoming)\s+(?:an?\s+|the\s+)?([a-z][\w+#.-]*)",
+    flags=re.IGNORECASE
+)
+# words a follow-up ("roadmap?", "and what skills are needed for it?") may
+# carry besides intent keywords and reference words; anything else might be
+# a role the dataset does not know
+FOLLOWUP_FILLER = {
+    "a", "about", "also", "an", "and", "any", "are", "can", "career", "do", "for", "get", "give",
+    "how", "i", "in", "is", "job", "list", "me", "need", "needed", "now", "of", "ok", "okay",
+    "one", "please", "required", "role", "show", "so", "some", "tell", "the", "then", "there",
+    "to", "what", "which", "with", "you",
+}
+
+def _names_other_role(message: str) -> bool:
+    """A role slot filled with something other than a reference word ("for it")."""
+    return any(
+        m.group(1).lower() not in FOLLOWUP_FILLER and not FOLLOWUP_REFERENCE.fullmatch(m.group(1))
+        for m in ROLE_SLOT.finditer(message)
+    )
+
+def _bare_followup(message: str) -> bool:
+    """Nothing but intent / expansion keywords, reference words and filler: names no role at all."""
+    rest = FOLLOWUP_REFERENCE.sub(" ", EXPAND_KEYWORDS.sub(" ", message))
+    for patterns in COMPILED_INTENT_PATTERNS.values():
+        for pattern in patterns:
+            rest = pattern.sub(" ", rest)
+    return all(word in FOLLOWUP_FILLER for word in re.findall(r"\w+", rest.lower()))
+
+def _resolve_followup(snapshot: KnowledgeSnapshot, message: str, intent: str, analysis: MessageAnalysis, conversation):
+    """
+    (intent, analysis) with what the message leaves implicit taken from the
+    conversation: the role of a role-specific question that names none,
+    known or unknown ("what about projects for it?", "roadmap?" but not
+    "skills for a plumber"), the second role of a comparison, or
+    the whole topic of a bare follow-up ("explain step 2", "tell me more
+    about that"). Those turns get a ROLE_DATA answer instead of a general
+    LLM call.
+    """
+    last_role = conversation.last_role
+    if not last_role or last_role not in snapshot.role_data:
+        return intent, analysis
+    named = snapshot.scan(message).roles   # explicit mentions, no semantic guess
+    refers = FOLLOWUP_REFERENCE.search(message) is not None
+
+    if not named and STEP_REFERENCE.search(message) and conversation.last_intent == "roadmap":
+        # "explain step 2" reads as role_info on its own
+        return "roadmap", analysis._replace(intent="roadmap", role=last_role, roles=(last_role,))
+    if named or _names_other_role(message):
+        # a role of its own, known or not ("skills for a plumber")
+        if intent == "compare_roles" and len(named) == 1 and named[0] != last_role:
+            return intent, analysis._replace(roles=(last_role, named[0]))
+        return intent, analysis
+    if intent in ROLE_SPECIFIC_INTENTS and _bare_followup(message):
+        return intent, analysis._replace(role=last_role, roles=(last_role,))
+    if intent == "general" and refers and conversation.last_intent in ROLE_SPECIFIC_INTENTS:
+        intent = conversation.last_intent
+        return intent, analysis._replace(intent=intent, role=last_role, roles=(last_role,))
+    return intent, analysis
+
+def plan_response(message: str, intent: str, conversation=None) -> ResponsePlan:
+    """
+    `conversation` (a conversation.ConversationState) resolves follow-ups
+    and gives general questions the earlier turns as LLM context.
+    """
     message = (message or "").strip()
-    role = extract_role_from_text(message)
+    snapshot = current_snapshot()   # one dataset version for the whole answer
+    analysis = snapshot.analyze(message)
+    if conversation is not None:
+        intent, analysis = _resolve_followup(snapshot, message, intent, analysis, conversation)
+
+    plan = _plan(snapshot, message, intent, analysis)
+    context = ()
+    if conversation is not None and plan.template_key == "general_advice":
+        # role templates stay context-free so they keep hitting the cache / pack
+        context = tuple(conversation.build_context())
+    role = analysis.role if intent in ROLE_SPECIFIC_INTENTS else None
+    return plan._replace(intent=intent, role=role, roles=analysis.roles, context=context)
+
+def _percent(score: float) -> str:
+    return f"{round(score * 100)}%"
+
+def _comparison_answer(index, comparison) -> str:
+    a, b = comparison.role_a, comparison.role_b
+    lines = [
+        f"### ⚖️ Role Comparison: **{a}** vs **{b}**",
+        "**Skill overlap:** {} ({} shared, {} only {}, {} only {}; cosine {:.2f})\n".format(
+            _percent(comparison.jaccard), len(comparison.shared),
+            len(comparison.only_a), a, len(comparison.only_b), b, comparison.cosine
+        ),
+    ]
+    for title, skills in (("Shared skills", comparison.shared), (f"Only {a}", comparison.only_a), (f"Only {b}", comparison.only_b)):
+        if skills:
+            lines.append(f"**{title}:**\n" + "\n".join(f"- {s}" for s in skills) + "\n")
+    for role, other in ((a, b), (b, a)):
+        near = index.nearest(role, k=3, exclude=(other,))
+        if near:
+            lines.append(f"**Closest to {role}:** " + ", ".join(f"{r} ({_percent(j)})" for r, j in near))
+    return "\n".join(lines) + "\n\n"
+
+def _skill_roles_answer(index, skills) -> str:
+    named = " and ".join(f"**{s}**" for s in skills)
+    roles = index.roles_with(skills)
+    if roles:
+        body = "\n".join(f"- {r}" for r in roles)
+    else:
+        body = "No single role lists all of them. Closest matches:\n" + "\n".join(
+            f"- {r} ({n} of {len(skills)})" for r, n in index.roles_with_any(skills)
+        )
+    return f"### 🔎 Roles that need {named}\n{body}\n\nAsk about any of these roles for its skills, roadmap or projects."
+
+def _plan(snapshot: KnowledgeSnapshot, message: str, intent: str, analysis: MessageAnalysis) -> ResponsePlan:
+    role_data = snapshot.role_data
+    role = analysis.role
+    wants_expansion = analysis.wants_expansion
 
     # ---------- Deterministic Answers ----------
     if intent == "skills_needed":
         if role:
-            skills = ROLE_DATA[role]["skills"]
+            skills = role_data[role]["skills"]
             base = "### 🧠 Key Skills for **{}**\n{}\n\n".format(
                 role, "\n".join(f"- {s}" for s in skills)
             )
+            fallback = "If you want, ask for a roadmap or project ideas."
 
-            if user_wants_expansion(message):
+            if wants_expansion:
                 payload = {"role": role}
-                expanded, _ = call_llm_for_template(
-                    "role_summary",
-                    payload,
-                    model="mistralai/mistral-7b-instruct",
-                    max_tokens=220
-                )
-                if expanded:
-                    return base + expanded
+                return ResponsePlan(base, "role_summary", payload, fallback=fallback)
 
+            return ResponsePlan(base, fallback=fallback)
 
-            return base + "If you want, ask for a roadmap or project ideas."
-
-        return "### 🧠 To list skills, I need a role. Try: *What skills are required for Data Scientist?*"
+        return ResponsePlan("### 🧠 To list skills, I need a role. Try: *What skills are required for Data Scientist?*")
 
     if intent == "roadmap":
         if role:
-            roadmap = ROLE_DATA[role]["roadmap"]
+            roadmap = role_data[role]["roadmap"]
+            step = STEP_REFERENCE.search(message)
+            number = int(step.group(1)) if step else 0
+            if 1 <= number <= len(roadmap):
+                base = "### 🗺️ Step {} of the **{}** Roadmap\n{}\n\n".format(number, role, roadmap[number - 1])
+                fallback = "Ask me to explain this step if you'd like more detail."
+                if wants_expansion:
+                    payload = {"role": role, "number": number, "step": roadmap[number - 1]}
+                    return ResponsePlan(base, "roadmap_step", payload, fallback=fallback)
+                return ResponsePlan(base, fallback=fallback)
+
             base = "### 🗺️ Learning Roadmap for **{}**\n{}\n\n".format(
                 role, "\n".join(f"{i+1}. {step}" for i, step in enumerate(roadmap))
             )
+            fallback = "Ask me to expand any step if you'd like more detail."
 
-            if user_wants_expansion(message):
+            if wants_expansion:
                 payload = {"role": role, "roadmap": "\n".join(roadmap)}
-                expanded, _ = call_llm_for_template(
-                    "roadmap_expansion",
-                    payload,
-                    model="mistralai/mistral-7b-instruct",
-                    max_tokens=240
-                )
-                if expanded:
-                    return base + expanded
+                return ResponsePlan(base, "roadmap_expansion", payload, fallback=fallback)
 
-            return base + "Ask me to expand any step if you'd like more detail."
+            return ResponsePlan(base, fallback=fallback)
 
-        return "### 🗺️ I can give you a roadmap, but I need a role. Try: *Roadmap for Frontend Developer*"
+        return ResponsePlan("### 🗺️ I can give you a roadmap, but I need a role. Try: *Roadmap for Frontend Developer*")
 
     if intent == "projects":
         if role:
-            projects = ROLE_DATA[role]["projects"]
+            projects = role_data[role]["projects"]
             base = "### 💡 Project Ideas for **{}**\n{}\n\n".format(
                 role, "\n".join(f"- {p}" for p in projects)
             )
+            fallback = "If you want, ask me to explain any project in detail."
 
-            if user_wants_expansion(message):
+            if wants_expansion:
                 payload = {"role": role, "projects": "\n".join(projects)}
-                expanded, _ = call_llm_for_template(
-                    "projects_expansion",
-                    payload,
-                    model="mistralai/mistral-7b-instruct",
-                    max_tokens=240
-                )
-
-                if expanded:
-                    return base + expanded
+                return ResponsePlan(base, "projects_expansion", payload, fallback=fallback)
 
-            return base + "If you want, ask me to explain any project in detail."
+            return ResponsePlan(base, fallback=fallback)
 
-        return "### 💡 To suggest the best project ideas, I need a role. Try: *Project ideas for Full Stack Developer*"
+        return ResponsePlan("### 💡 To suggest the best project ideas, I need a role. Try: *Project ideas for Full Stack Developer*")
 
     if intent == "role_info":
         if role:
-            skills = ROLE_DATA[role]["skills"]
+            skills = role_data[role]["skills"]
             base = f"### 📘 About the Role: **{role}**\n"
             base += (
                 f"{role}s typically work on tasks requiring both technical and analytical skills.\n\n"
                 "**Core Skills:**\n" + "\n".join(f"- {s}" for s in skills) + "\n\n"
             )
+            fallback = "I can also provide a roadmap or project ideas."
 
-            if user_wants_expansion(message):
+            if wants_expansion:
                 payload = {"role": role}
-                expanded, _ = call_llm_for_template("role_summary", payload, max_tokens=220)
-                if expanded:
-                    return base + expanded
+                return ResponsePlan(base, "role_summary", payload, fallback=fallback)
 
-            return base + "I can also provide a roadmap or project ideas."
+            return ResponsePlan(base, fallback=fallback)
 
-        return "### 📘 I can explain any tech role, but please mention it. Example: *What is a Data Analyst?*"
+        return ResponsePlan("### 📘 I can explain any tech role, but please mention it. Example: *What is a Data Analyst?*")
 
     # ---------- Role Comparison ----------
     if intent == "compare_roles":
-        msg_low = message.lower()
-        matched_roles = [role for role in ROLE_DATA.keys() if role.lower() in msg_low]
+        matched_roles = analysis.roles
 
         if len(matched_roles) >= 2:
             role_a, role_b = matched_roles[:2]
@@ -354,24 +1181,35 @@ def get_response(message: str, intent: str):
             "role_b": role_b or "Role B"
         }
 
-        llm_out, _ = call_llm_for_template(
-            "compare_roles",
-            payload,
-            model="mistralai/mistral-7b-instruct",
-            max_tokens=260
+        # both roles known: answered from the skill index, the LLM only on request
+        comparison = snapshot.skill_index.compare(role_a, role_b) if len(matched_roles) >= 2 else None
+        if comparison is not None:
+            base = _comparison_answer(snapshot.skill_index, comparison)
+            fallback = "Ask me to compare them in detail if you'd like more."
+            if wants_expansion:
+                return ResponsePlan(base, "compare_roles", payload, fallback=fallback)
+            return ResponsePlan(base, fallback=fallback)
+
+        return ResponsePlan(
+            "", "compare_roles", payload,
+            llm_prefix="### ⚖️ Role Comparison\n\n",
+            fallback=(
+                "### ⚖️ Role Comparison (temporary fallback)\n"
+                "I couldn't reach the LLM right now. Try asking again."
+            ),
         )
 
-        if llm_out:
-            return "### ⚖️ Role Comparison\n\n" + llm_out
-
-        return (
-            "### ⚖️ Role Comparison (temporary fallback)\n"
-            "I couldn't reach the LLM right now. Try asking again."
-        )
+    # ---------- Roles by Skill ----------
+    if intent == "skill_roles":
+        skills = snapshot.skill_index.find_skills(message)
+        if skills:
+            return ResponsePlan(_skill_roles_answer(snapshot.skill_index, skills))
+        # no skill from the dataset named ("which roles suit me?")
+        intent = "general"
 
     # ---------- Resume Tips ----------
     if intent == "resume_tip":
-        return (
+        return ResponsePlan(
             "### 📄 Resume Tips\n"
             "- Keep it one page\n"
             "- Highlight 5–6 relevant skills\n"
@@ -385,21 +1223,169 @@ def get_response(message: str, intent: str):
     # ---------- General → LLM ----------
     if intent == "general":
         payload = {"question": message}
-        llm_out, _ = call_llm_for_template(
-            "general_advice",
-            payload,
-            model="mistralai/mistral-7b-instruct",
-            max_tokens=260
+        return ResponsePlan(
+            "", "general_advice", payload,
+            llm_prefix="### 💬 Answer\n\n",
+            fallback=(
+                "I can help with skills, roadmaps, project ideas, role explanations, and resume tips. "
+                "Try: 'What skills are needed for Data Scientist?'"
+            ),
         )
-        if llm_out:
-            return "### 💬 Answer\n\n" + llm_out
 
-        return (
-            "I can help with skills, roadmaps, project ideas, role explanations, and resume tips. "
-            "Try: 'What skills are needed for Data Scientist?'"
-        )
-
-    return (
+    # ---------- Anything else ----------
+    return ResponsePlan(
         "### 👋 I can help you explore tech careers!\n"
         "Ask about skills, roadmaps, project ideas, roles, or resume tips."
     )
+
+# ---------------------------------------
+# Main response generation (hybrid logic)
+# ---------------------------------------
+def _prefetch_call(plan: ResponsePlan) -> Optional[str]:
+    content, _ = call_llm_for_template(
+        plan.template_key,
+        plan.payload,
+        model=plan.model,
+        max_tokens=plan.max_tokens,
+        use_cache=False,
+        priority=PRIORITY_BACKGROUND,
+        queue_budget=PREFETCH_QUEUE_BUDGET
+    )
+    return content
+
+def _prefetch_followups(plan: ResponsePlan) -> None:
+    """
+    Start the LLM expansions the user is likely to ask for next about the
+    same role (prefetch.TransitionTable) in the background, unless they
+    are precomputed or cached already.
+    """
+    prefetcher = get_prefetcher()
+    if prefetcher is None or plan.intent not in ROLE_SPECIFIC_INTENTS or not plan.role:
+        return
+    snapshot = current_snapshot()
+    if plan.role not in snapshot.role_data:
+        return
+    for intent, _ in prefetcher.table.predict(plan.intent):
+        if intent not in ROLE_SPECIFIC_INTENTS:
+            continue
+        # what _plan makes of "<intent> for <role> in detail"
+        analysis = MessageAnalysis(intent, True, plan.role, (plan.role,))
+        followup = _plan(snapshot, "", intent, analysis)
+        if not followup.template_key:
+            continue
+        key = template_cache_key(followup.template_key, followup.payload, followup.model, followup.max_tokens)
+        if get_answer_pack().get(key, snapshot.fingerprint) is not None or get_llm_cache().get(key) is not None:
+            continue
+        prefetcher.submit(key, partial(_prefetch_call, followup))
+
+def _answered(conversation, message: str, reply: Optional[str], plan: ResponsePlan) -> Optional[str]:
+    """Once a reply is final: record the turn and prefetch likely follow-ups."""
+    if conversation is not None:
+        conversation.record(message, reply, plan)
+    _prefetch_followups(plan)
+    return reply
+
+def get_response(message: str, intent: str, conversation=None):
+    """`conversation`: see plan_response; the answered turn is recorded in it."""
+    metrics.inc("requests_total", intent=intent)
+    with metrics.span("total"):
+        with metrics.span("plan"):
+            plan = plan_response(message, intent, conversation)
+
+        if plan.template_key:
+            llm_out, _ = call_llm_for_template(
+                plan.template_key,
+                plan.payload,
+                model=plan.model,
+                max_tokens=plan.max_tokens,
+                context=plan.context
+            )
+            if llm_out:
+                return _answered(conversation, message, plan.base + plan.llm_prefix + llm_out, plan)
+
+        return _answered(conversation, message, plan.base + plan.fallback, plan)
+
+async def get_response_async(message: str, intent: str, conversation=None):
+    """
+    asyncio version of get_response. Identical concurrent questions are
+    coalesced into one OpenRouter request by call_openrouter_chat_async.
+    """
+    metrics.inc("requests_total", intent=intent)
+    with metrics.span("total"):
+        with metrics.span("plan"):
+            plan = plan_response(message, intent, conversation)
+
+        if plan.template_key:
+            llm_out, _ = await call_llm_for_template_async(
+                plan.template_key,
+                plan.payload,
+                model=plan.model,
+                max_tokens=plan.max_tokens,
+                context=plan.context
+            )
+            if llm_out:
+                return _answered(conversation, message, plan.base + plan.llm_prefix + llm_out, plan)
+
+        return _answered(conversation, message, plan.base + plan.fallback, plan)
+
+async def get_responses_async(messages: List[str]) -> List[Optional[str]]:
+    """Answer many messages concurrently (LLM fan-out bounded by llm's semaphore)."""
+    import asyncio
+
+    return await asyncio.gather(*(get_response_async(m, get_intent(m)) for m in messages))
+
+# after the partial text of an LLM stream that failed midway
+STREAM_CUT_NOTE = "\n\n_(answer cut off)_\n\n"
+
+def stream_response(message: str, intent: str, conversation=None) -> Iterator[str]:
+    """
+    Streaming get_response: yields the deterministic ROLE_DATA part at
+    once, then LLM tokens as they arrive. Joined, the chunks equal what
+    get_response would have returned, except when the LLM stream fails
+    midway: its partial text is kept, followed by STREAM_CUT_NOTE and the
+    plan's fallback (what get_response answers on failure).
+    """
+    metrics.inc("requests_total", intent=intent)
+    with metrics.span("total"):
+        with metrics.span("plan"):
+            plan = plan_response(message, intent, conversation)
+
+        parts = []
+        if plan.base:
+            parts.append(plan.base)
+            yield plan.base
+
+        if plan.template_key:
+            started = False
+            stream = stream_llm_for_template(
+                plan.template_key,
+                plan.payload,
+                model=plan.model,
+                max_tokens=plan.max_tokens,
+                context=plan.context
+            )
+            while True:
+                try:
+                    chunk = next(stream)
+                except StopIteration as stop:
+                    _, result = stop.value
+                    break
+                if not started:
+                    started = True
+                    if plan.llm_prefix:
+                        parts.append(plan.llm_prefix)
+                        yield plan.llm_prefix
+                parts.append(chunk)
+                yield chunk
+            if started:
+                if not result.get("ok"):
+                    tail = STREAM_CUT_NOTE + plan.fallback
+                    parts.append(tail)
+                    yield tail
+                _answered(conversation, message, "".join(parts), plan)
+                return
+
+        if plan.fallback:
+            parts.append(plan.fallback)
+            yield plan.fallback
+        _answered(conversation, message, "".join(parts), plan)
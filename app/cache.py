@@ -0,0 +1,243 @@
+# app/cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(BASE_DIR, "data", "cache", "llm_cache.sqlite3")
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MEMORY_ITEMS = 512
+DEFAULT_DISK_ITEMS = 20000
+
+
+# ---------------------------------------
+# Keys
+# ---------------------------------------
+def make_cache_key(template_key: str, prompt: str, model: str, max_tokens: int) -> str:
+    """
+    Content-addressed key: identical template + formatted prompt + model
+    + max_tokens always map to the same entry.
+    """
+    raw = json.dumps([template_key, prompt, model, int(max_tokens)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    Short content hash of a file, used as the cache namespace so that
+    editing role_skill_map.json invalidates every cached answer.
+    """
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(65536), b""):
+                h.update(block)
+    except OSError:
+        return "missing"
+    return h.hexdigest()[:16]
+
+
+# ---------------------------------------
+# Two-level cache (memory LRU -> SQLite)
+# ---------------------------------------
+class ResponseCache:
+    """
+    In-process LRU in front of an on-disk SQLite store.
+
+    Entries older than `ttl_seconds` are treated as misses. The memory tier
+    holds at most `max_memory_items`, the disk tier at most `max_disk_items`
+    (least recently used rows are evicted first). Every entry carries a
+    `namespace`; rows from any other namespace are dropped on open.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = CACHE_PATH,
+        namespace: str = "",
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_memory_items: int = DEFAULT_MEMORY_ITEMS,
+        max_disk_items: int = DEFAULT_DISK_ITEMS,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes_since_evict = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+        if path:
+            self._open_disk(path)
+
+    def _open_disk(self, path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " namespace TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed)")
+            conn.execute("DELETE FROM llm_cache WHERE namespace != ?", (self.namespace,))
+            conn.commit()
+            self._conn = conn
+        except (sqlite3.Error, OSError):
+            # read-only or broken disk: keep working memory-only
+            self._conn = None
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self._counters["expired"] += 1
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value, created FROM llm_cache WHERE key = ? AND namespace = ?",
+                        (key, self.namespace),
+                    ).fetchone()
+                    if row is not None:
+                        value, created = row
+                        if not self._expired(created, now):
+                            self._conn.execute(
+                                "UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key)
+                            )
+                            self._conn.commit()
+                            self._remember(key, value, created)
+                            self._counters["disk_hits"] += 1
+                            return value
+                        self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        self._conn.commit()
+                        self._counters["expired"] += 1
+                except sqlite3.Error:
+                    pass
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str, namespace: Optional[str] = None) -> None:
+        """
+        Store `value`. Pass the `namespace` read before computing it to
+        drop the write if the namespace changed in the meantime (the value
+        was built from data that is no longer current).
+        """
+        now = time.time()
+        with self._lock:
+            if namespace is not None and namespace != self.namespace:
+                return
+            self._remember(key, value, now)
+            self._counters["sets"] += 1
+
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, namespace, value, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, self.namespace, value, now, now),
+                )
+                self._conn.commit()
+                self._writes_since_evict += 1
+                if self._writes_since_evict >= 64:
+                    self._evict_disk()
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, key: str, value: str, created: float) -> None:
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _evict_disk(self) -> None:
+        self._writes_since_evict = 0
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_disk_items
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY accessed ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._counters["evictions"] += overflow
+        self._conn.commit()
+
+    def set_namespace(self, namespace: str) -> None:
+        """
+        Switch to a new namespace (e.g. a new dataset fingerprint),
+        discarding every entry written under the old one.
+        """
+        with self._lock:
+            if namespace == self.namespace:
+                return
+            self.namespace = namespace
+            self._memory.clear()
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM llm_cache WHERE namespace != ?", (namespace,))
+                    self._conn.commit()
+                except sqlite3.Error:
+                    pass
+
+    def invalidate(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                try:
+                    self._conn.execute("DELETE FROM llm_cache")
+                    self._conn.commit()
+                except sqlite3.Error:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_items"] = len(self._memory)
+            stats["namespace"] = self.namespace
+            stats["disk_items"] = None
+            if self._conn is not None:
+                try:
+                    (stats["disk_items"],) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+                except sqlite3.Error:
+                    pass
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
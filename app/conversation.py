@@ -0,0 +1,94 @@
+# app/conversation.py
+import os
+import re
+from collections import deque
+from typing import Dict, List, Optional
+
+from token_budget import estimate_tokens, trim_text
+
+# prompt tokens allowed for earlier turns in an LLM call
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CHATBOT_CONTEXT_TOKENS", "600"))
+RECENT_TURNS = 6        # messages kept verbatim (user + assistant)
+SUMMARY_LINES = 12      # one-line digests of the turns before those
+DIGEST_CHARS = 120
+
+_MARKUP = re.compile(r"[#*_`>|]+")
+
+
+def digest(content: str) -> str:
+    """First meaningful line of a message, without Markdown markup."""
+    for line in content.splitlines():
+        line = _MARKUP.sub("", line).strip(" -")
+        if line:
+            return line[:DIGEST_CHARS]
+    return ""
+
+
+class ConversationState:
+    """
+    What a chat session has established so far, carried across turns (in
+    st.session_state): the last role / intent / deterministic answer, the
+    last few messages verbatim and a bounded digest of older ones. Memory
+    stays constant however long the session runs.
+    """
+
+    def __init__(self):
+        self.last_role: Optional[str] = None
+        self.last_roles: tuple = ()
+        self.last_intent: Optional[str] = None
+        self.last_answer: str = ""     # last ROLE_DATA (non-LLM) part of a reply
+        self.turns = 0
+        self.recent: deque = deque(maxlen=RECENT_TURNS)
+        self.summary: deque = deque(maxlen=SUMMARY_LINES)
+
+    def _push(self, role: str, content: str) -> None:
+        if len(self.recent) == self.recent.maxlen:
+            old = self.recent[0]
+            line = digest(old["content"])
+            if line:
+                self.summary.append(f"{old['role']}: {line}")
+        self.recent.append({"role": role, "content": content})
+
+    def record(self, message: str, reply: str, plan=None) -> None:
+        """Fold one answered turn in; `plan` is the ResponsePlan that produced `reply`."""
+        self.turns += 1
+        if plan is not None:
+            self.last_intent = plan.intent or self.last_intent
+            if plan.role:
+                self.last_role = plan.role
+                self.last_roles = plan.roles or (plan.role,)
+            if plan.base:
+                self.last_answer = plan.base
+        self._push("user", message)
+        self._push("assistant", reply or "")
+
+    def build_context(self, budget: int = CONTEXT_TOKEN_BUDGET) -> List[Dict[str, str]]:
+        """
+        Earlier turns as chat messages for the next LLM call, within
+        `budget` tokens: the newest messages verbatim (each capped at a
+        third of the budget), then, space permitting, one system note
+        with digests of everything older.
+        """
+        picked: List[Dict[str, str]] = []
+        left = budget
+        per_message = max(1, budget // 3)
+        recent = list(self.recent)
+        while recent:
+            content = trim_text(recent[-1]["content"], per_message)
+            cost = estimate_tokens(content)
+            if cost > left:
+                break
+            picked.append({"role": recent.pop()["role"], "content": content})
+            left -= cost
+        picked.reverse()
+
+        # older turns, and recent ones that did not fit verbatim, as digests
+        lines = list(self.summary) + [f"{m['role']}: {digest(m['content'])}" for m in recent]
+        note = ""
+        while lines:
+            note = "Earlier in this conversation:\n" + "\n".join(f"- {line}" for line in lines)
+            if estimate_tokens(note) <= left:
+                break
+            lines.pop(0)    # oldest first
+            note = ""
+        return ([{"role": "system", "content": note}] if note else []) + picked
@@ -0,0 +1,465 @@
+# app/knowledge_store.py
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_PATH = os.path.join(BASE_DIR, "data", "role_skill_map.json")
+RAW_DIR = os.path.join(BASE_DIR, "data", "raw")
+STORE_PATH = os.path.join(BASE_DIR, "data", "cache", "role_store.bin")
+
+MAGIC = b"RKS1"
+FORMAT_VERSION = 1
+# magic, version, n_strings, n_roles, table_size, n_fields, n_items,
+# blob_size, stat signature, content fingerprint
+_HEADER = struct.Struct("<4sIIIIIIQ16s16s")
+_ALIGN = 8
+
+# value kinds, one byte per (role, field)
+_MISSING, _LIST, _TEXT = 0, 1, 2
+
+# data/raw file stem -> ROLE_DATA field its rows are appended to
+RAW_FIELDS = {
+    "skills": "skills",
+    "roadmaps": "roadmap",
+    "roadmap": "roadmap",
+    "project_ideas": "projects",
+    "projects": "projects",
+}
+_ROLE_COLUMNS = ("role", "role_name", "job_role", "title")
+_ITEM_COLUMNS = ("skill", "step", "project", "project_idea", "idea", "name", "item")
+
+Value = Union[Tuple[str, ...], str]
+
+
+# ---------------------------------------
+# Sources
+# ---------------------------------------
+def raw_files(raw_dir: Optional[str] = RAW_DIR) -> List[str]:
+    if not raw_dir or not os.path.isdir(raw_dir):
+        return []
+    return sorted(
+        os.path.join(raw_dir, name)
+        for name in os.listdir(raw_dir)
+        if name.lower().endswith((".csv", ".xlsx"))
+    )
+
+def source_files(source_path: str = SOURCE_PATH, raw_dir: Optional[str] = RAW_DIR) -> List[str]:
+    return [source_path] + raw_files(raw_dir)
+
+def stat_signature(paths: Sequence[str]) -> str:
+    """Cheap staleness check: names, sizes and mtimes of every source."""
+    h = hashlib.sha256()
+    for path in paths:
+        try:
+            st = os.stat(path)
+            h.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+        except OSError:
+            h.update(f"{path}\0missing\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def content_fingerprint(paths: Sequence[str]) -> str:
+    """Content hash of every source (what the store was compiled from)."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(os.path.basename(path).encode("utf-8") + b"\0")
+        try:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(65536), b""):
+                    h.update(block)
+        except OSError:
+            h.update(b"missing")
+    return h.hexdigest()[:16]
+
+def _read_rows(path: str) -> List[Dict[str, str]]:
+    if path.lower().endswith(".xlsx"):
+        import pandas as pd  # only needed for the spreadsheet sources
+        frame = pd.read_excel(path, dtype=str).fillna("")
+        return frame.to_dict(orient="records")
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+def _pick_column(columns: List[str], preferred: Sequence[str], default: int) -> Optional[str]:
+    lowered = {c.strip().lower(): c for c in columns}
+    for name in preferred:
+        if name in lowered:
+            return lowered[name]
+    return columns[default] if len(columns) > default else None
+
+def merge_raw_sources(role_data: Dict[str, dict], raw_dir: Optional[str] = RAW_DIR) -> Dict[str, dict]:
+    """
+    Fold the curated CSV/XLSX tables into `role_data` (in place).
+
+    skills / roadmaps / project_ideas rows are (role, item) pairs appended
+    to the matching list when not already present; other columns of
+    roles.csv become text fields of the role. The JSON map wins on conflict.
+    """
+    for path in raw_files(raw_dir):
+        stem = os.path.splitext(os.path.basename(path))[0].lower()
+        rows = _read_rows(path)
+        if not rows:
+            continue
+        columns = list(rows[0].keys())
+        role_col = _pick_column(columns, _ROLE_COLUMNS, 0)
+        if role_col is None:
+            continue
+
+        field = RAW_FIELDS.get(stem)
+        item_col = _pick_column([c for c in columns if c != role_col], _ITEM_COLUMNS, 0) if field else None
+        for row in rows:
+            role = str(row.get(role_col) or "").strip()
+            if not role:
+                continue
+            if role not in role_data:
+                # roles only known from data/raw still get every list field
+                role_data[role] = {f: [] for f in dict.fromkeys(RAW_FIELDS.values())}
+            info = role_data[role]
+            if field and item_col:
+                item = str(row.get(item_col) or "").strip()
+                items = info.setdefault(field, [])
+                if item and item not in items:
+                    items.append(item)
+            elif stem == "roles":
+                for col in columns:
+                    value = str(row.get(col) or "").strip()
+                    key = col.strip().lower()
+                    if col != role_col and value and key not in info:
+                        info[key] = value
+    return role_data
+
+def load_sources(source_path: str = SOURCE_PATH, raw_dir: Optional[str] = RAW_DIR) -> Dict[str, dict]:
+    with open(source_path, "r", encoding="utf-8") as f:
+        role_data = json.load(f)
+    return merge_raw_sources(role_data, raw_dir)
+
+
+# ---------------------------------------
+# Compile
+# ---------------------------------------
+def _aligned(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def _name_hash(name: bytes) -> int:
+    return zlib.crc32(name)
+
+def _table_size(n_roles: int) -> int:
+    size = 8
+    while size < 2 * n_roles:
+        size <<= 1
+    return size
+
+def compile_store(role_data: Dict[str, dict], stat_sig: str = "", fingerprint: str = "") -> bytes:
+    """
+    Serialize {role: {field: [str] | str}} into the store layout:
+
+        header
+        str_offsets  uint64[n_strings + 1]   (into blob)
+        role_names   uint32[n_roles]         string id per role, dataset order
+        role_table   uint32[table_size]      open-addressing hash of role names
+                                             (ordinal + 1, 0 = empty slot)
+        field_names  uint32[n_fields]
+        kinds        uint8[n_roles * n_fields]
+        value_ptr    uint32[n_roles * n_fields + 1]   (into items)
+        items        uint32[n_items]         string ids
+        blob         utf-8 bytes of every distinct string
+
+    Strings are deduplicated, so a skill shared by many roles is stored once.
+    """
+    strings: Dict[str, int] = {}
+
+    def sid(text: str) -> int:
+        i = strings.get(text)
+        if i is None:
+            i = strings[text] = len(strings)
+        return i
+
+    roles = list(role_data.keys())
+    fields: List[str] = []
+    for info in role_data.values():
+        for field in info:
+            if field not in fields:
+                fields.append(field)
+    field_pos = {f: i for i, f in enumerate(fields)}
+
+    role_names = array("I", (sid(r) for r in roles))
+    field_names = array("I", (sid(f) for f in fields))
+    kinds = bytearray(len(roles) * len(fields))
+    value_ptr = array("I", [0])
+    items = array("I")
+    for r, role in enumerate(roles):
+        slots = {}
+        for field, value in role_data[role].items():
+            if isinstance(value, str):
+                slots[field_pos[field]] = (_TEXT, [value])
+            elif isinstance(value, (list, tuple)):
+                slots[field_pos[field]] = (_LIST, [str(v) for v in value])
+            else:
+                raise ValueError(f"unsupported value for {role!r}/{field!r}: {type(value).__name__}")
+        for f in range(len(fields)):
+            kind, values = slots.get(f, (_MISSING, ()))
+            kinds[r * len(fields) + f] = kind
+            items.extend(sid(v) for v in values)
+            value_ptr.append(len(items))
+
+    encoded = [s.encode("utf-8") for s in strings]
+    str_offsets = array("Q", [0])
+    for b in encoded:
+        str_offsets.append(str_offsets[-1] + len(b))
+    blob = b"".join(encoded)
+
+    size = _table_size(len(roles))
+    role_table = array("I", bytes(4 * size))
+    for ordinal, i in enumerate(role_names):
+        slot = _name_hash(encoded[i]) & (size - 1)
+        while role_table[slot]:
+            slot = (slot + 1) & (size - 1)
+        role_table[slot] = ordinal + 1
+
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(encoded), len(roles), size, len(fields), len(items), len(blob),
+        stat_sig.encode("ascii")[:16].ljust(16, b"\0"), fingerprint.encode("ascii")[:16].ljust(16, b"\0"),
+    )
+    parts = [header]
+    for arr in (str_offsets, role_names, role_table, field_names, kinds, value_ptr, items):
+        chunk = bytes(arr) if isinstance(arr, bytearray) else arr.tobytes()
+        parts.append(chunk + b"\0" * (_aligned(len(chunk)) - len(chunk)))
+    parts.append(blob)
+    return b"".join(parts)
+
+def write_store(data: bytes, path: str = STORE_PATH) -> None:
+    """Atomic replace: processes that mapped the old file keep reading it."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------
+# Read-only views
+# ---------------------------------------
+class RoleRecord(Mapping):
+    """One role's fields, decoded on access (lists come back as tuples)."""
+
+    __slots__ = ("_store", "_ordinal", "name")
+
+    def __init__(self, store: "KnowledgeStore", ordinal: int, name: str):
+        self._store = store
+        self._ordinal = ordinal
+        self.name = name
+
+    def __getitem__(self, field: str) -> Value:
+        value = self._store._value(self._ordinal, field)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store._fields_of(self._ordinal))
+
+    def __len__(self) -> int:
+        return len(self._store._fields_of(self._ordinal))
+
+    def to_dict(self) -> Dict[str, Union[List[str], str]]:
+        return {f: (list(v) if isinstance(v, tuple) else v) for f, v in self.items()}
+
+    def __repr__(self) -> str:
+        return f"RoleRecord({self.name!r})"
+
+
+class KnowledgeStore(Mapping):
+    """
+    Read-only {role: {field: values}} mapping over a compiled store.
+
+    Nothing is decoded up front: opening maps the file and casts its
+    sections to typed memoryviews, so import cost and private memory do
+    not grow with the number of roles; the pages themselves are shared by
+    every process through the OS page cache. Role lookup is one probe of
+    the on-disk hash table; iteration keeps dataset order.
+    """
+
+    def __init__(self, buffer, path: Optional[str] = None):
+        self.path = path
+        self._buffer = buffer
+        (magic, version, n_strings, n_roles, table_size, n_fields, n_items, blob_size,
+         stat_sig, fingerprint) = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("not a role knowledge store (or an older format)")
+        self.stat_signature = stat_sig.rstrip(b"\0").decode("ascii")
+        self.fingerprint = fingerprint.rstrip(b"\0").decode("ascii")
+
+        view = memoryview(buffer)
+        offset = _HEADER.size
+        sections = []
+        for fmt, count in (
+            ("Q", n_strings + 1),
+            ("I", n_roles),
+            ("I", table_size),
+            ("I", n_fields),
+            ("B", n_roles * n_fields),
+            ("I", n_roles * n_fields + 1),
+            ("I", n_items),
+        ):
+            nbytes = count * struct.calcsize(fmt)
+            sections.append(view[offset:offset + nbytes].cast(fmt))
+            offset += _aligned(nbytes)
+        (self._str_offsets, self._role_names, self._role_table, self._field_ids,
+         self._kinds, self._value_ptr, self._items) = sections
+        self._blob = view[offset:offset + blob_size]
+        self._views = sections + [self._blob, view]
+
+        self._n_roles = n_roles
+        self._n_fields = n_fields
+        self._mask = table_size - 1
+        self.fields = tuple(self._string(i) for i in self._field_ids)
+        self._field_pos = {f: i for i, f in enumerate(self.fields)}
+
+    # ---------- open ----------
+    @classmethod
+    def open(cls, path: str = STORE_PATH) -> "KnowledgeStore":
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer, path)
+
+    @classmethod
+    def from_dict(cls, role_data: Dict[str, dict]) -> "KnowledgeStore":
+        return cls(compile_store(role_data))
+
+    # ---------- decoding ----------
+    def _string(self, i: int) -> str:
+        return str(self._blob[self._str_offsets[i]:self._str_offsets[i + 1]], "utf-8")
+
+    def _find(self, role: str) -> int:
+        if not isinstance(role, str):
+            return -1
+        key = role.encode("utf-8")
+        slot = _name_hash(key) & self._mask
+        while True:
+            entry = self._role_table[slot]
+            if not entry:
+                return -1
+            i = self._role_names[entry - 1]
+            if self._blob[self._str_offsets[i]:self._str_offsets[i + 1]] == key:
+                return entry - 1
+            slot = (slot + 1) & self._mask
+
+    def _value(self, ordinal: int, field: str) -> Optional[Value]:
+        f = self._field_pos.get(field)
+        if f is None:
+            return None
+        slot = ordinal * self._n_fields + f
+        kind = self._kinds[slot]
+        if kind == _MISSING:
+            return None
+        string = self._string
+        values = tuple(string(i) for i in self._items[self._value_ptr[slot]:self._value_ptr[slot + 1]])
+        return values[0] if kind == _TEXT else values
+
+    def _fields_of(self, ordinal: int) -> List[str]:
+        start = ordinal * self._n_fields
+        return [f for k, f in zip(self._kinds[start:start + self._n_fields], self.fields) if k]
+
+    # ---------- Mapping ----------
+    def __getitem__(self, role: str) -> RoleRecord:
+        ordinal = self._find(role)
+        if ordinal < 0:
+            raise KeyError(role)
+        return RoleRecord(self, ordinal, role)
+
+    def __contains__(self, role) -> bool:
+        return self._find(role) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        for i in self._role_names:
+            yield self._string(i)
+
+    def __len__(self) -> int:
+        return self._n_roles
+
+    def to_dict(self) -> Dict[str, dict]:
+        return {role: self[role].to_dict() for role in self}
+
+    def close(self) -> None:
+        """Release the mapping; views handed out earlier become invalid."""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    def __repr__(self) -> str:
+        return f"KnowledgeStore({self.path or '<memory>'}, roles={self._n_roles})"
+
+
+def restamp(store: KnowledgeStore, stat_sig: str) -> bytes:
+    """Copy of `store` with a new stat signature in its header."""
+    data = bytearray(store._buffer)
+    fields = list(_HEADER.unpack_from(data, 0))
+    fields[8] = stat_sig.encode("ascii")[:16].ljust(16, b"\0")
+    _HEADER.pack_into(data, 0, *fields)
+    return bytes(data)
+
+
+# ---------------------------------------
+# Build-or-open
+# ---------------------------------------
+def build_store(
+    source_path: str = SOURCE_PATH,
+    raw_dir: Optional[str] = RAW_DIR,
+    store_path: Optional[str] = STORE_PATH,
+) -> bytes:
+    """Compile the sources; write the store to `store_path` if given."""
+    paths = source_files(source_path, raw_dir)
+    data = compile_store(
+        load_sources(source_path, raw_dir),
+        stat_sig=stat_signature(paths),
+        fingerprint=content_fingerprint(paths),
+    )
+    if store_path:
+        write_store(data, store_path)
+    return data
+
+def load_store(
+    source_path: str = SOURCE_PATH,
+    raw_dir: Optional[str] = RAW_DIR,
+    store_path: str = STORE_PATH,
+) -> KnowledgeStore:
+    """
+    Open the compiled store, recompiling it first if the sources changed.
+
+    Staleness is checked by stat (sizes/mtimes) and, only when that
+    differs, by content hash, so an unchanged dataset costs a few stat
+    calls. If the store cannot be written (read-only checkout) the
+    compiled bytes are served from memory instead.
+    """
+    paths = source_files(source_path, raw_dir)
+    stat_sig = stat_signature(paths)
+    store = None
+    try:
+        store = KnowledgeStore.open(store_path)
+    except (OSError, ValueError, struct.error):
+        pass
+
+    data = None
+    if store is not None:
+        if store.stat_signature == stat_sig:
+            return store
+        if store.fingerprint == content_fingerprint(paths):
+            # sources were touched, not changed: restamp instead of recompiling
+            data = restamp(store, stat_sig)
+        store.close()
+
+    if data is None:
+        data = build_store(source_path, raw_dir, store_path=None)
+    try:
+        write_store(data, store_path)
+        return KnowledgeStore.open(store_path)
+    except OSError:
+        return KnowledgeStore(data)
@@ -1,12 +1,53 @@
 # app/llm.py
+import hashlib
+import heapq
+import itertools
+import json
+import logging
 import os
-import requests
+import random
+import socket
+import threading
 import time
-from typing import List, Dict, Any, Optional
+import weakref
+from collections import deque
+from functools import lru_cache
+from typing import List, Dict, Any, Generator, Optional
 
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+import metrics
+
+log = logging.getLogger(__name__)
+
+# overridable to point at a local stand-in (benchmarks/mock_openrouter.py)
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 DEFAULT_MODEL = "mistralai/mistral-7b-instruct"
 
+DEFAULT_POOL_CONNECTIONS = int(os.getenv("OPENROUTER_POOL_CONNECTIONS", "4"))
+DEFAULT_POOL_MAXSIZE = int(os.getenv("OPENROUTER_POOL_MAXSIZE", "16"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "32"))
+
+# shared request scheduler (see RateScheduler); OPENROUTER_RATE_LIMIT=0 turns it off
+RATE_LIMIT_ENABLED = os.getenv("OPENROUTER_RATE_LIMIT", "1").lower() not in ("0", "false", "no")
+DEFAULT_RATE = float(os.getenv("OPENROUTER_RATE", "2.0"))          # starting requests/s
+DEFAULT_MAX_RATE = float(os.getenv("OPENROUTER_RATE_MAX", "20.0"))
+DEFAULT_BURST = float(os.getenv("OPENROUTER_BURST", "4"))
+# longest a user-facing request may wait for a slot before it is shed
+DEFAULT_QUEUE_BUDGET = float(os.getenv("OPENROUTER_QUEUE_BUDGET", "4.0"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# shared circuit breaker (see CircuitBreaker); OPENROUTER_BREAKER=0 turns it off
+BREAKER_ENABLED = os.getenv("OPENROUTER_BREAKER", "1").lower() not in ("0", "false", "no")
+BREAKER_WINDOW = 20               # recent attempts the rates are taken over
+BREAKER_MIN_CALLS = 5             # attempts needed before the breaker may open
+BREAKER_ERROR_RATE = float(os.getenv("OPENROUTER_BREAKER_ERROR_RATE", "0.5"))
+# a successful attempt slower than this (seconds to response headers) counts as slow
+BREAKER_SLOW_SECONDS = float(os.getenv("OPENROUTER_BREAKER_SLOW_SECONDS", "10"))
+BREAKER_SLOW_RATE = 0.8
+BREAKER_OPEN_SECONDS = float(os.getenv("OPENROUTER_BREAKER_OPEN_SECONDS", "15"))
+BREAKER_MAX_OPEN_SECONDS = 120.0
+
 def _get_api_key() -> str:
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
@@ -15,6 +56,12 @@ def _get_api_key() -> str:
         )
     return api_key
 
+def _note_retry(reason: str, delay: float) -> float:
+    """Count a retry and the backoff about to be slept; returns `delay`."""
+    metrics.inc("llm_retries_total", reason=reason)
+    metrics.inc("llm_backoff_seconds_total", delay)
+    return delay
+
 def _parse_openrouter_response(resp_json: Dict[str, Any]) -> Optional[str]:
     """
     Parse typical OpenRouter-like chat response shapes robustly.
@@ -38,6 +85,723 @@ def _parse_openrouter_response(resp_json: Dict[str, Any]) -> Optional[str]:
     # last resort: look for top-level 'result' or 'data'
     return None
 
+# ---------------------------------------
+# Pooled HTTP client
+# ---------------------------------------
+# requests / urllib3 (and asyncio / httpx for the async path) are imported
+# on first use, not with this module: a session that only gets ROLE_DATA
+# answers never loads the HTTP stack.
+_timing_local = threading.local()
+
+def _record_connect(seconds: float) -> None:
+    _timing_local.connect_s = getattr(_timing_local, "connect_s", 0.0) + seconds
+
+
+class CancelToken(threading.Event):
+    """
+    Event for call_openrouter_chat(cancel=...) whose set() also aborts the
+    request in flight, not just the retries after it: the socket a
+    post() is waiting on is shut down, so the thread and the pooled
+    connection come free at once instead of after the read timeout.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks: List[Any] = []
+        self._callbacks_lock = threading.Lock()
+
+    def set(self) -> None:
+        super().set()
+        with self._callbacks_lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_set(self, callback) -> None:
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def discard(self, callback) -> None:
+        with self._callbacks_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+class _InFlight:
+    """
+    The connection one post() is waiting on (from sending the request
+    until the response headers arrive; it cannot be back in the pool
+    then), so another thread can abort it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = None
+        self.aborted = False
+
+    def attach(self, conn) -> None:
+        with self.lock:
+            if self.aborted:
+                raise ConnectionAbortedError("request cancelled")
+            self.conn = conn
+
+    def detach(self) -> None:
+        with self.lock:
+            self.conn = None
+
+    def abort(self) -> None:
+        with self.lock:
+            self.aborted = True
+            sock = getattr(self.conn, "sock", None)
+            if sock is not None:
+                try:
+                    # the blocked read returns at once; urllib3 then drops the connection
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+@lru_cache(maxsize=None)
+def _timed_adapter_class():
+    """
+    HTTPAdapter whose connections report DNS+TCP+TLS setup time and can
+    be aborted by a CancelToken while waiting for the response.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class _Tracked:
+        def connect(self):
+            start = time.perf_counter()
+            super().connect()
+            _record_connect(time.perf_counter() - start)
+
+        def request(self, *args, **kwargs):
+            inflight = getattr(_timing_local, "inflight", None)
+            if inflight is not None:
+                inflight.attach(self)
+            super().request(*args, **kwargs)
+
+        def getresponse(self, *args, **kwargs):
+            try:
+                return super().getresponse(*args, **kwargs)
+            finally:
+                inflight = getattr(_timing_local, "inflight", None)
+                if inflight is not None:
+                    inflight.detach()
+
+    class _TimedHTTPConnection(_Tracked, HTTPConnection):
+        pass
+
+    class _TimedHTTPSConnection(_Tracked, HTTPSConnection):
+        pass
+
+    class _TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = _TimedHTTPConnection
+
+    class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = _TimedHTTPSConnection
+
+    class _TimedAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _TimedHTTPConnectionPool,
+                "https": _TimedHTTPSConnectionPool,
+            }
+
+    return _TimedAdapter
+
+class OpenRouterClient:
+    """
+    Reusable, thread-safe OpenRouter client.
+
+    All threads share one connection pool (`pool_maxsize` keep-alive
+    connections per host, at most `pool_connections` hosts); each thread
+    gets its own lightweight requests.Session mounted on that pool, so
+    cookie/header state is never shared across threads. The API key and
+    headers are resolved once, on first use.
+    """
+
+    def __init__(
+        self,
+        url: str = OPENROUTER_URL,
+        api_key: Optional[str] = None,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        pool_block: bool = True,
+        keep_alive: bool = True,
+    ):
+        self.url = url
+        self.keep_alive = keep_alive
+        self._api_key = api_key
+        self._headers: Optional[Dict[str, str]] = None
+        self._adapter = _timed_adapter_class()(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0,
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self._headers is None:
+            with self._lock:
+                if self._headers is None:
+                    headers = {
+                        "Authorization": f"Bearer {self._api_key or _get_api_key()}",
+                        "Content-Type": "application/json",
+                        "HTTP-Referer": "http://localhost",
+                        "X-Title": "StudentCareerChatbot",
+                    }
+                    if not self.keep_alive:
+                        headers["Connection"] = "close"
+                    self._headers = headers
+        return self._headers
+
+    @property
+    def session(self) -> "requests.Session":
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+        return session
+
+    def post(self, payload: Dict[str, Any], timeout: float, cancel: Optional[CancelToken] = None):
+        """
+        POST `payload` and fully read the body.
+        Returns (response, timing) where timing has connect_s (0.0 when a
+        pooled connection was reused), ttfb_s and total_s. Setting
+        `cancel` while waiting for the response makes this raise a
+        requests.ConnectionError.
+        """
+        headers = self.headers
+        _timing_local.connect_s = 0.0
+        start = time.perf_counter()
+        inflight = _InFlight() if isinstance(cancel, CancelToken) else None
+        if inflight is not None:
+            _timing_local.inflight = inflight
+            cancel.on_set(inflight.abort)
+        try:
+            resp = self.session.post(self.url, headers=headers, json=payload, timeout=timeout, stream=True)
+        finally:
+            if inflight is not None:
+                _timing_local.inflight = None
+                inflight.detach()
+                cancel.discard(inflight.abort)
+        ttfb = time.perf_counter() - start
+        try:
+            resp.content  # read the body so the connection returns to the pool
+        finally:
+            resp.close()
+        total = time.perf_counter() - start
+        connect = _timing_local.connect_s
+        timing = {
+            "connect_s": round(connect, 6),
+            "ttfb_s": round(ttfb, 6),
+            "total_s": round(total, 6),
+            "reused_connection": connect == 0.0,
+        }
+        return resp, timing
+
+    def open_stream(self, payload: Dict[str, Any], timeout: float):
+        """
+        POST `payload` with `stream: true` and return the open response
+        (headers read, body not consumed) plus its connect/ttfb timing.
+        The caller must close the response.
+        """
+        headers = dict(self.headers, Accept="text/event-stream")
+        _timing_local.connect_s = 0.0
+        start = time.perf_counter()
+        resp = self.session.post(
+            self.url, headers=headers, json=dict(payload, stream=True), timeout=timeout, stream=True
+        )
+        connect = _timing_local.connect_s
+        timing = {
+            "connect_s": round(connect, 6),
+            "ttfb_s": round(time.perf_counter() - start, 6),
+            "reused_connection": connect == 0.0,
+        }
+        return resp, timing
+
+    def close(self) -> None:
+        self._adapter.close()
+
+_default_client: Optional[OpenRouterClient] = None
+_default_client_lock = threading.Lock()
+
+def get_client() -> OpenRouterClient:
+    """Process-wide shared client (created on first use)."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = OpenRouterClient()
+    return _default_client
+
+# ---------------------------------------
+# Adaptive rate limiting
+# ---------------------------------------
+class _Waiter:
+    __slots__ = ("priority", "seq", "deadline", "done", "granted", "event", "loop", "future")
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.deadline: Optional[float] = None
+        self.done = False
+        self.granted = False
+        self.event: Optional[threading.Event] = None
+        self.loop = None
+        self.future = None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self, granted: bool) -> None:
+        self.done = True
+        self.granted = granted
+        if self.future is None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(_resolve_future, self.future, granted)
+        except RuntimeError:
+            pass  # loop already closed
+
+def _resolve_future(future: "asyncio.Future", granted: bool) -> None:
+    if not future.done():
+        future.set_result(granted)
+
+class RateScheduler:
+    """
+    Token bucket shared by every OpenRouter call in the process, with an
+    AIMD rate: each 200 adds `increase` req/s, each 429/503 multiplies the
+    rate by `decrease` (at most once per second, so one burst of rejections
+    counts once) and honours Retry-After by pausing the bucket.
+
+    Callers wait in a priority queue (lower number first, FIFO within a
+    priority) served by one dispatcher thread. With a `budget`, a caller
+    whose estimated wait is longer is refused up front, and one still
+    queued when the budget runs out is dropped: acquire() returns None.
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        max_rate: float = DEFAULT_MAX_RATE,
+        min_rate: float = 0.05,
+        burst: float = DEFAULT_BURST,
+        increase: float = 0.1,
+        decrease: float = 0.5,
+    ):
+        self.rate = max(min_rate, min(rate, max_rate))
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = max(1.0, burst)
+        self.increase = increase
+        self.decrease = decrease
+        self.stats = {"granted": 0, "shed": 0, "throttled": 0}
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- bucket --------------------------------------------------------
+    def _refill(self, now: float) -> None:
+        # nothing accrues while paused by Retry-After
+        start = max(self._stamp, self._paused_until)
+        if now > start:
+            self._tokens = min(self.burst, self._tokens + (now - start) * self.rate)
+        self._stamp = max(self._stamp, now)
+
+    def _estimate(self, priority: int, now: float) -> float:
+        ahead = sum(1 for w in self._queue if not w.done and w.priority <= priority)
+        wait = max(0.0, self._paused_until - now)
+        deficit = ahead + 1 - self._tokens
+        if deficit > 0:
+            wait += deficit / self.rate
+        return wait
+
+    def estimated_wait(self, priority: int = PRIORITY_INTERACTIVE) -> float:
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return self._estimate(priority, now)
+
+    def record(self, status: Any, retry_after: Optional[float] = None) -> None:
+        """Feed back the outcome of a request (HTTP status code)."""
+        with self._cond:
+            now = time.monotonic()
+            if status in (429, 503):
+                self.stats["throttled"] += 1
+                self._refill(now)
+                self._tokens = 0.0
+                if now - self._last_decrease >= 1.0:
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                    self._last_decrease = now
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + min(retry_after, 60.0))
+            elif status == 200:
+                self._refill(now)
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            self._cond.notify()
+
+    # -- queue ---------------------------------------------------------
+    def _enqueue(self, waiter: _Waiter, budget: Optional[float]) -> Optional[bool]:
+        """True: granted right away; False: shed; None: queued."""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if not self._queue and now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                self.stats["granted"] += 1
+                return True
+            if budget is not None and self._estimate(waiter.priority, now) > budget:
+                self.stats["shed"] += 1
+                return False
+            if budget is not None:
+                waiter.deadline = now + budget
+            heapq.heappush(self._queue, waiter)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name="openrouter-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return None
+
+    def _shed_late(self, now: float) -> None:
+        # after a slowdown, drop waiters that can no longer make their
+        # deadline now rather than when it expires
+        start = max(now, self._paused_until)
+        position = 0
+        for w in sorted(self._queue):
+            if w.done:
+                continue
+            position += 1
+            ready = start + max(0.0, position - self._tokens) / self.rate
+            if w.deadline is not None and ready > w.deadline:
+                self.stats["shed"] += 1
+                w.wake(False)
+                position -= 1
+
+    def _dispatch(self) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                self._shed_late(now)
+                while self._queue and self._queue[0].done:
+                    heapq.heappop(self._queue)
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats["granted"] += 1
+                    heapq.heappop(self._queue).wake(True)
+                    continue
+
+                ready = max(now, self._paused_until) + max(0.0, 1 - self._tokens) / self.rate
+                deadlines = [w.deadline for w in self._queue if w.deadline is not None and not w.done]
+                self._cond.wait(max(0.001, min([ready] + deadlines) - now))
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE, budget: Optional[float] = None) -> Optional[float]:
+        """Block until a request may be sent; returns seconds waited, or None if shed."""
+        started = time.perf_counter()
+        waiter = _Waiter(priority, next(self._seq))
+        waiter.event = threading.Event()
+        state = self._enqueue(waiter, budget)
+        if state is None:
+            waiter.event.wait()
+            state = waiter.granted
+        return time.perf_counter() - started if state else None
+
+    async def acquire_async(self, priority: int = PRIORITY_INTERACTIVE, budget: Optional[float] = None) -> Optional[float]:
+        import asyncio
+
+        started = time.perf_counter()
+        waiter = _Waiter(priority, next(self._seq))
+        waiter.loop = asyncio.get_running_loop()
+        waiter.future = waiter.loop.create_future()
+        state = self._enqueue(waiter, budget)
+        if state is None:
+            try:
+                state = await waiter.future
+            except asyncio.CancelledError:
+                with self._cond:
+                    if waiter.granted:
+                        # hand the slot back
+                        self._tokens = min(self.burst, self._tokens + 1)
+                    waiter.done = True
+                    self._cond.notify()
+                raise
+        return time.perf_counter() - started if state else None
+
+_scheduler: Optional[RateScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> Optional[RateScheduler]:
+    """The process-wide scheduler, or None when OPENROUTER_RATE_LIMIT=0."""
+    global _scheduler
+    if not RATE_LIMIT_ENABLED:
+        return None
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RateScheduler()
+    return _scheduler
+
+def configure_scheduler(enabled: bool = True, **kwargs) -> Optional[RateScheduler]:
+    """Replace the shared scheduler (kwargs go to RateScheduler), or turn it off."""
+    global _scheduler, RATE_LIMIT_ENABLED
+    with _scheduler_lock:
+        RATE_LIMIT_ENABLED = enabled
+        _scheduler = RateScheduler(**kwargs) if enabled else None
+    return _scheduler
+
+# ---------------------------------------
+# Circuit breaker
+# ---------------------------------------
+class CircuitBreaker:
+    """
+    Fails OpenRouter calls at once while the service is down, instead of
+    letting every request sit through its timeouts, retries and backoff.
+    Shared by every call in the process (sync, async, streaming):
+
+        closed      calls go out; the last `window` attempts are kept. With
+                    at least `min_calls` of them, an `error_rate` share of
+                    failures (timeouts, connection errors, 5xx) or a
+                    `slow_rate` share slower than `slow_seconds` opens it.
+        open        calls fail with code "circuit_open" without touching
+                    the network, for `open_seconds`.
+        half_open   after that, `probes` calls at a time go out; a good one
+                    closes the breaker, a failed or slow one opens it
+                    again for twice as long (up to `max_open_seconds`).
+
+    429s and client errors are left to the rate scheduler / the caller:
+    they say nothing about an outage.
+    """
+
+    def __init__(
+        self,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        error_rate: float = BREAKER_ERROR_RATE,
+        slow_seconds: float = BREAKER_SLOW_SECONDS,
+        slow_rate: float = BREAKER_SLOW_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        max_open_seconds: float = BREAKER_MAX_OPEN_SECONDS,
+        probes: int = 1,
+    ):
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(open_seconds, max_open_seconds)
+        self.probes = max(1, probes)
+        self.state = "closed"
+        self.stats = {"rejected": 0, "opened": 0, "closed": 0}
+        self._outcomes = deque(maxlen=max(window, self.min_calls))   # (failed, slow)
+        self._open_for = open_seconds
+        self._opened_at = 0.0
+        self._probing = 0
+        self._lock = threading.Lock()
+
+    def _move(self, state: str, now: float) -> None:
+        self.state = state
+        self._probing = 0
+        if state == "open":
+            self._opened_at = now
+            self.stats["opened"] += 1
+        elif state == "closed":
+            self._outcomes.clear()
+            self._open_for = self.open_seconds
+            self.stats["closed"] += 1
+        metrics.inc("llm_breaker_transitions_total", state=state)
+        log.warning("OpenRouter circuit breaker %s", state.replace("_", "-"))
+
+    def rejected(self) -> Dict[str, Any]:
+        """The result of a call refused by the breaker."""
+        with self._lock:
+            self.stats["rejected"] += 1
+        metrics.inc("llm_breaker_rejected_total")
+        return {"ok": False, "error": "circuit_open", "code": "circuit_open", "retry_in": round(self.retry_in(), 3)}
+
+    def rejecting(self) -> bool:
+        """True while calls would be refused (no probe due); takes no probe slot."""
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() < self._opened_at + self._open_for
+            return self.state == "half_open" and self._probing >= self.probes
+
+    def allow(self) -> bool:
+        """May a request go out now? Every True must be followed by one record()."""
+        with self._lock:
+            if self.state == "open":
+                now = time.monotonic()
+                if now < self._opened_at + self._open_for:
+                    return False
+                self._move("half_open", now)
+            if self.state == "half_open":
+                if self._probing >= self.probes:
+                    return False
+                self._probing += 1
+            return True
+
+    def record(self, ok: Optional[bool], seconds: Optional[float] = None) -> None:
+        """
+        Outcome of one attempt: True (answered), False (failed), None
+        (neither, e.g. 429). `seconds` until the response headers.
+        """
+        slow = bool(ok) and seconds is not None and seconds > self.slow_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "half_open":
+                # a call let through before the breaker opened may land here
+                # too; it is as good a probe as any
+                self._probing = max(0, self._probing - 1)
+                if ok is None:
+                    return
+                if ok and not slow:
+                    self._move("closed", now)
+                else:
+                    self._open_for = min(self.max_open_seconds, self._open_for * 2)
+                    self._move("open", now)
+                return
+            if ok is None or self.state == "open":
+                return
+            self._outcomes.append((not ok, slow))
+            n = len(self._outcomes)
+            if n < self.min_calls:
+                return
+            failed = sum(f for f, _ in self._outcomes) / n
+            slowed = sum(s for _, s in self._outcomes) / n
+            if failed >= self.error_rate or slowed >= self.slow_rate:
+                self._move("open", now)
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe may go out (0 unless open)."""
+        with self._lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self._opened_at + self._open_for - time.monotonic())
+
+    def info(self) -> Dict[str, Any]:
+        retry_in = self.retry_in()
+        with self._lock:
+            n = len(self._outcomes)
+            return dict(
+                self.stats,
+                state=self.state,
+                retry_in_s=round(retry_in, 3),
+                error_rate=round(sum(f for f, _ in self._outcomes) / n, 3) if n else 0.0,
+                slow_rate=round(sum(s for _, s in self._outcomes) / n, 3) if n else 0.0,
+            )
+
+_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+def get_breaker() -> Optional[CircuitBreaker]:
+    """The process-wide breaker, or None when OPENROUTER_BREAKER=0."""
+    global _breaker
+    if not BREAKER_ENABLED:
+        return None
+    if _breaker is None:
+        with _breaker_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker()
+    return _breaker
+
+def configure_breaker(enabled: bool = True, **kwargs) -> Optional[CircuitBreaker]:
+    """Replace the shared breaker (kwargs go to CircuitBreaker), or turn it off."""
+    global _breaker, BREAKER_ENABLED
+    with _breaker_lock:
+        BREAKER_ENABLED = enabled
+        _breaker = CircuitBreaker(**kwargs) if enabled else None
+    return _breaker
+
+def circuit_open(breaker: Optional[CircuitBreaker]) -> bool:
+    """True if `breaker` refuses calls right now (for a fast exit before queueing)."""
+    return breaker is not None and breaker.rejecting()
+
+def _breaker_allows(breaker: Optional[CircuitBreaker]) -> bool:
+    return breaker is None or breaker.allow()
+
+def _breaker_record(breaker: Optional[CircuitBreaker], status: Any, seconds: Optional[float] = None) -> None:
+    """Feed one attempt's outcome: an HTTP status, "timeout" / "error", or None (not sent)."""
+    if breaker is None:
+        return
+    if status is None or status == 429:
+        breaker.record(None)
+    elif isinstance(status, int) and status < 500:
+        breaker.record(True, seconds)
+    else:
+        breaker.record(False)
+
+def _queue_budget(priority: int, budget: Optional[float]) -> Optional[float]:
+    # background work (precompute) waits as long as it takes
+    if budget is not None:
+        return budget
+    return DEFAULT_QUEUE_BUDGET if priority <= PRIORITY_INTERACTIVE else None
+
+def _retry_after(resp) -> Optional[float]:
+    """Retry-After as seconds (delta-seconds or HTTP-date form), if present."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime   # rare form; keeps email out of import time
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _jittered(delay: float) -> float:
+    """Equal jitter: half the delay fixed, half random, so threads fall out of step."""
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def _admit(scheduler: Optional[RateScheduler], priority: int, budget: Optional[float]) -> Optional[float]:
+    if scheduler is None:
+        return 0.0
+    waited = scheduler.acquire(priority, budget)
+    if waited is not None:
+        metrics.observe("stage_seconds", waited, stage="llm_queue")
+    return waited
+
+def _feedback(scheduler: Optional[RateScheduler], resp) -> None:
+    if scheduler is not None:
+        scheduler.record(resp.status_code, _retry_after(resp))
+
+def _backoff_sleep(delay: float, cancel: Optional[threading.Event]) -> None:
+    if cancel is None:
+        time.sleep(delay)
+    else:
+        cancel.wait(delay)
+
+def _shed(started: float) -> Dict[str, Any]:
+    metrics.inc("llm_shed_total")
+    waited = round(time.perf_counter() - started, 6)
+    return {"ok": False, "error": "shed", "code": "shed", "timing": {"queued_s": waited}}
+
 def call_openrouter_chat(
     messages: List[Dict[str, str]],
     model: str = DEFAULT_MODEL,
@@ -45,6 +809,10 @@ def call_openrouter_chat(
     timeout: int = 15,
     retries: int = 2,
     backoff: float = 1.0,
+    client: Optional[OpenRouterClient] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    queue_budget: Optional[float] = None,
+    cancel: Optional[threading.Event] = None,
 ) -> Dict[str, Any]:
     """
     Call OpenRouter chat completions endpoint.
@@ -52,14 +820,33 @@ def call_openrouter_chat(
     messages: List[{"role": "system"/"user"/"assistant", "content": "..."}]
     Returns a dict: {"ok": True, "content": "<assistant text>"} on success,
     or {"ok": False, "error": "...", "code": <http_code or 'rate_limit'>}.
+    Responses that reached the server also carry "timing":
+    {"connect_s", "ttfb_s", "total_s", "reused_connection", "attempts"},
+    where total_s spans all attempts including backoff sleeps.
+
+    Every attempt first takes a slot from the shared RateScheduler. If the
+    wait for one would exceed `queue_budget` (default
+    OPENROUTER_QUEUE_BUDGET for PRIORITY_INTERACTIVE, unbounded for lower
+    priorities) the call gives up with code "shed". Setting `cancel` (e.g.
+    for the losing half of a hedged pair) stops it before its next attempt
+    or during a backoff sleep, with code "cancelled"; a CancelToken also
+    aborts the request in flight. While the shared
+    CircuitBreaker is open, calls fail at once with code "circuit_open".
     """
-    api_key = _get_api_key()
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost",
-        "X-Title": "StudentCareerChatbot",
-    }
+    import requests
+
+    client = client or get_client()
+    started = time.perf_counter()
+    scheduler = get_scheduler()
+    breaker = get_breaker()
+    if circuit_open(breaker):
+        return breaker.rejected()
+    budget = _queue_budget(priority, queue_budget)
+
+    def _timed(result: Dict[str, Any], timing: Dict[str, Any]) -> Dict[str, Any]:
+        timing = dict(timing, total_s=round(time.perf_counter() - started, 6), attempts=tries)
+        result["timing"] = timing
+        return result
 
     payload = {
         "model": model,
@@ -68,38 +855,58 @@ def call_openrouter_chat(
     }
 
     attempt = 0
+    tries = 0
     while attempt <= retries:
+        tries += 1
+        if _admit(scheduler, priority, budget) is None:
+            return _shed(started)
+        if cancel is not None and cancel.is_set():
+            return {"ok": False, "error": "cancelled", "code": "cancelled"}
+        if not _breaker_allows(breaker):
+            return breaker.rejected()
         try:
-            resp = requests.post(OPENROUTER_URL, headers=headers, json=payload, timeout=timeout)
-        except requests.Timeout:
+            resp, timing = client.post(payload, timeout=timeout, cancel=cancel)
+        except requests.RequestException as e:
+            if cancel is not None and cancel.is_set():
+                # aborted by our own cancel: says nothing about OpenRouter
+                _breaker_record(breaker, None)
+                return {"ok": False, "error": "cancelled", "code": "cancelled"}
+            if not isinstance(e, requests.Timeout):
+                _breaker_record(breaker, "error")
+                return {"ok": False, "error": f"request_exception: {str(e)}", "code": "request_exception"}
+            _breaker_record(breaker, "timeout")
             attempt += 1
             if attempt > retries:
                 return {"ok": False, "error": "timeout", "code": "timeout"}
-            time.sleep(backoff * attempt)
+            _backoff_sleep(_note_retry("timeout", _jittered(backoff * attempt)), cancel)
             continue
-        except requests.RequestException as e:
-            return {"ok": False, "error": f"request_exception: {str(e)}", "code": "request_exception"}
+        except Exception:
+            _breaker_record(breaker, None)   # hands back a probe slot
+            raise
+        _feedback(scheduler, resp)
+        _breaker_record(breaker, resp.status_code, timing["ttfb_s"])
 
         # handle HTTP status
         if resp.status_code == 200:
             try:
                 data = resp.json()
             except ValueError:
-                return {"ok": False, "error": "invalid_json", "code": resp.status_code}
+                return _timed({"ok": False, "error": "invalid_json", "code": resp.status_code}, timing)
             parsed = _parse_openrouter_response(data)
             if parsed is not None:
-                return {"ok": True, "content": parsed, "raw": data}
+                return _timed({"ok": True, "content": parsed, "raw": data}, timing)
             else:
-                return {"ok": False, "error": "unparsed_response", "raw": data, "code": resp.status_code}
+                return _timed({"ok": False, "error": "unparsed_response", "raw": data, "code": resp.status_code}, timing)
 
         # rate limiting
         if resp.status_code in (429, 503):
             # give a friendly code indicating rate limit/backpressure
             attempt += 1
             if attempt > retries:
-                return {"ok": False, "error": "rate_limited", "code": resp.status_code}
-            # exponential backoff
-            time.sleep(backoff * (2 ** (attempt - 1)))
+                return _timed({"ok": False, "error": "rate_limited", "code": resp.status_code}, timing)
+            # jittered exponential backoff; the scheduler has already slowed
+            # down (and paused for Retry-After) for everyone else as well
+            _backoff_sleep(_note_retry("rate_limit", _jittered(backoff * (2 ** (attempt - 1)))), cancel)
             continue
 
         # other errors
@@ -107,6 +914,342 @@ def call_openrouter_chat(
             err = resp.json()
         except ValueError:
             err = resp.text
-        return {"ok": False, "error": "http_error", "detail": err, "code": resp.status_code}
+        return _timed({"ok": False, "error": "http_error", "detail": err, "code": resp.status_code}, timing)
 
     return {"ok": False, "error": "unknown_failure"}
+
+# ---------------------------------------
+# Streaming (SSE)
+# ---------------------------------------
+def _iter_sse_deltas(resp, meta: Optional[Dict[str, Any]] = None) -> Generator[Any, None, None]:
+    """
+    Yield content deltas (str) from an OpenRouter SSE body, or a dict
+    if the stream reports an error mid-way. The token usage of the final
+    event, if any, goes to meta["usage"].
+    """
+    # chunk_size=None hands over each transfer chunk as soon as it arrives
+    for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or line.startswith(":"):
+            # blank separators and ": OPENROUTER PROCESSING" keep-alives
+            continue
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        if event.get("error"):
+            yield {"ok": False, "error": "stream_error", "detail": event["error"]}
+            return
+        if meta is not None and event.get("usage"):
+            meta["usage"] = event["usage"]
+        for choice in event.get("choices") or []:
+            delta = choice.get("delta") or {}
+            text = delta.get("content") or choice.get("text")
+            if text:
+                yield text
+
+def stream_openrouter_chat(
+    messages: List[Dict[str, str]],
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = 512,
+    timeout: int = 15,
+    retries: int = 2,
+    backoff: float = 1.0,
+    client: Optional[OpenRouterClient] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    queue_budget: Optional[float] = None,
+) -> Generator[str, None, Dict[str, Any]]:
+    """
+    Streaming variant of call_openrouter_chat.
+
+    Yields assistant text chunks as they arrive. The generator's return
+    value (use `result = yield from stream_openrouter_chat(...)`) is the
+    same result dict call_openrouter_chat would produce, with "content"
+    holding the full text. Timeouts and 429/503 are retried only before
+    the first chunk; once text has been yielded, errors end the stream.
+    """
+    import requests
+
+    client = client or get_client()
+    started = time.perf_counter()
+    scheduler = get_scheduler()
+    breaker = get_breaker()
+    if circuit_open(breaker):
+        return breaker.rejected()
+    budget = _queue_budget(priority, queue_budget)
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        # token counts in the last event, as call_openrouter_chat gets them
+        "usage": {"include": True},
+    }
+
+    attempt = 0
+    while attempt <= retries:
+        if _admit(scheduler, priority, budget) is None:
+            return _shed(started)
+        if not _breaker_allows(breaker):
+            return breaker.rejected()
+        try:
+            resp, timing = client.open_stream(payload, timeout=timeout)
+        except requests.Timeout:
+            _breaker_record(breaker, "timeout")
+            attempt += 1
+            if attempt > retries:
+                return {"ok": False, "error": "timeout", "code": "timeout"}
+            time.sleep(_note_retry("timeout", _jittered(backoff * attempt)))
+            continue
+        except requests.RequestException as e:
+            _breaker_record(breaker, "error")
+            return {"ok": False, "error": f"request_exception: {str(e)}", "code": "request_exception"}
+        except Exception:
+            _breaker_record(breaker, None)   # hands back a probe slot
+            raise
+        _feedback(scheduler, resp)
+        _breaker_record(breaker, resp.status_code, timing["ttfb_s"])
+
+        with resp:
+            if resp.status_code in (429, 503):
+                attempt += 1
+                if attempt > retries:
+                    return {"ok": False, "error": "rate_limited", "code": resp.status_code}
+                time.sleep(_note_retry("rate_limit", _jittered(backoff * (2 ** (attempt - 1)))))
+                continue
+
+            if resp.status_code != 200:
+                try:
+                    err = resp.json()
+                except ValueError:
+                    err = resp.text
+                return {"ok": False, "error": "http_error", "detail": err, "code": resp.status_code}
+
+            parts: List[str] = []
+            meta: Dict[str, Any] = {}
+            try:
+                for delta in _iter_sse_deltas(resp, meta):
+                    if isinstance(delta, dict):
+                        delta["content"] = "".join(parts)
+                        return delta
+                    if not parts:
+                        timing["first_token_s"] = round(time.perf_counter() - started, 6)
+                    parts.append(delta)
+                    yield delta
+            except requests.RequestException as e:
+                # the headers counted as an answer; the broken body outweighs it
+                _breaker_record(breaker, "stream_interrupted")
+                return {
+                    "ok": False,
+                    "error": f"stream_interrupted: {str(e)}",
+                    "code": "stream_interrupted",
+                    "content": "".join(parts),
+                }
+
+            timing["total_s"] = round(time.perf_counter() - started, 6)
+            timing["attempts"] = attempt + 1
+            result = {"ok": True, "content": "".join(parts), "timing": timing}
+            if meta:
+                result["raw"] = meta
+            return result
+
+    return {"ok": False, "error": "unknown_failure"}
+
+# ---------------------------------------
+# Async path (httpx) with single-flight coalescing
+# ---------------------------------------
+class _AsyncLoopState:
+    """
+    Per-event-loop resources: an httpx.AsyncClient, the concurrency
+    semaphore and the table of in-flight requests used for coalescing.
+    """
+
+    def __init__(self, url: str, max_concurrency: int):
+        import asyncio
+        import httpx  # only needed on the async path
+
+        self.url = url
+        self.httpx = httpx
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=DEFAULT_POOL_MAXSIZE,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.inflight: Dict[str, "asyncio.Task"] = {}
+        self.headers: Optional[Dict[str, str]] = None
+
+_async_states: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def _async_state() -> _AsyncLoopState:
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    state = _async_states.get(loop)
+    if state is None:
+        state = _AsyncLoopState(OPENROUTER_URL, DEFAULT_MAX_CONCURRENCY)
+        _async_states[loop] = state
+    return state
+
+def configure_async(url: str = OPENROUTER_URL, max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> None:
+    """
+    (Re)create the async client for the running loop, e.g. to point it
+    at a local stand-in or change the concurrency bound. Call from
+    inside the loop before issuing requests.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    _async_states[loop] = _AsyncLoopState(url, max_concurrency)
+
+async def close_async_client() -> None:
+    import asyncio
+
+    state = _async_states.pop(asyncio.get_running_loop(), None)
+    if state is not None:
+        await state.client.aclose()
+
+def _request_key(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+async def _post_chat_async(
+    state: _AsyncLoopState,
+    payload: Dict[str, Any],
+    timeout: float,
+    retries: int,
+    backoff: float,
+    priority: int = PRIORITY_INTERACTIVE,
+    queue_budget: Optional[float] = None,
+) -> Dict[str, Any]:
+    import asyncio
+
+    httpx = state.httpx
+    if state.headers is None:
+        state.headers = dict(get_client().headers)
+
+    started = time.perf_counter()
+    scheduler = get_scheduler()
+    breaker = get_breaker()
+    budget = _queue_budget(priority, queue_budget)
+    async with state.semaphore:
+        queued = time.perf_counter() - started
+
+        def _timed(result: Dict[str, Any]) -> Dict[str, Any]:
+            result["timing"] = {
+                "queued_s": round(queued, 6),
+                "total_s": round(time.perf_counter() - started, 6),
+                "attempts": tries,
+            }
+            return result
+
+        attempt = 0
+        tries = 0
+        while attempt <= retries:
+            tries += 1
+            if scheduler is not None:
+                waited = await scheduler.acquire_async(priority, budget)
+                if waited is None:
+                    return _shed(started)
+                metrics.observe("stage_seconds", waited, stage="llm_queue")
+            if not _breaker_allows(breaker):
+                return breaker.rejected()
+            sent = time.perf_counter()
+            try:
+                resp = await state.client.post(state.url, headers=state.headers, json=payload, timeout=timeout)
+            except httpx.TimeoutException:
+                _breaker_record(breaker, "timeout")
+                attempt += 1
+                if attempt > retries:
+                    return _timed({"ok": False, "error": "timeout", "code": "timeout"})
+                await asyncio.sleep(_note_retry("timeout", _jittered(backoff * attempt)))
+                continue
+            except asyncio.CancelledError:
+                _breaker_record(breaker, None)   # hands back a probe slot
+                raise
+            except httpx.HTTPError as e:
+                _breaker_record(breaker, "error")
+                return _timed({"ok": False, "error": f"request_exception: {str(e)}", "code": "request_exception"})
+            _feedback(scheduler, resp)
+            _breaker_record(breaker, resp.status_code, time.perf_counter() - sent)
+
+            if resp.status_code == 200:
+                try:
+                    data = resp.json()
+                except ValueError:
+                    return _timed({"ok": False, "error": "invalid_json", "code": resp.status_code})
+                parsed = _parse_openrouter_response(data)
+                if parsed is not None:
+                    return _timed({"ok": True, "content": parsed, "raw": data})
+                return _timed({"ok": False, "error": "unparsed_response", "raw": data, "code": resp.status_code})
+
+            if resp.status_code in (429, 503):
+                attempt += 1
+                if attempt > retries:
+                    return _timed({"ok": False, "error": "rate_limited", "code": resp.status_code})
+                await asyncio.sleep(_note_retry("rate_limit", _jittered(backoff * (2 ** (attempt - 1)))))
+                continue
+
+            try:
+                err = resp.json()
+            except ValueError:
+                err = resp.text
+            return _timed({"ok": False, "error": "http_error", "detail": err, "code": resp.status_code})
+
+    return {"ok": False, "error": "unknown_failure"}
+
+async def call_openrouter_chat_async(
+    messages: List[Dict[str, str]],
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = 512,
+    timeout: int = 15,
+    retries: int = 2,
+    backoff: float = 1.0,
+    coalesce: bool = True,
+    priority: int = PRIORITY_INTERACTIVE,
+    queue_budget: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    asyncio version of call_openrouter_chat (same result dict).
+
+    At most OPENROUTER_MAX_CONCURRENCY requests per event loop are on the
+    wire at once; the rest wait on a semaphore ("timing.queued_s"). With
+    `coalesce`, identical concurrent requests share one upstream call:
+    followers get a copy of the leader's result marked "coalesced": True.
+    Cancelling one waiter never cancels the shared request. Rate limiting,
+    shedding and the circuit breaker work as in call_openrouter_chat; a
+    coalesced request keeps the priority of whoever started it.
+    """
+    import asyncio
+
+    breaker = get_breaker()
+    if circuit_open(breaker):
+        return breaker.rejected()
+    state = _async_state()
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+    }
+
+    if not coalesce:
+        return await _post_chat_async(state, payload, timeout, retries, backoff, priority, queue_budget)
+
+    key = _request_key(payload)
+    task = state.inflight.get(key)
+    coalesced = task is not None
+    if task is None:
+        task = asyncio.ensure_future(
+            _post_chat_async(state, payload, timeout, retries, backoff, priority, queue_budget)
+        )
+        state.inflight[key] = task
+        task.add_done_callback(lambda _t, key=key: state.inflight.pop(key, None))
+
+    result = dict(await asyncio.shield(task))
+    if coalesced:
+        result["coalesced"] = True
+    return result
@@ -1,16 +1,32 @@
 import streamlit as st
-from backend import get_intent, get_response
-import json, os
-from datetime import datetime
+from backend import get_intent, stream_response, start_watcher, start_warm_up, data_version, llm_status
+import metrics
+import os, time, uuid
+import requests
+from session_store import SESSIONS_DB, get_store
+from conversation import ConversationState
+from api_client import API_URL, ApiClient, ApiError
 
 # -----------------------------------------------------
 # PAGE CONFIG
 # -----------------------------------------------------
 st.set_page_config(page_title="Career Insights Chatbot", page_icon="🎓", layout="wide")
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-SESSIONS_DIR = os.path.join(BASE_DIR, "data", "sessions")
-os.makedirs(SESSIONS_DIR, exist_ok=True)
+# every message is appended to data/sessions/sessions.sqlite3 as it is sent
+AUTOSAVE = os.getenv("CHATBOT_AUTOSAVE", "1").lower() not in ("0", "false", "no")
+SESSIONS = get_store()
+API = ApiClient() if API_URL else None
+
+# reload role_skill_map.json edits without restarting the server
+start_watcher()
+
+# build the semantic index, LLM cache and HTTP pool while the page renders (CHATBOT_WARMUP=0: on first use)
+start_warm_up()
+
+# CHATBOT_METRICS=1 plus CHATBOT_METRICS_PORT / CHATBOT_METRICS_FILE
+if metrics.ENABLED:
+    metrics.start_http_server()
+    metrics.start_file_export()
 
 
 # -----------------------------------------------------
@@ -18,16 +34,20 @@ os.makedirs(SESSIONS_DIR, exist_ok=True)
 # -----------------------------------------------------
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "conversation" not in st.session_state:
+    # last role / intent / answer, for follow-ups and LLM context
+    st.session_state.conversation = ConversationState()
 
 
 # -----------------------------------------------------
 # SAVE SESSION
 # -----------------------------------------------------
-def save_session():
-    filename = datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".json"
-    filepath = os.path.join(SESSIONS_DIR, filename)
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(st.session_state.messages, f, indent=2)
+def save_session(wait: bool = True) -> bool:
+    """Append the turns not stored yet; with `wait`, until they are committed."""
+    SESSIONS.sync(st.session_state.session_id, st.session_state.messages)
+    return SESSIONS.flush(timeout=5) if wait else True
 
 
 # -----------------------------------------------------
@@ -92,9 +112,40 @@ with st.sidebar:
     • Resume tips  
     """)
 
+    st.caption(f"Dataset version {data_version()}")
+    llm_status_slot = st.empty()
+
     if st.button("💾 Save Chat"):
-        save_session()
-        st.success("Saved to data/sessions/")
+        if SESSIONS.enabled and save_session():
+            st.success(f"Saved as session {st.session_state.session_id[:8]} in {os.path.relpath(SESSIONS_DB)}")
+        else:
+            st.error("Session store unavailable; chat not saved")
+
+
+# API mode: seconds a /healthz answer is reused (a down server would stall every rerun)
+LLM_STATUS_TTL = 30.0
+
+def remember_llm_status(status) -> None:
+    st.session_state.llm_status = (time.monotonic(), status)
+
+def show_llm_status() -> None:
+    """A quiet sidebar note while the OpenRouter circuit breaker is open (or the API server is down)."""
+    if API:
+        checked = st.session_state.get("llm_status")
+        if checked is None or time.monotonic() - checked[0] > LLM_STATUS_TTL:
+            remember_llm_status(API.llm_status())
+        status = st.session_state.llm_status[1]
+    else:
+        status = llm_status()
+    state = status.get("state")
+    if state == "unreachable":
+        llm_status_slot.caption("⚠️ Chat server unreachable; answers come from this app's built-in dataset.")
+    elif state in ("open", "half_open"):
+        llm_status_slot.caption("⚠️ AI-generated detail is paused (service unreachable); answers come from the built-in dataset.")
+    else:
+        llm_status_slot.empty()
+
+show_llm_status()
 
 
 # -----------------------------------------------------
@@ -107,31 +158,91 @@ st.caption("Ask about roles, skills, learning paths, comparisons, or resume tips
 # -----------------------------------------------------
 # DISPLAY CHAT MESSAGES
 # -----------------------------------------------------
-for msg in st.session_state.messages:
+BUBBLES = {
+    "user": ("user-bubble", "🧑‍🎓 You:"),
+    "assistant": ("assistant-bubble", "🤖 Assistant:"),
+}
 
-    if msg["role"] == "user":
-        st.markdown(
-            """
-            <div class="bubble user-bubble">
-                <div class="label">🧑‍🎓 You:</div>
-                <div class="bubble-content">
-            """,
-            unsafe_allow_html=True
-        )
-        st.markdown(msg["content"], unsafe_allow_html=True)
-        st.markdown("</div></div>", unsafe_allow_html=True)
+# older history is drawn a page at a time ("Load earlier" adds a page)
+HISTORY_PAGE = int(os.getenv("CHATBOT_HISTORY_PAGE", "20"))
+STREAM_REFRESH_SECONDS = 0.05   # at most ~20 redraws/s of a streaming reply
+
+if "history_shown" not in st.session_state:
+    st.session_state.history_shown = HISTORY_PAGE
+if "rendered" not in st.session_state:
+    st.session_state.rendered = {}   # message index -> bubble markdown
+
+def bubble_markdown(role, content):
+    """
+    One bubble as a single markdown element: the blank lines around the
+    content let it render as markdown inside the HTML wrapper.
+    """
+    css_class, label = BUBBLES.get(role, BUBBLES["assistant"])
+    return (
+        f'<div class="bubble {css_class}"><div class="label">{label}</div>'
+        f'<div class="bubble-content">\n\n{content}\n\n</div></div>'
+    )
+
+def cached_bubble(index):
+    # messages are append-only, so a block never needs rebuilding
+    block = st.session_state.rendered.get(index)
+    if block is None:
+        msg = st.session_state.messages[index]
+        block = st.session_state.rendered[index] = bubble_markdown(msg["role"], msg["content"])
+    return block
+
+def render_message(role, content=None):
+    """
+    Draw one chat bubble. Returns its placeholder, so a streamed reply
+    can be redrawn in place as it grows.
+    """
+    placeholder = st.empty()
+    if content is not None:
+        placeholder.markdown(bubble_markdown(role, content), unsafe_allow_html=True)
+    return placeholder
+
+def history_start(total, shown, page):
+    """
+    First message to draw. The window only moves a whole page at a time,
+    so between page steps every bubble keeps its position and the rerun
+    re-sends identical elements.
+    """
+    return max(0, (total - shown) // page * page)
+
+
+messages = st.session_state.messages
+start = history_start(len(messages), st.session_state.history_shown, HISTORY_PAGE)
+if start and st.button(f"⬆️ Load earlier messages ({start} hidden)"):
+    st.session_state.history_shown += HISTORY_PAGE
+    start = history_start(len(messages), st.session_state.history_shown, HISTORY_PAGE)
+for index in range(start, len(messages)):
+    st.markdown(cached_bubble(index), unsafe_allow_html=True)
+
+def stream_reply(user_msg):
+    """
+    Reply chunks from api_server.py (CHATBOT_API_URL), else in-process.
+    If the server cannot be reached the reply is made in-process; if it
+    dies mid-reply the partial text gets a note instead of a traceback.
+    """
+    if not API:
+        yield from stream_response(user_msg, get_intent(user_msg), st.session_state.conversation)
+        return
+    meta = {}
+    sent = False
+    try:
+        for chunk in API.stream_chat(user_msg, history=st.session_state.messages[:-1], meta=meta):
+            sent = True
+            yield chunk
+    except (ApiError, requests.RequestException):
+        remember_llm_status({"state": "unreachable"})
+        if sent:
+            yield "\n\n_(answer cut off: the chat server stopped responding)_"
+        else:
+            yield from stream_response(user_msg, get_intent(user_msg), st.session_state.conversation)
+        return
+    if "llm" in meta:
+        remember_llm_status(meta["llm"])
 
-    else:
-        st.markdown(
-            """
-            <div class="bubble assistant-bubble">
-                <div class="label">🤖 Assistant:</div>
-                <div class="bubble-content">
-            """,
-            unsafe_allow_html=True
-        )
-        st.markdown(msg["content"], unsafe_allow_html=True)
-        st.markdown("</div></div>", unsafe_allow_html=True)
 
 # -----------------------------------------------------
 # CHAT INPUT (Streamlit-native)
@@ -141,12 +252,26 @@ user_msg = st.chat_input("Type your message...")
 if user_msg:
     # Save user message
     st.session_state.messages.append({"role": "user", "content": user_msg})
+    if AUTOSAVE:
+        save_session(wait=False)
+    render_message("user", user_msg)
 
-    # Generate assistant reply
-    intent = get_intent(user_msg)
-    reply = get_response(user_msg, intent)
+    # Generate assistant reply, rendering it as it streams in
+    placeholder = render_message("assistant")
+    reply = ""
+    drawn_at = 0.0
+    for chunk in stream_reply(user_msg):
+        reply += chunk
+        now = time.monotonic()
+        if now - drawn_at >= STREAM_REFRESH_SECONDS:
+            placeholder.markdown(bubble_markdown("assistant", reply + "▌"), unsafe_allow_html=True)
+            drawn_at = now
+    placeholder.markdown(bubble_markdown("assistant", reply), unsafe_allow_html=True)
 
     st.session_state.messages.append({"role": "assistant", "content": reply})
+    if AUTOSAVE:
+        save_session(wait=False)
+    show_llm_status()
 
-    # Rerun to refresh UI
-    st.rerun()
+    # no st.rerun(): both bubbles are already on screen, and redrawing the
+    # whole history here would make every turn cost O(conversation)
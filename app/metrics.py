@@ -0,0 +1,259 @@
+# app/metrics.py
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Off unless CHATBOT_METRICS=1: every call below then returns right away
+ENABLED = os.getenv("CHATBOT_METRICS", "0").lower() in ("1", "true", "yes")
+METRICS_PORT = int(os.getenv("CHATBOT_METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("CHATBOT_METRICS_FILE", "")
+
+PREFIX = "chatbot_"
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "stage_seconds": "Time spent per pipeline stage",
+    "requests_total": "Chat turns answered, by intent",
+    "llm_calls_total": "OpenRouter calls, by outcome",
+    "llm_retries_total": "OpenRouter retries, by reason",
+    "llm_backoff_seconds_total": "Time slept in retry backoff",
+    "llm_shed_total": "OpenRouter calls given up because the queue wait exceeded the budget",
+    "llm_breaker_transitions_total": "OpenRouter circuit breaker state changes, by new state",
+    "llm_breaker_rejected_total": "OpenRouter calls failed fast by the open circuit breaker",
+    "llm_model_answers_total": "LLM answers, by the model that produced them",
+    "llm_hedges_total": "Hedged second requests sent to another model",
+    "llm_failovers_total": "Requests retried on the next model after a failure",
+    "llm_tokens_total": "Tokens reported in OpenRouter usage",
+    "llm_cache_lookups_total": "Answer lookups before calling the model, by result",
+    "api_requests_total": "api_server.py requests, by endpoint and HTTP status",
+    "prefetch_total": "Speculative follow-up prefetches, by outcome",
+    "llm_template_tokens_total": "Prompt / completion tokens per prompt template (reported, else estimated)",
+    "llm_prompts_fitted_total": "Template prompts over the prompt token budget, by template and action",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Labels], float] = {}
+# (name, labels) -> [bucket counts..., +Inf count, sum]
+_histograms: Dict[Tuple[str, Labels], list] = {}
+_started = time.time()
+
+
+def enable(on: bool = True) -> None:
+    global ENABLED
+    ENABLED = on
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# ---------------------------------------
+# Recording
+# ---------------------------------------
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+def observe(name: str, seconds: float, **labels) -> None:
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(BUCKETS)] += 1
+        hist[-1] += seconds
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe("stage_seconds", time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(stage: str):
+    """`with span("llm"): ...` records the block's duration under stage_seconds."""
+    return _Span(stage) if ENABLED else _NO_SPAN
+
+
+# ---------------------------------------
+# Export
+# ---------------------------------------
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+def render_prometheus() -> str:
+    """Everything recorded so far in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    lines = []
+    for name in sorted({n for n, _ in counters}):
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{full}{_fmt_labels(labels)} {value:g}")
+
+    for name in sorted({n for n, _ in histograms}):
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} histogram")
+        for (n, labels), hist in sorted(histograms.items()):
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist):
+                cumulative += count
+                lines.append(f"{full}_bucket{_fmt_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+            cumulative += hist[len(BUCKETS)]
+            lines.append(f"{full}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{full}_sum{_fmt_labels(labels)} {hist[-1]:.6f}")
+            lines.append(f"{full}_count{_fmt_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+def snapshot() -> Dict[str, object]:
+    """JSON-friendly view: counters as-is, histograms as count / sum / mean."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    out: Dict[str, object] = {"enabled": ENABLED, "uptime_s": round(time.time() - _started, 3)}
+    out["counters"] = [
+        {"name": name, "labels": dict(labels), "value": value}
+        for (name, labels), value in sorted(counters.items())
+    ]
+    out["histograms"] = []
+    for (name, labels), hist in sorted(histograms.items()):
+        count = sum(hist[:-1])
+        out["histograms"].append({
+            "name": name,
+            "labels": dict(labels),
+            "count": count,
+            "sum": round(hist[-1], 6),
+            "mean": round(hist[-1] / count, 6) if count else 0.0,
+            "buckets": dict(zip([f"{b:g}" for b in BUCKETS] + ["+Inf"], hist[:-1])),
+        })
+    return out
+
+def write_json(path: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------
+# Local endpoint
+# ---------------------------------------
+def _handler_class():
+    # http.server is imported only when the endpoint is actually started
+    from http.server import BaseHTTPRequestHandler
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, ctype = json.dumps(snapshot()).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, ctype = render_prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return _MetricsHandler
+
+_server: Optional["ThreadingHTTPServer"] = None
+_server_lock = threading.Lock()
+
+def start_http_server(port: int = METRICS_PORT, host: str = "127.0.0.1") -> Optional["ThreadingHTTPServer"]:
+    """
+    Serve /metrics (Prometheus) and /metrics.json on a background thread.
+    Idempotent; returns None if `port` is 0 or already taken.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None or not port:
+            return _server
+        from http.server import ThreadingHTTPServer
+
+        try:
+            server = ThreadingHTTPServer((host, port), _handler_class())
+        except OSError:
+            # another worker process already serves this port
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _server = server
+        return server
+
+_exporter: Optional[threading.Thread] = None
+
+def start_file_export(path: str = METRICS_FILE, interval: float = 15.0) -> bool:
+    """Rewrite `path` with snapshot() every `interval` seconds (no-op without a path)."""
+    global _exporter
+    with _server_lock:
+        if _exporter is not None or not path:
+            return _exporter is not None
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_json(path)
+                except OSError:
+                    pass
+
+        _exporter = threading.Thread(target=loop, name="metrics-file", daemon=True)
+        _exporter.start()
+        return True
@@ -0,0 +1,306 @@
+# app/model_router.py
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence
+
+import metrics
+from llm import (
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MODEL,
+    PRIORITY_INTERACTIVE,
+    CancelToken,
+    call_openrouter_chat,
+    call_openrouter_chat_async,
+    circuit_open,
+    get_breaker,
+)
+
+# try order; the first healthy model is the primary, the next one the hedge
+MODELS = [
+    m.strip()
+    for m in os.getenv("OPENROUTER_MODELS", f"{DEFAULT_MODEL},meta-llama/llama-3.1-8b-instruct").split(",")
+    if m.strip()
+]
+# hedge once the primary is slower than this percentile of its recent latencies
+HEDGE_PERCENTILE = float(os.getenv("OPENROUTER_HEDGE_PERCENTILE", "95"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("OPENROUTER_HEDGE_DELAY", "3.0"))   # until MIN_SAMPLES are in
+HEDGE_MIN_DELAY = 0.25
+# a hedge is only sent if the rate scheduler has a slot for it right away
+HEDGE_QUEUE_BUDGET = 0.0
+
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+ERROR_WINDOW = 20
+MAX_ERROR_RATE = 0.5
+COOLDOWN_SECONDS = 30.0
+
+# outcomes that say nothing about the model itself
+UNSCORED_CODES = ("shed", "cancelled", "circuit_open")
+# failures another model would get as well: no failover
+NO_FAILOVER_CODES = ("shed", "circuit_open")
+
+
+class ModelStats:
+    """Rolling latency (successful calls) and error rate of one model."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=ERROR_WINDOW)
+        self.last_failure = 0.0
+        self.answers = 0
+
+    def record(self, ok: bool, latency: Optional[float]) -> None:
+        self.outcomes.append(ok)
+        if ok and latency is not None:
+            self.latencies.append(latency)
+        if not ok:
+            self.last_failure = time.monotonic()
+
+    def error_rate(self) -> float:
+        return (len(self.outcomes) - sum(self.outcomes)) / len(self.outcomes) if self.outcomes else 0.0
+
+    def unhealthy(self, now: float) -> bool:
+        return (
+            len(self.outcomes) >= 4
+            and self.error_rate() > MAX_ERROR_RATE
+            and now - self.last_failure < COOLDOWN_SECONDS
+        )
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        values = sorted(self.latencies)
+        return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+class ModelRouter:
+    """
+    Picks the model for an LLM template call and hedges slow ones.
+
+    Models are tried in list order, skipping any whose recent error rate
+    is above MAX_ERROR_RATE (for COOLDOWN_SECONDS after its last failure).
+    If the primary has not answered after its HEDGE_PERCENTILE latency, the
+    next model gets the same request; the first success wins and the
+    other call is cancelled (its request in flight aborted, so it frees
+    its thread and connection at once). A primary that fails outright fails over to
+    the next model. Results carry "model" (who answered) and "hedged".
+    """
+
+    def __init__(
+        self,
+        models: Optional[Sequence[str]] = None,
+        hedge_percentile: float = HEDGE_PERCENTILE,
+        default_delay: float = HEDGE_DEFAULT_DELAY,
+    ):
+        self.models = list(models or MODELS) or [DEFAULT_MODEL]
+        self.hedge_percentile = hedge_percentile
+        self.default_delay = default_delay
+        self.stats: Dict[str, ModelStats] = {m: ModelStats() for m in self.models}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    # -- bookkeeping ---------------------------------------------------
+    def ranked(self) -> List[str]:
+        """Healthy models in priority order, then the ones cooling down."""
+        now = time.monotonic()
+        with self._lock:
+            sick = {m for m in self.models if self.stats[m].unhealthy(now)}
+        return [m for m in self.models if m not in sick] + [m for m in self.models if m in sick]
+
+    def pick(self) -> str:
+        return self.ranked()[0]
+
+    def hedge_delay(self, model: str) -> float:
+        with self._lock:
+            p = self.stats[model].percentile(self.hedge_percentile)
+        return self.default_delay if p is None else max(HEDGE_MIN_DELAY, p)
+
+    def record(self, model: str, result: Dict[str, Any], latency: Optional[float] = None) -> None:
+        if result.get("code") in UNSCORED_CODES:
+            return
+        with self._lock:
+            self.stats[model].record(bool(result.get("ok")), latency)
+
+    def info(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "model": m,
+                    "answers": s.answers,
+                    "error_rate": round(s.error_rate(), 3),
+                    "p50_s": s.percentile(50),
+                    "hedge_after_s": s.percentile(self.hedge_percentile),
+                }
+                for m, s in self.stats.items()
+            ]
+
+    def _answered(self, model: str, result: Dict[str, Any], hedged: bool) -> Dict[str, Any]:
+        result["model"] = model
+        result["hedged"] = hedged
+        if result.get("ok"):
+            with self._lock:
+                self.stats[model].answers += 1
+            metrics.inc("llm_model_answers_total", model=model)
+        return result
+
+    # -- sync ----------------------------------------------------------
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=DEFAULT_MAX_CONCURRENCY, thread_name_prefix="llm-router")
+        return self._pool
+
+    def _attempt(self, model: str, kwargs: Dict[str, Any], queue_budget: Optional[float], cancel: CancelToken):
+        started = time.perf_counter()
+        result = call_openrouter_chat(model=model, queue_budget=queue_budget, cancel=cancel, **kwargs)
+        # a cancelled loser that still finished is a genuine latency sample
+        self.record(model, result, time.perf_counter() - started)
+        return model, result
+
+    def call(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 512,
+        priority: int = PRIORITY_INTERACTIVE,
+        queue_budget: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """call_openrouter_chat across the model list (same result dict)."""
+        kwargs = {"messages": messages, "max_tokens": max_tokens, "priority": priority}
+        models = self.ranked()
+        breaker = get_breaker()
+        if circuit_open(breaker):
+            # OpenRouter is down for every model: no threads, no hedge
+            return self._answered(models[0], breaker.rejected(), False)
+        if len(models) == 1:
+            _, result = self._attempt(models[0], kwargs, queue_budget, CancelToken())
+            return self._answered(models[0], result, False)
+
+        pool = self._executor()
+        cancels: Dict[Any, CancelToken] = {}
+
+        def submit(model: str, budget: Optional[float]):
+            cancel = CancelToken()
+            future = pool.submit(self._attempt, model, kwargs, budget, cancel)
+            cancels[future] = cancel
+            return future
+
+        primary, alternates = models[0], models[1:]
+        hedge_at = time.perf_counter() + self.hedge_delay(primary)
+        pending = {submit(primary, queue_budget)}
+        hedged = False
+        failures = []
+        while pending:
+            timeout = None if hedged or not alternates else max(0.0, hedge_at - time.perf_counter())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # primary is past its tail latency: race the next model
+                hedged = True
+                metrics.inc("llm_hedges_total")
+                pending.add(submit(alternates.pop(0), HEDGE_QUEUE_BUDGET))
+                continue
+            for future in done:
+                model, result = future.result()
+                if result.get("ok"):
+                    for other in pending:
+                        cancels[other].set()
+                    return self._answered(model, result, hedged)
+                failures.append((model, result))
+            if not pending and alternates and failures[-1][1].get("code") not in NO_FAILOVER_CODES:
+                metrics.inc("llm_failovers_total")
+                pending.add(submit(alternates.pop(0), queue_budget))
+
+        model, result = _worst_failure(failures)
+        return self._answered(model, result, hedged)
+
+    # -- async ---------------------------------------------------------
+    async def _attempt_async(self, model: str, kwargs: Dict[str, Any], queue_budget: Optional[float], coalesce: bool):
+        started = time.perf_counter()
+        result = await call_openrouter_chat_async(model=model, queue_budget=queue_budget, coalesce=coalesce, **kwargs)
+        self.record(model, result, time.perf_counter() - started)
+        return model, result
+
+    async def call_async(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 512,
+        priority: int = PRIORITY_INTERACTIVE,
+        queue_budget: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """asyncio version of call(); the losing request is cancelled outright."""
+        import asyncio
+
+        kwargs = {"messages": messages, "max_tokens": max_tokens, "priority": priority}
+        models = self.ranked()
+        breaker = get_breaker()
+        if circuit_open(breaker):
+            return self._answered(models[0], breaker.rejected(), False)
+        primary, alternates = models[0], models[1:]
+        if not alternates:
+            _, result = await self._attempt_async(primary, kwargs, queue_budget, True)
+            return self._answered(primary, result, False)
+
+        loop = asyncio.get_running_loop()
+        hedge_at = loop.time() + self.hedge_delay(primary)
+        # the primary may be shared with identical concurrent requests;
+        # hedges never are, so cancelling one really drops the request
+        pending = {asyncio.ensure_future(self._attempt_async(primary, kwargs, queue_budget, True))}
+        hedged = False
+        failures = []
+        try:
+            while pending:
+                timeout = None if hedged or not alternates else max(0.0, hedge_at - loop.time())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    metrics.inc("llm_hedges_total")
+                    pending.add(asyncio.ensure_future(
+                        self._attempt_async(alternates.pop(0), kwargs, HEDGE_QUEUE_BUDGET, False)
+                    ))
+                    continue
+                for task in done:
+                    model, result = task.result()
+                    if result.get("ok"):
+                        return self._answered(model, result, hedged)
+                    failures.append((model, result))
+                if not pending and alternates and failures[-1][1].get("code") not in NO_FAILOVER_CODES:
+                    metrics.inc("llm_failovers_total")
+                    pending.add(asyncio.ensure_future(
+                        self._attempt_async(alternates.pop(0), kwargs, queue_budget, True)
+                    ))
+        finally:
+            for task in pending:
+                task.cancel()
+
+        model, result = _worst_failure(failures)
+        return self._answered(model, result, hedged)
+
+
+def _worst_failure(failures):
+    """The failure to report: a real upstream error over shed / cancelled."""
+    for model, result in failures:
+        if result.get("code") not in UNSCORED_CODES:
+            return model, result
+    return failures[0]
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+def get_router() -> ModelRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
+
+def configure_router(models: Optional[Sequence[str]] = None, **kwargs) -> ModelRouter:
+    """Replace the shared router, e.g. with another model list (kwargs go to ModelRouter)."""
+    global _router
+    with _router_lock:
+        _router = ModelRouter(models, **kwargs)
+    return _router
@@ -0,0 +1,196 @@
+# app/phrase_matcher.py
+import re
+from typing import Any, Dict, Iterator, List, Tuple
+
+WORD_RE = re.compile(r"\w+")
+
+
+# ---------------------------------------
+# Keyword regex -> literal phrases
+# ---------------------------------------
+def expand_keyword_pattern(pattern: str) -> List[str]:
+    """
+    Expand the small regex subset used by INTENT_KEYWORDS / EXPAND_KEYWORDS
+    into the literal phrases it matches, e.g.
+        r"\\bhow to write (a )?resume\\b" -> ["how to write resume", "how to write a resume"]
+    Supported: leading/trailing \\b, literals, escaped literals, groups with
+    `|` alternatives and an optional `?`. Anything else raises ValueError.
+    """
+    body = pattern
+    if body.startswith(r"\b"):
+        body = body[2:]
+    if body.endswith(r"\b"):
+        body = body[:-2]
+
+    phrases, pos = _expand_seq(body, 0)
+    if pos != len(body):
+        raise ValueError(f"unsupported keyword pattern: {pattern!r}")
+    return phrases
+
+
+def _expand_seq(pat: str, pos: int) -> Tuple[List[str], int]:
+    """Expand a sequence up to an unmatched `)` or `|` (or the end)."""
+    out = [""]
+    while pos < len(pat) and pat[pos] not in ")|":
+        ch = pat[pos]
+        if ch == "(":
+            pos += 1
+            if pat.startswith("?:", pos):
+                pos += 2
+            options, pos = _expand_seq(pat, pos)
+            while pos < len(pat) and pat[pos] == "|":
+                more, pos = _expand_seq(pat, pos + 1)
+                options += more
+            if pos >= len(pat) or pat[pos] != ")":
+                raise ValueError(f"unbalanced group in keyword pattern: {pat!r}")
+            pos += 1
+            if pos < len(pat) and pat[pos] == "?":
+                options = options + [""]
+                pos += 1
+            out = [a + b for a in out for b in options]
+            continue
+        if ch == "\\":
+            if pos + 1 >= len(pat) or pat[pos + 1].isalnum():
+                raise ValueError(f"unsupported escape in keyword pattern: {pat!r}")
+            ch = pat[pos + 1]
+            pos += 1
+        elif ch in ".^$*+?{}[]":
+            raise ValueError(f"unsupported syntax in keyword pattern: {pat!r}")
+        out = [a + ch for a in out]
+        pos += 1
+    return out, pos
+
+
+# ---------------------------------------
+# Word-level phrase trie
+# ---------------------------------------
+def _has_lead(text: str, start: int, lead: str) -> bool:
+    return not lead or (start >= len(lead) and text[start - len(lead):start] == lead)
+
+class _Node:
+    __slots__ = ("children", "values", "heads", "head_len")
+
+    def __init__(self):
+        # next step: separator + word -> node (the first step has no separator)
+        self.children: Dict[str, "_Node"] = {}
+        # phrases ending here: (lead, trail, value)
+        self.values: List[Tuple[str, str, Any]] = []
+        # phrases whose last word may be a prefix of the next token, bucketed
+        # by separator + the word's first `head_len` characters so a token
+        # costs one dict lookup however many prefixes are registered:
+        # head -> [(separator, word, lead, value)]
+        self.heads: Dict[str, List[Tuple[str, str, str, Any]]] = {}
+        self.head_len = 0
+
+    def add_prefix(self, sep: str, word: str, lead: str, value: Any) -> None:
+        entry = (sep, word, lead, value)
+        if self.heads and len(word) >= self.head_len:
+            self.heads.setdefault(sep + word[:self.head_len], []).append(entry)
+            return
+        # first entry, or a shorter word: rebucket by the new head length
+        # (head_len only ever shrinks, so this happens at most once per length)
+        entries = [e for bucket in self.heads.values() for e in bucket]
+        entries.append(entry)
+        self.head_len = len(word)
+        self.heads = {}
+        for e in entries:
+            self.heads.setdefault(e[0] + e[1][:self.head_len], []).append(e)
+
+
+class PhraseMatcher:
+    """
+    Matches many literal phrases against a message in one pass over its
+    words. The message is lowercased and split into \\w+ tokens once; each
+    token is then a dict lookup into a word trie, so the cost grows with
+    message length, not with the number of phrases.
+
+    Phrases match on word boundaries with exactly the separators written
+    in the phrase (so "what is" does not match "what  is" or "somewhat is").
+    Phrases added with `prefix_last=True` may end inside a word
+    ("data sci" matches "data science").
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, phrase: str, value: Any, prefix_last: bool = False) -> bool:
+        """Register `phrase`. Returns False if it has no word characters."""
+        low = phrase.lower()
+        spans = [(m.start(), m.end()) for m in WORD_RE.finditer(low)]
+        if not spans:
+            return False
+
+        lead = low[:spans[0][0]]
+        trail = low[spans[-1][1]:]
+        steps = [("", low[spans[0][0]:spans[0][1]])]
+        for (_, prev_end), (start, end) in zip(spans, spans[1:]):
+            steps.append((low[prev_end:start], low[start:end]))
+
+        node = self._root
+        if prefix_last and not trail:
+            for sep, word in steps[:-1]:
+                node = node.children.setdefault(sep + word, _Node())
+            sep, word = steps[-1]
+            node.add_prefix(sep, word, lead, value)
+            return True
+
+        for sep, word in steps:
+            node = node.children.setdefault(sep + word, _Node())
+        node.values.append((lead, trail, value))
+        return True
+
+    def finditer(self, text: str, lowered: bool = False) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Yield (start, end, value) for every phrase occurrence, ordered by
+        start position. Positions index the lowercased text.
+        """
+        low = text if lowered else (text or "").lower()
+        words = WORD_RE.findall(low)
+        if not words:
+            return
+        root = self._root
+        children = root.children
+        heads = root.heads
+        head_len = root.head_len
+        spans = None
+        n = len(words)
+
+        for i, word in enumerate(words):
+            node = children.get(word)
+            bucket = heads.get(word[:head_len]) if heads else None
+            if node is None and bucket is None:
+                continue
+
+            if spans is None:
+                spans = [m.span() for m in WORD_RE.finditer(low)]
+            start = spans[i][0]
+
+            # single-word phrase whose word is a prefix of this token
+            if bucket:
+                for _, prefix, lead, value in bucket:
+                    if word.startswith(prefix) and _has_lead(low, start, lead):
+                        yield start - len(lead), start + len(prefix), value
+
+            j = i
+            while node is not None:
+                stop = spans[j][1]
+                for lead, trail, value in node.values:
+                    if not _has_lead(low, start, lead):
+                        continue
+                    if trail and low[stop:stop + len(trail)] != trail:
+                        continue
+                    yield start - len(lead), stop + len(trail), value
+
+                j += 1
+                if j >= n or not (node.children or node.heads):
+                    break
+                sep = low[stop:spans[j][0]]
+                tok = words[j]
+
+                # multi-word phrase whose last word is a prefix of this token
+                if node.heads:
+                    for p_sep, prefix, lead, value in node.heads.get(sep + tok[:node.head_len], ()):
+                        if p_sep == sep and tok.startswith(prefix) and _has_lead(low, start, lead):
+                            yield start - len(lead), spans[j][0] + len(prefix), value
+
+                node = node.children.get(sep + tok)
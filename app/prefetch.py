@@ -0,0 +1,271 @@
+# app/prefetch.py
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+import metrics
+from llm import PRIORITY_INTERACTIVE, circuit_open, get_breaker, get_scheduler
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRANSITIONS_PATH = os.getenv("CHATBOT_PREFETCH_TABLE", os.path.join(BASE_DIR, "data", "prefetch_transitions.json"))
+
+# opt-in: every prefetch is an LLM call the user may never read
+PREFETCH_ENABLED = os.getenv("CHATBOT_PREFETCH", "0").lower() in ("1", "true", "yes")
+PREFETCH_WORKERS = int(os.getenv("CHATBOT_PREFETCH_WORKERS", "2"))
+# global budget: speculative calls per minute, across all sessions
+PREFETCH_PER_MINUTE = float(os.getenv("CHATBOT_PREFETCH_PER_MINUTE", "20"))
+PREFETCH_TTL = float(os.getenv("CHATBOT_PREFETCH_TTL", "300"))
+PREFETCH_MAX_ITEMS = 256
+PREFETCH_TOP = 2                 # follow-ups prefetched per answer
+PREFETCH_MIN_PROBABILITY = float(os.getenv("CHATBOT_PREFETCH_MIN_PROBABILITY", "0.2"))
+# a prefetch waiting longer than this for a scheduler slot is dropped
+PREFETCH_QUEUE_BUDGET = 2.0
+# a live request for an answer still being prefetched waits this long for it
+PREFETCH_JOIN_WAIT = float(os.getenv("CHATBOT_PREFETCH_JOIN_WAIT", "10"))
+
+# P(next question is this intent about the same role | intent just answered);
+# replaced by data/prefetch_transitions.json (scripts/prefetch_table.py)
+DEFAULT_TRANSITIONS = {
+    "skills_needed": {"roadmap": 0.45, "projects": 0.3},
+    "role_info": {"skills_needed": 0.35, "roadmap": 0.3},
+    "roadmap": {"projects": 0.4, "roadmap": 0.2},
+    "projects": {"roadmap": 0.25, "projects": 0.2},
+}
+
+
+# ---------------------------------------
+# Transition table
+# ---------------------------------------
+class TransitionTable:
+    """Which intent usually follows which, for the same role."""
+
+    def __init__(self, transitions: Mapping[str, Mapping[str, float]], source: str = "default"):
+        self.transitions = {
+            intent: sorted(((nxt, float(p)) for nxt, p in nexts.items()), key=lambda item: -item[1])
+            for intent, nexts in transitions.items()
+        }
+        self.source = source
+
+    def predict(self, intent: str, top: int = PREFETCH_TOP,
+                min_probability: float = PREFETCH_MIN_PROBABILITY) -> List[Tuple[str, float]]:
+        """The most likely next intents, most likely first."""
+        return [(nxt, p) for nxt, p in self.transitions.get(intent, ()) if p >= min_probability][:top]
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        return {intent: dict(nexts) for intent, nexts in self.transitions.items()}
+
+    @classmethod
+    def from_counts(cls, pairs: Mapping[Tuple[str, str], int], totals: Mapping[str, int],
+                    min_count: int = 1) -> "TransitionTable":
+        """pairs[(a, b)]: a answered, then b about the same role; totals[a]: every answered a."""
+        transitions: Dict[str, Dict[str, float]] = {}
+        for (intent, nxt), count in pairs.items():
+            if totals.get(intent, 0) >= min_count and count:
+                transitions.setdefault(intent, {})[nxt] = round(count / totals[intent], 4)
+        return cls(transitions, source="learned")
+
+    @classmethod
+    def load(cls, path: str = TRANSITIONS_PATH) -> "TransitionTable":
+        """The learned table at `path`, or DEFAULT_TRANSITIONS if there is none."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data["transitions"], source=path)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return cls(DEFAULT_TRANSITIONS)
+
+    def save(self, path: str = TRANSITIONS_PATH, **info) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), **info, "transitions": self.to_dict()}, f, indent=2)
+        os.replace(tmp, path)
+
+
+# ---------------------------------------
+# Prefetcher
+# ---------------------------------------
+class _Entry:
+    __slots__ = ("future", "expires")
+
+    def __init__(self, future, expires: float):
+        self.future = future
+        self.expires = expires
+
+
+class Prefetcher:
+    """
+    Runs speculative LLM calls on a small thread pool and parks their
+    answers, by cache key, for `ttl` seconds; take() hands an answer over
+    once (waiting for one still in flight).
+
+    Live requests always come first: nothing is started while
+    interactive callers are queued in llm's scheduler or the circuit
+    breaker is open, at most
+    `per_minute` calls start per minute process-wide, and the calls
+    themselves go out at PRIORITY_BACKGROUND with a short queue budget.
+    """
+
+    def __init__(
+        self,
+        table: Optional[TransitionTable] = None,
+        workers: int = PREFETCH_WORKERS,
+        per_minute: float = PREFETCH_PER_MINUTE,
+        ttl: float = PREFETCH_TTL,
+        max_items: int = PREFETCH_MAX_ITEMS,
+    ):
+        self.table = table or TransitionTable.load()
+        self.workers = max(1, workers)
+        self.rate = max(0.0, per_minute) / 60.0
+        self.burst = float(self.workers)
+        self.ttl = ttl
+        self.max_items = max_items
+        self.stats = {"scheduled": 0, "hits": 0, "joined": 0, "expired": 0, "failed": 0,
+                      "over_budget": 0, "busy": 0, "full": 0, "offline": 0}
+        self._entries: Dict[str, _Entry] = {}   # insertion order: oldest first
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None   # threads start with the first prefetch
+
+    def _count(self, outcome: str) -> None:
+        self.stats[outcome] += 1
+        metrics.inc("prefetch_total", outcome=outcome)
+
+    def _purge(self, now: float) -> None:
+        for key in [k for k, e in self._entries.items() if e.expires <= now]:
+            self._entries.pop(key).future.cancel()
+            self._count("expired")
+
+    def _take_token(self, now: float) -> bool:
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    @staticmethod
+    def _live_traffic_waiting() -> bool:
+        scheduler = get_scheduler()
+        return scheduler is not None and scheduler.estimated_wait(PRIORITY_INTERACTIVE) > 0
+
+    def submit(self, key: str, fetch: Callable[[], Optional[str]]) -> bool:
+        """Start fetch() in the background unless `key` is parked already or the budget says no."""
+        with self._lock:
+            now = time.monotonic()
+            self._purge(now)
+            if key in self._entries:
+                return False
+            in_flight = sum(1 for e in self._entries.values() if not e.future.done())
+            if len(self._entries) >= self.max_items or in_flight >= 2 * self.workers:
+                self._count("full")
+                return False
+            if self._live_traffic_waiting():
+                self._count("busy")
+                return False
+            if circuit_open(get_breaker()):
+                self._count("offline")
+                return False
+            if not self._take_token(now):
+                self._count("over_budget")
+                return False
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+            self._entries[key] = _Entry(self._pool.submit(self._run, fetch), now + self.ttl)
+            self._count("scheduled")
+            return True
+
+    def _run(self, fetch: Callable[[], Optional[str]]) -> Optional[str]:
+        try:
+            content = fetch()
+        except Exception:
+            log.exception("prefetch failed")
+            content = None
+        if not content:
+            self._count("failed")
+        return content or None
+
+    def _pop(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or entry.expires <= time.monotonic():
+            return None
+        if entry.future.cancel():
+            # never started: the live call is at least as fast
+            return None
+        return entry.future
+
+    def take(self, key: str, wait: float = PREFETCH_JOIN_WAIT) -> Optional[str]:
+        """The parked answer for `key` (removed), or None."""
+        future = self._pop(key)
+        if future is None:
+            return None
+        joined = not future.done()
+        try:
+            content = future.result(timeout=wait)
+        except (FutureTimeout, CancelledError):
+            return None
+        if content:
+            self._count("joined" if joined else "hits")
+        return content
+
+    async def take_async(self, key: str, wait: float = PREFETCH_JOIN_WAIT) -> Optional[str]:
+        import asyncio
+
+        future = self._pop(key)
+        if future is None:
+            return None
+        joined = not future.done()
+        try:
+            content = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            return None
+        if content:
+            self._count("joined" if joined else "hits")
+        return content
+
+    def info(self) -> Dict[str, object]:
+        with self._lock:
+            parked = sum(1 for e in self._entries.values() if e.future.done())
+            return dict(self.stats, parked=parked, in_flight=len(self._entries) - parked, table=self.table.source)
+
+    def close(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                entry.future.cancel()
+            self._entries.clear()
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+_prefetcher: Optional[Prefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+def get_prefetcher() -> Optional[Prefetcher]:
+    """The process-wide prefetcher, or None unless CHATBOT_PREFETCH=1."""
+    global _prefetcher
+    if not PREFETCH_ENABLED:
+        return None
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher()
+    return _prefetcher
+
+def configure_prefetcher(enabled: bool = True, **kwargs) -> Optional[Prefetcher]:
+    """Replace the shared prefetcher (kwargs go to Prefetcher), or turn it off."""
+    global _prefetcher, PREFETCH_ENABLED
+    with _prefetcher_lock:
+        if _prefetcher is not None:
+            _prefetcher.close()
+        PREFETCH_ENABLED = enabled
+        _prefetcher = Prefetcher(**kwargs) if enabled else None
+    return _prefetcher
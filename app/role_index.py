@@ -0,0 +1,101 @@
+# app/role_index.py
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from phrase_matcher import PhraseMatcher
+
+
+class RoleTag(NamedTuple):
+    """Value stored in the phrase trie for every role name / alias."""
+    rank: int      # lower = preferred when several roles match
+    role: str      # canonical ROLE_DATA key
+    alias: str     # the lowercased phrase that matched
+
+
+class RoleMatch(NamedTuple):
+    role: str
+    start: int
+    end: int
+    rank: int
+    alias: str
+
+
+class RoleIndex:
+    """
+    Lowercased role names and aliases compiled once into a word trie.
+
+    Aliases rank before full names, full names keep dataset order, so
+    `best()` reproduces the old "first alias, else first role" rule.
+    Matches start on a word boundary and may end inside a word
+    ("data sci" -> "data science", "data analyst" -> "data analysts").
+
+    Pass an existing PhraseMatcher to share it with other phrase kinds
+    (e.g. intent keywords) so one scan of the message finds everything;
+    role hits are the values that are RoleTag instances.
+    """
+
+    def __init__(
+        self,
+        roles: Iterable[str],
+        aliases: Optional[Dict[str, str]] = None,
+        matcher: Optional[PhraseMatcher] = None,
+    ):
+        self.matcher = matcher if matcher is not None else PhraseMatcher()
+        self.roles = list(roles)
+        self.aliases = dict(aliases or {})
+        self.unindexed: List[RoleTag] = []
+
+        names = list(self.aliases.items()) + [(role.lower(), role) for role in self.roles]
+        for rank, (name, role) in enumerate(names):
+            tag = RoleTag(rank, role, name)
+            if not self.matcher.add(name, tag, prefix_last=True):
+                # no word characters at all; located by plain substring search
+                self.unindexed.append(tag)
+
+    def find_all(self, message: str) -> List[RoleMatch]:
+        """Every role occurrence (overlaps included), ordered by position."""
+        low = (message or "").lower()
+        matches = [
+            RoleMatch(value.role, start, end, value.rank, value.alias)
+            for start, end, value in self.matcher.finditer(low, lowered=True)
+            if isinstance(value, RoleTag)
+        ]
+        if self.unindexed:
+            matches = sorted(matches + self.find_unindexed(low), key=lambda m: m.start)
+        return matches
+
+    def find_unindexed(self, lowered: str) -> List[RoleMatch]:
+        matches = []
+        for tag in self.unindexed:
+            pos = lowered.find(tag.alias)
+            if pos >= 0:
+                matches.append(RoleMatch(tag.role, pos, pos + len(tag.alias), tag.rank, tag.alias))
+        return matches
+
+    def find_role(self, message: str) -> Optional[str]:
+        return self.best(self.find_all(message))
+
+    def find_roles(self, message: str) -> List[str]:
+        return self.ordered(self.find_all(message))
+
+    @staticmethod
+    def best(matches: List[RoleMatch]) -> Optional[str]:
+        """Highest-priority role among `matches`."""
+        if not matches:
+            return None
+        return min(matches, key=lambda m: m.rank).role
+
+    @staticmethod
+    def ordered(matches: List[RoleMatch]) -> List[str]:
+        """
+        Distinct roles in order of appearance. At one position the longest
+        match wins; matches starting inside an earlier one are skipped.
+        """
+        roles: List[str] = []
+        taken_until = -1
+        for m in sorted(matches, key=lambda m: (m.start, -(m.end - m.start), m.rank)):
+            if m.start < taken_until:
+                continue
+            taken_until = m.end
+            if m.role not in roles:
+                roles.append(m.role)
+        return roles
@@ -0,0 +1,154 @@
+# app/sanitizer.py
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+# Special tokens some OpenRouter providers leak into replies; matched as
+# literals, case-insensitively
+DEFAULT_ARTIFACT_TOKENS: Tuple[str, ...] = (
+    "<s>", "</s>",
+    "[INST]", "[/INST]",
+    "[B_INST]", "[/B_INST]",
+    "<<SYS>>", "<</SYS>>",
+    "<|im_start|>", "<|im_end|>",
+    "<|assistant|>", "<|user|>",
+    "<think>", "</think>", "<think_detail>", "</think_detail>",
+)
+
+LLAMA3_TOKENS: Tuple[str, ...] = (
+    "<|begin_of_text|>", "<|end_of_text|>",
+    "<|start_header_id|>", "<|end_header_id|>", "<|eot_id|>",
+)
+
+# model id prefix -> complete token list for that model (longest prefix
+# wins); models without an entry use DEFAULT_ARTIFACT_TOKENS
+MODEL_ARTIFACT_TOKENS: Dict[str, Tuple[str, ...]] = {
+    "meta-llama/": DEFAULT_ARTIFACT_TOKENS + LLAMA3_TOKENS,
+}
+
+
+class Sanitizer:
+    """
+    Strips a set of special tokens from model output.
+
+    Tokens are grouped by their first character and each group is one
+    precompiled alternation ("<(?:s>|/s>|...)"). A group is only scanned
+    if its lead character occurs in the text, and because every pattern
+    starts with a literal, re can jump between candidates with its fast
+    search instead of trying the alternation at every position. For the
+    default list that is at most two C-level passes, and none for text
+    without "<" or "[".
+    """
+
+    def __init__(self, tokens: Iterable[str] = DEFAULT_ARTIFACT_TOKENS):
+        self.tokens = tuple(dict.fromkeys(t for t in tokens if t))
+        groups: Dict[str, list] = {}
+        for tok in self.tokens:
+            groups.setdefault(tok[0].lower(), []).append(tok)
+
+        self._passes = []
+        for lead, toks in groups.items():
+            # longest first, so "<think_detail>" is not cut at "<think"
+            rests = sorted({t[1:] for t in toks}, key=len, reverse=True)
+            pattern = re.escape(lead) + "(?:" + "|".join(re.escape(r) for r in rests) + ")"
+            leads = {lead, lead.upper()}
+            self._passes.append((tuple(leads), re.compile(pattern, re.IGNORECASE)))
+
+        lowered = [t.lower() for t in self.tokens]
+        self._leads = frozenset(c for leads, _ in self._passes for c in leads)
+        self._prefixes = frozenset(t[:i] for t in lowered for i in range(1, len(t)))
+        self.max_len = max((len(t) for t in lowered), default=0)
+
+    def strip(self, text: str) -> str:
+        """Remove every token occurrence (no trimming)."""
+        for leads, pattern in self._passes:
+            if any(c in text for c in leads):
+                text = pattern.sub("", text)
+        return text
+
+    def clean(self, text: str) -> str:
+        if not text:
+            return text
+        return self.strip(text).strip()
+
+    def split_safe(self, text: str) -> Tuple[str, str]:
+        """
+        (safe, pending): `pending` is a tail of `text` that could be the
+        start of a token continuing in the next chunk.
+        """
+        for i in range(max(0, len(text) - self.max_len + 1), len(text)):
+            if text[i] in self._leads and text[i:].lower() in self._prefixes:
+                return text[:i], text[i:]
+        return text, ""
+
+    def stream(self, max_chars: int = 4000) -> "StreamCleaner":
+        return StreamCleaner(max_chars, self)
+
+
+def tokens_for_model(model: Optional[str]) -> Tuple[str, ...]:
+    best = ""
+    for prefix in MODEL_ARTIFACT_TOKENS:
+        if model and model.startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+    return MODEL_ARTIFACT_TOKENS[best] if best else DEFAULT_ARTIFACT_TOKENS
+
+@lru_cache(maxsize=None)
+def _sanitizer_for(tokens: Tuple[str, ...]) -> Sanitizer:
+    return Sanitizer(tokens)
+
+def get_sanitizer(model: Optional[str] = None) -> Sanitizer:
+    """The (shared, precompiled) sanitizer for `model`'s token list."""
+    return _sanitizer_for(tokens_for_model(model))
+
+def set_model_tokens(prefix: str, tokens: Iterable[str]) -> None:
+    """Configure the token list for model ids starting with `prefix`."""
+    MODEL_ARTIFACT_TOKENS[prefix] = tuple(tokens)
+
+
+class StreamCleaner:
+    """
+    Incremental Sanitizer.clean: feed() raw chunks, get cleaned text back.
+    The concatenation of every feed() plus finish() equals clean() of the
+    whole text, truncated at `max_chars`. A chunk tail that may be the
+    first half of a token split across chunks is held back until the next
+    feed().
+    """
+
+    def __init__(self, max_chars: int = 4000, sanitizer: Optional[Sanitizer] = None):
+        self.sanitizer = sanitizer or get_sanitizer()
+        self.max_chars = max_chars
+        self.emitted = 0
+        self._pending = ""   # raw text that may still be part of an artifact
+        self._spaces = ""    # cleaned whitespace held until more text arrives
+        self._started = False
+
+    def _emit(self, cleaned: str, final: bool) -> str:
+        if not self._started:
+            cleaned = cleaned.lstrip()
+            if not cleaned:
+                return ""
+            self._started = True
+        cleaned = self._spaces + cleaned
+        body = cleaned.rstrip()
+        self._spaces = "" if final else cleaned[len(body):]
+
+        if self.emitted >= self.max_chars:
+            return ""
+        room = self.max_chars - self.emitted
+        if len(body) > room:
+            body = body[:room] + "..."
+            self.emitted = self.max_chars
+            return body
+        self.emitted += len(body)
+        return body
+
+    def feed(self, chunk: str) -> str:
+        safe, self._pending = self.sanitizer.split_safe(self._pending + (chunk or ""))
+        if not safe:
+            return ""
+        return self._emit(self.sanitizer.strip(safe), final=False)
+
+    def finish(self) -> str:
+        cleaned = self.sanitizer.strip(self._pending)
+        self._pending = ""
+        return self._emit(cleaned, final=True)
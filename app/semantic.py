@@ -0,0 +1,306 @@
+# app/semantic.py
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_DIR = os.path.join(BASE_DIR, "data", "cache", "semantic")
+
+DEFAULT_DIMS = 1 << 18
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "for", "in", "on", "with", "as", "at", "by",
+    "i", "me", "my", "we", "you", "your", "it", "is", "are", "be", "am", "do", "does", "can",
+    "should", "would", "could", "want", "like", "about", "what", "which", "that", "this",
+    "please", "pls", "get", "some", "any", "need", "so", "if", "into", "from", "good",
+}
+
+
+class Entry(NamedTuple):
+    kind: str    # "role", "skill", "project", "roadmap", "intent", ...
+    label: str   # what a hit resolves to (a ROLE_DATA key or an intent)
+    text: str
+
+
+class SemanticHit(NamedTuple):
+    label: str
+    score: float
+    kind: str
+    text: str
+
+
+# ---------------------------------------
+# Features (hashed, no vocabulary to ship)
+# ---------------------------------------
+def _words(text: str) -> List[str]:
+    words = []
+    for w in _TOKEN_RE.findall((text or "").lower()):
+        if w in STOPWORDS:
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        words.append(w)
+    return words
+
+def text_features(text: str) -> Counter:
+    """
+    Word unigrams and bigrams, plus character trigrams at a lower weight
+    so near-misses ("scientst", "developr") still overlap.
+    """
+    words = _words(text)
+    feats: Counter = Counter()
+    for w in words:
+        feats["w:" + w] += 1.0
+        padded = f"^{w}$"
+        for i in range(len(padded) - 2):
+            feats["c:" + padded[i:i + 3]] += 0.1
+    for a, b in zip(words, words[1:]):
+        feats["b:" + a + " " + b] += 1.0
+    return feats
+
+def _bucket(feature: str, dims: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) & (dims - 1)
+
+def _hashed(text: str, dims: int) -> Dict[int, float]:
+    out: Dict[int, float] = {}
+    for feat, count in text_features(text).items():
+        b = _bucket(feat, dims)
+        out[b] = out.get(b, 0.0) + count
+    return out
+
+
+# ---------------------------------------
+# Index
+# ---------------------------------------
+class SemanticIndex:
+    """
+    TF-IDF vectors for a list of entries, stored column-wise (CSC: for each
+    hashed feature, the rows containing it and their weights). A query
+    only touches the postings of its own features, and the score of every
+    row is accumulated in one vectorized np.bincount, so search cost does
+    not depend on the hashing dimension.
+
+    Arrays can be saved as .npy files and reopened memory-mapped, so every
+    process shares one read-only copy through the page cache.
+    """
+
+    def __init__(self, indptr, indices, data, idf, entries: Sequence[Entry], dims: int = DEFAULT_DIMS):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.idf = idf
+        self.entries = list(entries)
+        self.dims = dims
+        self.unknown_idf = math.log(1 + len(self.entries)) + 1.0
+
+        self.labels = sorted({e.label for e in self.entries})
+        label_ids = {label: i for i, label in enumerate(self.labels)}
+        self.entry_labels = np.array([label_ids[e.label] for e in self.entries], dtype=np.int32)
+        self.kinds = sorted({e.kind for e in self.entries})
+        kind_ids = {kind: i for i, kind in enumerate(self.kinds)}
+        self.entry_kinds = np.array([kind_ids[e.kind] for e in self.entries], dtype=np.int16)
+
+        # rows grouped by label, for a vectorized per-label max
+        self._label_order = np.argsort(self.entry_labels, kind="stable")
+        self._label_starts = np.searchsorted(self.entry_labels[self._label_order], np.arange(len(self.labels)))
+        self._masks: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    # ---------- build / persist ----------
+    @classmethod
+    def build(cls, entries: Iterable[Entry], dims: int = DEFAULT_DIMS) -> "SemanticIndex":
+        entries = list(entries)
+        rows = [_hashed(e.text, dims) for e in entries]
+
+        df = Counter()
+        for row in rows:
+            df.update(row.keys())
+        n = max(len(rows), 1)
+        idf_map = {b: math.log((1 + n) / (1 + c)) + 1.0 for b, c in df.items()}
+
+        cols: Dict[int, List[Tuple[int, float]]] = {}
+        for r, row in enumerate(rows):
+            weights = {b: tf * idf_map[b] for b, tf in row.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for b, w in weights.items():
+                cols.setdefault(b, []).append((r, w / norm))
+
+        indptr = np.zeros(dims + 1, dtype=np.int64)
+        for b, postings in cols.items():
+            indptr[b + 1] = len(postings)
+        np.cumsum(indptr, out=indptr)
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        data = np.empty(indptr[-1], dtype=np.float32)
+        for b, postings in cols.items():
+            start = indptr[b]
+            for k, (r, w) in enumerate(postings):
+                indices[start + k] = r
+                data[start + k] = w
+
+        idf = np.zeros(dims, dtype=np.float32)
+        for b, v in idf_map.items():
+            idf[b] = v
+        return cls(indptr, indices, data, idf, entries, dims)
+
+    def save(self, directory: str, fingerprint: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in ("indptr", "indices", "data", "idf"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        meta = {
+            "fingerprint": fingerprint,
+            "dims": self.dims,
+            "entries": [list(e) for e in self.entries],
+        }
+        tmp = os.path.join(directory, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(directory, "meta.json"))
+
+    @classmethod
+    def load(cls, directory: str, fingerprint: str) -> Optional["SemanticIndex"]:
+        """Memory-map a saved index; None if missing or built from other entries."""
+        try:
+            with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("fingerprint") != fingerprint:
+                return None
+            arrays = {
+                name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                for name in ("indptr", "indices", "data", "idf")
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        entries = [Entry(*e) for e in meta["entries"]]
+        return cls(arrays["indptr"], arrays["indices"], arrays["data"], arrays["idf"], entries, meta["dims"])
+
+    # ---------- search ----------
+    def scores(self, text: str) -> np.ndarray:
+        """Cosine similarity of `text` against every entry."""
+        query = _hashed(text, self.dims)
+        out = np.zeros(len(self.entries), dtype=np.float32)
+        if not query:
+            return out
+
+        buckets = np.fromiter(query.keys(), dtype=np.int64, count=len(query))
+        idf = np.asarray(self.idf[buckets])
+        # words the index has never seen still count towards the query norm
+        idf = np.where(idf > 0, idf, self.unknown_idf)
+        weights = np.fromiter(query.values(), dtype=np.float32, count=len(query)) * idf
+        norm = float(np.linalg.norm(weights))
+        if norm == 0.0:
+            return out
+        weights /= norm
+
+        starts = self.indptr[buckets]
+        lengths = self.indptr[buckets + 1] - starts
+        if not lengths.any():
+            return out
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        rows = self.indices[positions]
+        vals = self.data[positions] * np.repeat(weights, lengths)
+        return np.bincount(rows, weights=vals, minlength=len(self.entries)).astype(np.float32)
+
+    def search(self, text: str, k: int = 5, kinds: Optional[Iterable[str]] = None) -> List[SemanticHit]:
+        """Top-k entries by cosine similarity, optionally restricted to some kinds."""
+        scores = self.scores(text)
+        if kinds is not None:
+            scores = np.where(self._kind_mask(kinds), scores, 0.0)
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            SemanticHit(self.entries[i].label, float(scores[i]), self.entries[i].kind, self.entries[i].text)
+            for i in top
+            if scores[i] > 0
+        ]
+
+    def best_label(
+        self,
+        text: str,
+        kinds: Iterable[str],
+        threshold: float,
+        min_ratio: float = 1.5,
+        scores: Optional[np.ndarray] = None,
+    ) -> Optional[SemanticHit]:
+        """
+        Best label (aggregated as max over its entries) among `kinds`, if it
+        scores at least `threshold` and at least `min_ratio` times the
+        runner-up label; ambiguous queries return None. Pass precomputed
+        `scores` to reuse one scores() call for several kinds.
+        """
+        if scores is None:
+            scores = self.scores(text)
+        scores = np.where(self._kind_mask(kinds), scores, 0.0)
+        if not scores.any():
+            return None
+        per_label = np.maximum.reduceat(scores[self._label_order], self._label_starts)
+
+        order = np.argsort(-per_label)[:2]
+        top = float(per_label[order[0]])
+        runner_up = float(per_label[order[1]]) if len(order) > 1 else 0.0
+        if top < threshold or top < runner_up * min_ratio:
+            return None
+
+        label = self.labels[order[0]]
+        row = int(np.argmax(np.where(self.entry_labels == order[0], scores, -1.0)))
+        return SemanticHit(label, top, self.entries[row].kind, self.entries[row].text)
+
+    def _kind_mask(self, kinds: Iterable[str]) -> np.ndarray:
+        key = tuple(kinds)
+        mask = self._masks.get(key)
+        if mask is None:
+            wanted = [self.kinds.index(k) for k in key if k in self.kinds]
+            mask = self._masks[key] = np.isin(self.entry_kinds, wanted)
+        return mask
+
+
+def entries_fingerprint(entries: Sequence[Entry], dims: int = DEFAULT_DIMS) -> str:
+    raw = json.dumps([dims] + [list(e) for e in entries], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def load_or_build(entries: Sequence[Entry], directory: Optional[str] = INDEX_DIR, dims: int = DEFAULT_DIMS) -> SemanticIndex:
+    """
+    Reuse the memory-mapped index on disk if it matches `entries`, else
+    rebuild it. Each build lives in its own `<directory>/<fingerprint>/`
+    and is never rewritten in place, so processes still mapping an older
+    build keep reading valid pages after a rebuild.
+    """
+    entries = list(entries)
+    fingerprint = entries_fingerprint(entries, dims)
+    path = os.path.join(directory, fingerprint) if directory else None
+    if path:
+        index = SemanticIndex.load(path, fingerprint)
+        if index is not None:
+            return index
+
+    index = SemanticIndex.build(entries, dims)
+    if path:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            index.save(tmp, fingerprint)
+            os.replace(tmp, path)
+            _prune(directory, keep=fingerprint)
+        except OSError:
+            # another process got there first, or the disk is read-only
+            shutil.rmtree(tmp, ignore_errors=True)
+    return index
+
+def _prune(directory: str, keep: str) -> None:
+    """Remove other builds (open mappings stay valid after unlink)."""
+    for name in os.listdir(directory):
+        if name != keep and not name.endswith(".tmp"):
+            target = os.path.join(directory, name)
+            if os.path.isdir(target):
+                shutil.rmtree(target, ignore_errors=True)
+            else:
+                os.remove(target)
@@ -0,0 +1,336 @@
+# app/session_store.py
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import metrics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SESSIONS_DIR = os.path.join(BASE_DIR, "data", "sessions")
+SESSIONS_DB = os.getenv("CHATBOT_SESSIONS_DB", os.path.join(SESSIONS_DIR, "sessions.sqlite3"))
+
+DEFAULT_FLUSH_INTERVAL = 0.25   # seconds a batch may wait for more turns
+DEFAULT_BATCH_SIZE = 512
+
+log = logging.getLogger(__name__)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    " id TEXT PRIMARY KEY,"
+    " created REAL NOT NULL,"
+    " updated REAL NOT NULL,"
+    " turns INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions(created)",
+    "CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated)",
+    "CREATE TABLE IF NOT EXISTS turns ("
+    " session_id TEXT NOT NULL,"
+    " seq INTEGER NOT NULL,"
+    " role TEXT NOT NULL,"
+    " content TEXT NOT NULL,"
+    " ts REAL NOT NULL,"
+    " PRIMARY KEY (session_id, seq)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_turns_ts ON turns(ts)",
+)
+
+
+class SessionStore:
+    """
+    Append-only chat history in one SQLite database (WAL).
+
+    append()/sync() only queue the new turns; a single writer thread
+    commits whatever has queued up within `flush_interval` (or
+    `batch_size` turns) as one transaction, so hundreds of sessions
+    autosaving every message cost a few commits per second, and nothing
+    is ever rewritten. Readers use their own connection and never wait
+    for the writer. flush() blocks until everything queued so far is
+    committed.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = SESSIONS_DB,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._counts: Dict[str, int] = {}   # turns queued per session (this process)
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._reader: Optional[sqlite3.Connection] = None
+        self._writer: Optional[threading.Thread] = None
+        self._counters = {"turns": 0, "commits": 0, "errors": 0}
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                conn = self._connect()
+                for stmt in _SCHEMA:
+                    conn.execute(stmt)
+                conn.commit()
+                self._reader = conn
+            except (sqlite3.Error, OSError) as e:
+                # read-only disk: history stays in st.session_state only
+                log.warning("session store disabled (%s): %s", path, e)
+                self._reader = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commits survive an app crash; fsync happens at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def enabled(self) -> bool:
+        return self._reader is not None
+
+    # ---------------------------------------
+    # Writes (queued)
+    # ---------------------------------------
+    def _put(self, item: tuple) -> None:
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="session-store", daemon=True)
+                    self._writer.start()
+        self._queue.put(item)
+
+    def append(self, session_id: str, role: str, content: str, ts: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counts[session_id] = self._count(session_id) + 1
+        self._put(("turn", session_id, role, content, ts or time.time()))
+
+    def sync(self, session_id: str, messages: List[Dict[str, Any]]) -> int:
+        """Append the messages the store has not seen yet; returns how many."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            known = self._count(session_id)
+            new = messages[known:]
+            self._counts[session_id] = known + len(new)
+        now = time.time()
+        for msg in new:
+            self._put(("turn", session_id, msg.get("role", ""), msg.get("content", ""), msg.get("ts") or now))
+        return len(new)
+
+    def _count(self, session_id: str) -> int:
+        # caller holds self._lock
+        count = self._counts.get(session_id)
+        if count is None:
+            row = self._read("SELECT turns FROM sessions WHERE id = ?", (session_id,))
+            count = row[0][0] if row else 0
+        return count
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued before this call is committed."""
+        if not self.enabled or self._writer is None:
+            return True
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def _submit(self, fn) -> Any:
+        """Run fn(conn) on the writer thread (between batches) and return its result."""
+        future: Future = Future()
+        self._put(("call", fn, future))
+        return future.result()
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                conn.close()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            # group commit: collect what arrives shortly after the first turn
+            while item[0] == "turn" and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)   # finish this batch, then stop
+                    break
+                batch.append(item)
+            self._commit(conn, batch)
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[tuple]) -> None:
+        turns = [item for item in batch if item[0] == "turn"]
+        if turns:
+            started = time.perf_counter()
+            try:
+                with conn:
+                    for _, sid, role, content, ts in turns:
+                        conn.execute(
+                            "INSERT INTO sessions (id, created, updated, turns) VALUES (?, ?, ?, 1)"
+                            " ON CONFLICT(id) DO UPDATE SET updated = excluded.updated, turns = turns + 1",
+                            (sid, ts, ts),
+                        )
+                        conn.execute(
+                            "INSERT INTO turns (session_id, seq, role, content, ts)"
+                            " SELECT ?, turns - 1, ?, ?, ? FROM sessions WHERE id = ?",
+                            (sid, role, content, ts, sid),
+                        )
+                self._counters["turns"] += len(turns)
+                self._counters["commits"] += 1
+            except sqlite3.Error as e:
+                self._counters["errors"] += 1
+                log.warning("session store: dropped %d turns: %s", len(turns), e)
+                with self._lock:
+                    # re-read counts from the database next time
+                    for _, sid, *_ in turns:
+                        self._counts.pop(sid, None)
+            metrics.observe("stage_seconds", time.perf_counter() - started, stage="session_commit")
+
+        for item in batch:
+            if item[0] == "flush":
+                item[1].set()
+            elif item[0] == "call":
+                _, fn, future = item
+                try:
+                    future.set_result(fn(conn))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    # ---------------------------------------
+    # Reads
+    # ---------------------------------------
+    def _read(self, sql: str, params: tuple = ()) -> list:
+        if self._reader is None:
+            return []
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def get(self, session_id: str) -> List[Dict[str, Any]]:
+        """All committed turns of a session, in order."""
+        rows = self._read(
+            "SELECT role, content, ts FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+        )
+        return [{"role": role, "content": content, "ts": ts} for role, content, ts in rows]
+
+    def sessions(
+        self, since: Optional[float] = None, until: Optional[float] = None, limit: Optional[int] = 100
+    ) -> List[Dict[str, Any]]:
+        """Sessions last updated in [since, until), newest first."""
+        rows = self._read(
+            "SELECT id, created, updated, turns FROM sessions"
+            " WHERE updated >= ? AND updated < ? ORDER BY updated DESC LIMIT ?",
+            (since or 0.0, until or float("inf"), -1 if limit is None else limit),
+        )
+        return [{"id": sid, "created": c, "updated": u, "turns": n} for sid, c, u, n in rows]
+
+    def iter_turns(
+        self, since: Optional[float] = None, until: Optional[float] = None, batch: int = 5000
+    ) -> Iterator[Dict[str, Any]]:
+        """Every turn with since <= ts < until, oldest first, read in batches."""
+        last = (since or 0.0, "", -1)
+        until = until or float("inf")
+        while True:
+            rows = self._read(
+                "SELECT ts, session_id, seq, role, content FROM turns"
+                " WHERE (ts, session_id, seq) > (?, ?, ?) AND ts < ?"
+                " ORDER BY ts, session_id, seq LIMIT ?",
+                (*last, until, batch),
+            )
+            for ts, sid, seq, role, content in rows:
+                yield {"session_id": sid, "seq": seq, "role": role, "content": content, "ts": ts}
+            if len(rows) < batch:
+                return
+            last = rows[-1][:3]
+
+    def stats(self) -> Dict[str, Any]:
+        row = self._read("SELECT COUNT(*), COALESCE(SUM(turns), 0) FROM sessions")
+        sessions, turns = row[0] if row else (0, 0)
+        return dict(self._counters, sessions=sessions, stored_turns=turns,
+                    queued=self._queue.qsize(), path=self.path if self.enabled else None)
+
+    # ---------------------------------------
+    # Maintenance
+    # ---------------------------------------
+    def compact(self, max_age_days: Optional[float] = None) -> Dict[str, int]:
+        """
+        Drop sessions not updated for `max_age_days` (if given), fold the
+        WAL back into the database and release free pages.
+        """
+        if not self.enabled:
+            return {"sessions_removed": 0}
+        cutoff = time.time() - max_age_days * 86400 if max_age_days is not None else None
+
+        def run(conn: sqlite3.Connection) -> Dict[str, int]:
+            removed = 0
+            if cutoff is not None:
+                with conn:
+                    old = [r[0] for r in conn.execute("SELECT id FROM sessions WHERE updated < ?", (cutoff,))]
+                    for sid in old:
+                        conn.execute("DELETE FROM turns WHERE session_id = ?", (sid,))
+                        conn.execute("DELETE FROM sessions WHERE id = ?", (sid,))
+                    removed = len(old)
+                with self._lock:
+                    for sid in old:
+                        self._counts.pop(sid, None)
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return {"sessions_removed": removed}
+
+        return self._submit(run)
+
+    def import_json(self, paths: Iterable[str]) -> int:
+        """
+        Load old one-file-per-save exports (a JSON list of messages) as
+        sessions named after the file; files already imported are skipped.
+        """
+        imported = 0
+        for path in paths:
+            sid = "file:" + os.path.splitext(os.path.basename(path))[0]
+            if self._read("SELECT 1 FROM sessions WHERE id = ?", (sid,)):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    messages = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(messages, list):
+                continue
+            ts = os.path.getmtime(path)
+            self.sync(sid, [dict(m, ts=ts) for m in messages if isinstance(m, dict)])
+            imported += 1
+        self.flush()
+        return imported
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> SessionStore:
+    """Process-wide store (Streamlit reruns main.py, but imports stay loaded)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+                atexit.register(_store.flush, 5.0)
+    return _store
@@ -0,0 +1,141 @@
+# app/skill_index.py
+from typing import List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from phrase_matcher import PhraseMatcher
+
+
+def skill_key(name: str) -> str:
+    return " ".join(str(name).lower().split())
+
+
+class RoleComparison(NamedTuple):
+    role_a: str
+    role_b: str
+    shared: List[str]
+    only_a: List[str]
+    only_b: List[str]
+    jaccard: float      # |A ∩ B| / |A ∪ B|
+    cosine: float       # |A ∩ B| / sqrt(|A| |B|)
+
+
+class SkillIndex:
+    """
+    The skills of every role as a roles x skills 0/1 matrix, built once
+    per dataset version:
+
+        bits        skill -> roles inverted index, one packed bitset row per
+                    skill; "roles needing SQL and Python" is an AND of two
+                    rows
+        jaccard     roles x roles: shared / all skills of the pair
+        cosine      roles x roles: shared / sqrt(|A| |B|)
+
+    Both matrices come from one integer matrix product (the shared skill
+    count of every pair). Skill names are matched case-insensitively; the
+    first spelling seen in the dataset is the one shown.
+    """
+
+    def __init__(self, role_data: Mapping[str, Mapping]):
+        self.roles = list(role_data.keys())
+        self.skills: List[str] = []
+        self._skill_ids = {}
+        rows = []
+        for role in self.roles:
+            ids = []
+            for name in role_data[role].get("skills") or ():
+                key = skill_key(name)
+                if not key:
+                    continue
+                if key not in self._skill_ids:
+                    self._skill_ids[key] = len(self.skills)
+                    self.skills.append(str(name).strip())
+                ids.append(self._skill_ids[key])
+            rows.append(ids)
+        self._role_ids = {role: i for i, role in enumerate(self.roles)}
+
+        membership = np.zeros((len(self.roles), len(self.skills)), dtype=np.uint8)
+        for r, ids in enumerate(rows):
+            membership[r, ids] = 1
+        self.membership = membership
+        self.bits = np.packbits(membership.T, axis=1)
+
+        counts = membership.sum(axis=1).astype(np.float32)
+        m = membership.astype(np.int32)
+        shared = (m @ m.T).astype(np.float32)
+        union = counts[:, None] + counts[None, :] - shared
+        norms = np.sqrt(counts[:, None] * counts[None, :])
+        self.jaccard = np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+        self.cosine = np.divide(shared, norms, out=np.zeros_like(shared), where=norms > 0)
+        # every role's other roles, most similar first
+        self.neighbours = np.argsort(-self.jaccard, axis=1, kind="stable")
+
+        self.matcher = PhraseMatcher()
+        for key, i in self._skill_ids.items():
+            self.matcher.add(key, i)
+
+    # ---------- skills -> roles ----------
+    def find_skills(self, message: str) -> List[str]:
+        """Skills named in `message`, in order; the longest match wins where two overlap."""
+        found: List[int] = []
+        taken_until = -1
+        hits = sorted(self.matcher.finditer(message or ""), key=lambda h: (h[0], h[0] - h[1]))
+        for start, end, i in hits:
+            if start < taken_until:
+                continue
+            taken_until = end
+            if i not in found:
+                found.append(i)
+        return [self.skills[i] for i in found]
+
+    def _ids(self, skills: Sequence[str]) -> List[int]:
+        return [self._skill_ids[k] for k in map(skill_key, skills) if k in self._skill_ids]
+
+    def _roles_of(self, bits: np.ndarray) -> List[str]:
+        mask = np.unpackbits(bits, count=len(self.roles)).astype(bool)
+        return [self.roles[r] for r in np.flatnonzero(mask)]
+
+    def roles_with(self, skills: Sequence[str]) -> List[str]:
+        """Roles that list every one of `skills` (dataset order)."""
+        ids = self._ids(skills)
+        if not ids:
+            return []
+        return self._roles_of(np.bitwise_and.reduce(self.bits[ids], axis=0))
+
+    def roles_with_any(self, skills: Sequence[str]) -> List[Tuple[str, int]]:
+        """(role, how many of `skills` it lists) for roles listing at least one, most first."""
+        ids = self._ids(skills)
+        if not ids:
+            return []
+        hits = self.membership[:, ids].sum(axis=1)
+        order = np.argsort(-hits, kind="stable")
+        return [(self.roles[r], int(hits[r])) for r in order if hits[r]]
+
+    # ---------- role x role ----------
+    def compare(self, role_a: str, role_b: str) -> Optional[RoleComparison]:
+        a, b = self._role_ids.get(role_a), self._role_ids.get(role_b)
+        if a is None or b is None:
+            return None
+        row_a, row_b = self.membership[a].astype(bool), self.membership[b].astype(bool)
+        return RoleComparison(
+            role_a, role_b,
+            self._names(row_a & row_b), self._names(row_a & ~row_b), self._names(row_b & ~row_a),
+            float(self.jaccard[a, b]), float(self.cosine[a, b]),
+        )
+
+    def _names(self, mask: np.ndarray) -> List[str]:
+        return [self.skills[i] for i in np.flatnonzero(mask)]
+
+    def nearest(self, role: str, k: int = 3, exclude: Sequence[str] = ()) -> List[Tuple[str, float]]:
+        """The `k` roles sharing the most skills with `role` (Jaccard), best first."""
+        r = self._role_ids.get(role)
+        if r is None:
+            return []
+        skip = {r, *(self._role_ids[x] for x in exclude if x in self._role_ids)}
+        out = []
+        for o in self.neighbours[r]:
+            if len(out) == k or self.jaccard[r, o] <= 0:
+                break
+            if o not in skip:
+                out.append((self.roles[o], float(self.jaccard[r, o])))
+        return out
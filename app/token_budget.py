@@ -0,0 +1,222 @@
+# app/token_budget.py
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional
+
+import metrics
+
+# answers longer than this are cut; max_tokens never pays for more
+OUTPUT_CHAR_LIMIT = 4000
+MAX_COMPLETION_TOKENS = 900     # ~OUTPUT_CHAR_LIMIT at ~4.3 characters per token
+# system prompt + earlier turns + the template prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("CHATBOT_PROMPT_TOKENS", "1200"))
+# an item list that does not fit: "trim" (one call, items dropped) or "chunk" (one call per part)
+PROMPT_OVERFLOW = os.getenv("CHATBOT_PROMPT_OVERFLOW", "trim").lower()
+MESSAGE_OVERHEAD_TOKENS = 4     # role and separators of one chat message
+
+_PIECE = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]|_")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Offline BPE-style token estimate: a word up to 6 letters is one
+    token and longer words one more per 6 letters, numbers split into
+    3-digit groups, every punctuation mark and symbol is its own token.
+    TokenBudget.report() compares it with the counts OpenRouter reports.
+    """
+    n = 0
+    for piece in _PIECE.findall(text or ""):
+        n += 1 + (len(piece) - 1) // 6 if piece[0].isalpha() else 1
+    return n
+
+def estimate_messages(messages) -> int:
+    return sum(estimate_tokens(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages) + 2
+
+def trim_text(text: str, tokens: int) -> str:
+    """`text` cut (at a word boundary, with an ellipsis) to about `tokens` tokens."""
+    if estimate_tokens(text) <= tokens:
+        return text
+    cut = text[:max(0, tokens) * 4]
+    while cut and estimate_tokens(cut) > tokens - 1:
+        cut = cut[:int(len(cut) * 0.9)]
+    return cut.rsplit(" ", 1)[0].rstrip() + " …"
+
+
+# ---------------------------------------
+# Per-template budgets
+# ---------------------------------------
+class TemplateBudget(NamedTuple):
+    completion: int                 # max_tokens for the answer's fixed part
+    per_item: int = 0               # plus this per line of the `items` field
+    items: Optional[str] = None     # payload field with one item per line (trimmed / chunked)
+    text: Optional[str] = None      # free-text payload field (trimmed)
+    ceiling: int = MAX_COMPLETION_TOKENS
+
+# sized so today's dataset (5 roadmap steps, 3 projects) gets the limits
+# the branches used to hard-code
+TEMPLATE_BUDGETS = {
+    "role_summary": TemplateBudget(220),
+    "roadmap_expansion": TemplateBudget(90, per_item=30, items="roadmap"),
+    "projects_expansion": TemplateBudget(90, per_item=50, items="projects"),
+    "roadmap_step": TemplateBudget(200, text="step"),
+    "compare_roles": TemplateBudget(260),
+    "general_advice": TemplateBudget(260, text="question"),
+}
+DEFAULT_BUDGET = TemplateBudget(256)
+
+
+def _lines(value) -> List[str]:
+    return [line for line in str(value or "").split("\n") if line.strip()]
+
+
+class TokenBudget:
+    """
+    Sizes max_tokens per template from its payload (more roadmap steps,
+    more tokens; never past what OUTPUT_CHAR_LIMIT would cut), fits
+    prompts into `prompt_tokens` by trimming or chunking item lists and
+    trimming free text, and keeps per-template usage stats from the
+    `usage` OpenRouter reports (estimates where it reports none).
+    """
+
+    def __init__(
+        self,
+        prompt_tokens: int = PROMPT_TOKEN_BUDGET,
+        overflow: str = PROMPT_OVERFLOW,
+        templates: Mapping[str, TemplateBudget] = TEMPLATE_BUDGETS,
+    ):
+        self.prompt_tokens = prompt_tokens
+        self.overflow = overflow
+        self.templates = dict(templates)
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def spec(self, template_key: str) -> TemplateBudget:
+        return self.templates.get(template_key, DEFAULT_BUDGET)
+
+    def max_tokens(self, template_key: str, payload) -> int:
+        spec = self.spec(template_key)
+        tokens = spec.completion
+        if spec.items and isinstance(payload, Mapping):
+            tokens += spec.per_item * len(_lines(payload.get(spec.items)))
+        return min(tokens, spec.ceiling, MAX_COMPLETION_TOKENS)
+
+    def fit(self, template_key: str, payload: dict, render: Callable[[dict], str], fixed_tokens: int = 0) -> List[dict]:
+        """
+        `payload` as one or more payloads whose rendered prompt fits the
+        budget next to `fixed_tokens` (system prompt, context). One entry
+        unless items had to be chunked.
+        """
+        room = self.prompt_tokens - fixed_tokens - 2 * MESSAGE_OVERHEAD_TOKENS
+        if estimate_tokens(render(payload)) <= room:
+            return [payload]
+        spec = self.spec(template_key)
+
+        if spec.text and spec.text in payload:
+            others = estimate_tokens(render(dict(payload, **{spec.text: ""})))
+            self._count(template_key, "trimmed")
+            return [dict(payload, **{spec.text: trim_text(str(payload[spec.text]), max(16, room - others))})]
+
+        if not spec.items or spec.items not in payload:
+            return [payload]   # nothing that can give
+        items = _lines(payload[spec.items])
+        overhead = estimate_tokens(render(dict(payload, **{spec.items: ""})))
+        parts: List[List[str]] = [[]]
+        used = overhead
+        for item in items:
+            cost = estimate_tokens(item) + 1
+            if parts[-1] and used + cost > room:
+                if self.overflow != "chunk":
+                    break
+                parts.append([])
+                used = overhead
+            parts[-1].append(item)
+            used += cost
+
+        if self.overflow == "chunk" and len(parts) > 1:
+            self._count(template_key, "chunked")
+            return [dict(payload, **{spec.items: "\n".join(part)}) for part in parts]
+        kept = parts[0]
+        self._count(template_key, "trimmed")
+        if len(kept) < len(items):
+            kept = kept + [f"(and {len(items) - len(kept)} more)"]
+        return [dict(payload, **{spec.items: "\n".join(kept)})]
+
+    # -- usage ---------------------------------------------------------
+    def _stats_for(self, template_key: str) -> Dict[str, int]:
+        return self._stats.setdefault(template_key, dict.fromkeys(
+            ("calls", "prompt_tokens", "completion_tokens", "estimated_prompt_tokens", "max_tokens",
+             "at_limit", "unreported", "trimmed", "chunked"), 0))
+
+    def _count(self, template_key: str, action: str) -> None:
+        with self._lock:
+            self._stats_for(template_key)[action] += 1
+        metrics.inc("llm_prompts_fitted_total", template=template_key, action=action)
+
+    def record(self, template_key: str, result, max_tokens: int, estimated_prompt: int) -> None:
+        """One finished call: usage from result["raw"]["usage"], else estimated from the text."""
+        usage = (result.get("raw") or {}).get("usage") or {}
+        prompt = usage.get("prompt_tokens")
+        completion = usage.get("completion_tokens")
+        reported = isinstance(prompt, (int, float)) and isinstance(completion, (int, float))
+        if not reported:
+            prompt, completion = estimated_prompt, estimate_tokens(result.get("content") or "")
+        with self._lock:
+            stats = self._stats_for(template_key)
+            stats["calls"] += 1
+            if reported:
+                stats["prompt_tokens"] += int(prompt)
+                stats["completion_tokens"] += int(completion)
+                stats["estimated_prompt_tokens"] += estimated_prompt
+                stats["max_tokens"] += max_tokens
+            else:
+                stats["unreported"] += 1
+            # stopped by max_tokens, most likely mid-sentence
+            stats["at_limit"] += int(completion >= max_tokens)
+        metrics.inc("llm_template_tokens_total", prompt, template=template_key, kind="prompt")
+        metrics.inc("llm_template_tokens_total", completion, template=template_key, kind="completion")
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per template: calls, mean prompt / completion tokens (as reported),
+        how far the local estimate was off, the share of max_tokens left
+        unused and how often answers ran into max_tokens.
+        """
+        out = {}
+        with self._lock:
+            for template_key, s in sorted(self._stats.items()):
+                reported = s["calls"] - s["unreported"]
+                out[template_key] = {
+                    "calls": s["calls"],
+                    "prompt_tokens_mean": s["prompt_tokens"] / reported if reported else None,
+                    "completion_tokens_mean": s["completion_tokens"] / reported if reported else None,
+                    "estimate_ratio": (s["estimated_prompt_tokens"] / s["prompt_tokens"]) if s["prompt_tokens"] else None,
+                    "unused_max_tokens": (1 - s["completion_tokens"] / s["max_tokens"]) if reported and s["max_tokens"] else None,
+                    "at_limit_rate": s["at_limit"] / s["calls"] if s["calls"] else None,
+                    "trimmed": s["trimmed"],
+                    "chunked": s["chunked"],
+                }
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+_budget: Optional[TokenBudget] = None
+_budget_lock = threading.Lock()
+
+def get_token_budget() -> TokenBudget:
+    global _budget
+    if _budget is None:
+        with _budget_lock:
+            if _budget is None:
+                _budget = TokenBudget()
+    return _budget
+
+def configure_token_budget(**kwargs) -> TokenBudget:
+    """Replace the shared budget manager (kwargs go to TokenBudget)."""
+    global _budget
+    with _budget_lock:
+        _budget = TokenBudget(**kwargs)
+    return _budget
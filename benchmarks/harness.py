@@ -0,0 +1,187 @@
+# benchmarks/harness.py
+"""Shared setup for the benchmark scripts: pipeline wiring, message mix, stats, result files."""
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+# synthetic placeholder roles ("Learn Python", "<Role> project 1"), NOT
+# career content: only for running the benchmarks in a checkout that has
+# no data/role_skill_map.json
+SAMPLE_DATA_PATH = os.path.join(BENCH_DIR, "fixtures", "sample_role_skill_map.json")
+
+sys.path.append(APP_DIR)
+
+
+# ---------------------------------------
+# Pipeline wiring
+# ---------------------------------------
+def sample_data_path() -> Optional[str]:
+    """The fixture to load instead of the real dataset, or None if that exists."""
+    real = os.path.join(BENCH_DIR, "..", "data", "role_skill_map.json")
+    return None if os.path.exists(real) else SAMPLE_DATA_PATH
+
+def setup_pipeline(llm_url: Optional[str] = None, cache: bool = False):
+    """
+    Import backend pointed at `llm_url` (e.g. the mock server). With
+    cache=False the response cache and answer pack are disabled so every
+    LLM-backed answer goes through the model call. Without the real
+    dataset the synthetic fixture is loaded (sample_data_path()).
+    """
+    if llm_url:
+        os.environ["OPENROUTER_URL"] = llm_url
+        os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+    import backend
+    import llm
+    from answer_pack import AnswerPack
+    from cache import ResponseCache
+
+    if sample_data_path():
+        backend.DATA_PATH = sample_data_path()
+    if llm_url and llm._default_client is not None and llm._default_client.url != llm_url:
+        llm._default_client = llm.OpenRouterClient(url=llm_url)
+    if not cache:
+        backend.LLM_CACHE = ResponseCache(path=None, max_memory_items=0)
+        backend.ANSWER_PACK = AnswerPack()
+    return backend
+
+
+# ---------------------------------------
+# Message mix
+# ---------------------------------------
+# (weight, kind, template): roughly what the chat log looks like
+MESSAGE_MIX = [
+    (22, "skills", "What skills are needed for {role}?"),
+    (15, "roadmap", "Roadmap for {role}"),
+    (12, "projects", "Project ideas for {role}"),
+    (10, "role_info", "What is a {role}?"),
+    (5, "expand", "Explain the roadmap for {role} in detail"),
+    (4, "expand", "Can you elaborate on {role} projects?"),
+    (3, "expand", "explain the skills of a {role}"),
+    (10, "compare", "{role} vs {role2}"),
+    (7, "resume", "Give me resume tips"),
+    (6, "general", "How do I prepare for a technical interview?"),
+    (3, "general", "hello"),
+    (3, "general", "which programming language should I learn first"),
+]
+
+LLM_OUTPUTS = [
+    "<s>[INST] ### Overview\n- Data work [/INST] with Python and SQL.</s>",
+    "<|im_start|>assistant\n### Roadmap\n" + "\n".join(f"{i}. Learn topic {i}" for i in range(1, 40)) + "<|im_end|>",
+    "<think>planning the answer</think>### Projects\n" + "- Build a dashboard\n" * 60,
+    "Plain answer without any artifacts. " * 40,
+]
+
+def sample_messages(n: int, roles: Sequence[str], seed: int = 0) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    weights = [w for w, _, _ in MESSAGE_MIX]
+    out = []
+    for _ in range(n):
+        _, kind, template = rng.choices(MESSAGE_MIX, weights=weights)[0]
+        a, b = rng.sample(list(roles), 2)
+        out.append({"kind": kind, "message": template.format(role=a, role2=b)})
+    return out
+
+
+# ---------------------------------------
+# Stats
+# ---------------------------------------
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return float("nan")
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    values = sorted(samples)
+    return {
+        "n": len(values),
+        "min": values[0],
+        "mean": statistics.fmean(values),
+        "stddev": statistics.pstdev(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1],
+    }
+
+def bench(fn: Callable[[], None], rounds: int = 20, min_time: float = 0.2, warmup: int = 1) -> Dict[str, float]:
+    """
+    Time `fn` like pytest-benchmark does: calibrate how many calls fit in
+    `min_time`, then collect `rounds` per-call timings (seconds).
+    """
+    for _ in range(warmup):
+        fn()
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / rounds or iterations >= 1 << 20:
+            break
+        iterations *= 2
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - start) / iterations)
+    stats = summarize(samples)
+    stats["iterations"] = iterations
+    stats["ops"] = 1.0 / stats["p50"] if stats["p50"] else float("inf")
+    return stats
+
+
+# ---------------------------------------
+# Result files
+# ---------------------------------------
+def save_results(name: str, kind: str, results: Dict[str, Dict[str, float]], params: Dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{kind}-{name}.json")
+    data = {
+        "kind": kind,
+        "name": name,
+        "created": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+def load_results(name_or_path: str, kind: str) -> Dict[str, Dict[str, float]]:
+    path = name_or_path if os.path.exists(name_or_path) else os.path.join(RESULTS_DIR, f"{kind}-{name_or_path}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+def print_comparison(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], metric: str = "p50") -> None:
+    print(f"\n{'benchmark':<36} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, stats in current.items():
+        old = baseline.get(name, {}).get(metric)
+        new = stats.get(metric)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else float("nan")
+        print(f"{name:<36} {fmt_seconds(old):>12} {fmt_seconds(new):>12} {change:>+8.1f}%")
+
+def fmt_seconds(s: float) -> str:
+    if s != s:
+        return "nan"
+    if s < 1e-3:
+        return f"{s * 1e6:.2f}us"
+    if s < 1:
+        return f"{s * 1e3:.2f}ms"
+    return f"{s:.3f}s"
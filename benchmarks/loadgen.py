@@ -0,0 +1,155 @@
+# benchmarks/loadgen.py
+"""
+Load generator: replays the realistic message mix through get_response
+(or stream_response) at a target rate and reports latency percentiles
+and throughput, then per-template token usage.
+
+Open loop: request i is due at start + i / qps (or Poisson arrivals) no
+matter how slow earlier ones were, and latency is measured from that
+due time, so queueing behind a saturated pool shows up in the numbers.
+By default the LLM is the in-process mock server; --url targets another
+endpoint (careful: the real API has quotas).
+
+    python benchmarks/loadgen.py --qps 20 --duration 30 --latency 0.5 --error-rate 0.05
+    python benchmarks/loadgen.py --mode stream --save stream-before
+"""
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import fmt_seconds, load_results, print_comparison, sample_messages, save_results, setup_pipeline, summarize
+from mock_openrouter import MockOpenRouter, add_mock_arguments, config_from_args
+
+
+def one_request(backend, message, mode, due):
+    """Run one chat turn; returns (latency_s, ttfb_s, degraded)."""
+    intent = backend.get_intent(message)
+    plan = backend.plan_response(message, intent)
+    if mode == "stream":
+        ttfb = None
+        parts = []
+        for chunk in backend.stream_response(message, intent):
+            if ttfb is None:
+                ttfb = time.perf_counter() - due
+            parts.append(chunk)
+        reply = "".join(parts)
+    else:
+        reply = backend.get_response(message, intent)
+        ttfb = None
+    latency = time.perf_counter() - due
+    degraded = bool(plan.template_key and plan.fallback and reply.endswith(plan.fallback))
+    return latency, ttfb, degraded
+
+def run_load(backend, messages, qps, duration, concurrency, mode, poisson, seed):
+    rng = random.Random(seed)
+    total = int(qps * duration)
+    records = []
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def task(item, due):
+        try:
+            latency, ttfb, degraded = one_request(backend, item["message"], mode, due)
+        except Exception as e:   # count, keep the load going
+            with lock:
+                errors[type(e).__name__] += 1
+            return
+        with lock:
+            records.append((item["kind"], latency, ttfb, degraded))
+
+    start = time.perf_counter()
+    due = start
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            due += rng.expovariate(qps) if poisson else 1.0 / qps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(task, messages[i % len(messages)], due)
+    wall = time.perf_counter() - start
+    return records, dict(errors), total, wall
+
+def report(records, errors, sent, wall):
+    results = {}
+    latencies = [r[1] for r in records]
+    if latencies:
+        results["all"] = summarize(latencies)
+    ttfbs = [r[2] for r in records if r[2] is not None]
+    if ttfbs:
+        results["ttfb"] = summarize(ttfbs)
+    by_kind = defaultdict(list)
+    for kind, latency, _, _ in records:
+        by_kind[kind].append(latency)
+    for kind, values in sorted(by_kind.items()):
+        results[f"kind={kind}"] = summarize(values)
+
+    degraded = sum(1 for r in records if r[3])
+    print(f"sent {sent}, completed {len(records)}, errors {sum(errors.values())} {errors or ''}, "
+          f"degraded (LLM fallback) {degraded}")
+    print(f"wall {wall:.1f}s, throughput {len(records) / wall:.1f} req/s")
+    print(f"\n{'':<18} {'n':>6} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+    for name, s in results.items():
+        print(f"{name:<18} {s['n']:>6} {fmt_seconds(s['p50']):>10} {fmt_seconds(s['p95']):>10} "
+              f"{fmt_seconds(s['p99']):>10} {fmt_seconds(s['max']):>10}")
+    results["summary"] = {
+        "sent": sent, "completed": len(records), "errors": sum(errors.values()),
+        "degraded": degraded, "throughput": len(records) / wall if wall else 0.0,
+    }
+    return results
+
+def print_token_report(report) -> None:
+    if not report:
+        return
+    print(f"\n{'template':<20} {'calls':>6} {'prompt':>8} {'compl.':>8} {'est/act':>8} {'unused':>7} {'at max':>7}")
+    for template, s in report.items():
+        cells = [
+            f"{s['prompt_tokens_mean']:.0f}" if s["prompt_tokens_mean"] is not None else "-",
+            f"{s['completion_tokens_mean']:.0f}" if s["completion_tokens_mean"] is not None else "-",
+            f"{s['estimate_ratio']:.2f}" if s["estimate_ratio"] is not None else "-",
+            f"{s['unused_max_tokens']:.0%}" if s["unused_max_tokens"] is not None else "-",
+            f"{s['at_limit_rate']:.0%}" if s["at_limit_rate"] is not None else "-",
+        ]
+        print(f"{template:<20} {s['calls']:>6} {cells[0]:>8} {cells[1]:>8} {cells[2]:>8} {cells[3]:>7} {cells[4]:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qps", type=float, default=10.0, help="target request rate")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=64, help="max requests in flight")
+    parser.add_argument("--mode", choices=("sync", "stream"), default="sync")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times")
+    parser.add_argument("--cache", action="store_true", help="keep the response cache and answer pack on")
+    parser.add_argument("--url", help="LLM endpoint instead of the in-process mock")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="NAME", help="write results to benchmarks/results/load-NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against a saved run (name or path)")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock = None
+    if not args.url:
+        mock = MockOpenRouter(config_from_args(args)).start()
+    try:
+        backend = setup_pipeline(args.url or mock.url, cache=args.cache)
+        messages = sample_messages(max(int(args.qps * args.duration), 1), list(backend.ROLE_DATA), args.seed)
+        print(f"{args.mode} load: {args.qps:g} req/s for {args.duration:g}s, up to {args.concurrency} in flight")
+        records, errors, sent, wall = run_load(
+            backend, messages, args.qps, args.duration, args.concurrency, args.mode, args.poisson, args.seed
+        )
+    finally:
+        if mock:
+            print(f"mock: {mock.counters}")
+            mock.stop()
+
+    results = report(records, errors, sent, wall)
+    print_token_report(backend.get_token_budget().report())
+    if args.save:
+        print("saved", save_results(args.save, "load", results, vars(args)))
+    if args.compare:
+        print_comparison(results, load_results(args.compare, "load"), metric="p95")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/micro.py
+"""
+Micro-benchmarks for the chat pipeline hot paths.
+
+    get_intent / extract_role_from_text   over the realistic message mix,
+                                          with and without the memo cache
+    clean_llm_text                        on typical model outputs
+    get_response                          deterministic answers, and LLM
+                                          answers against the local mock
+
+    python benchmarks/micro.py --save before
+    ... change something ...
+    python benchmarks/micro.py --save after --compare before
+"""
+import argparse
+import itertools
+
+from harness import bench, fmt_seconds, load_results, print_comparison, sample_messages, save_results, setup_pipeline, LLM_OUTPUTS
+from mock_openrouter import MockConfig, MockOpenRouter
+
+
+def cycle(items):
+    """Zero-argument callable returning the next item on each call."""
+    return itertools.cycle(items).__next__
+
+def run(backend, messages, rounds, min_time, only=None):
+    snapshot = backend.current_snapshot()
+
+    def clear_memo():
+        snapshot.scan.cache_clear()
+        snapshot.analyze.cache_clear()
+
+    texts = [m["message"] for m in messages]
+    deterministic = [m["message"] for m in messages if m["kind"] in ("skills", "roadmap", "projects", "role_info", "compare")]
+    llm_backed = [m["message"] for m in messages if m["kind"] in ("expand", "general")]
+
+    next_text = cycle(texts)
+    next_det = cycle(deterministic)
+    next_llm = cycle(llm_backed)
+    next_output = cycle(LLM_OUTPUTS)
+
+    def uncached(fn):
+        def call():
+            clear_memo()
+            fn(next_text())
+        return call
+
+    cases = {
+        "get_intent": lambda: backend.get_intent(next_text()),
+        "get_intent[uncached]": uncached(backend.get_intent),
+        "extract_role_from_text": lambda: backend.extract_role_from_text(next_text()),
+        "extract_role_from_text[uncached]": uncached(backend.extract_role_from_text),
+        "clean_llm_text": lambda: backend.clean_llm_text(next_output()),
+        "get_response[deterministic]": lambda: (lambda m: backend.get_response(m, backend.get_intent(m)))(next_det()),
+        "get_response[llm-mock]": lambda: (lambda m: backend.get_response(m, backend.get_intent(m)))(next_llm()),
+    }
+
+    results = {}
+    for name, fn in cases.items():
+        if only and not any(o in name for o in only):
+            continue
+        # network-bound cases get fewer rounds
+        r, t = (max(5, rounds // 4), min_time) if "mock" in name else (rounds, min_time)
+        stats = bench(fn, rounds=r, min_time=t)
+        results[name] = stats
+        print(f"{name:<36} p50 {fmt_seconds(stats['p50']):>10}  min {fmt_seconds(stats['min']):>10}  "
+              f"stddev {fmt_seconds(stats['stddev']):>10}  {stats['ops']:>12,.0f} ops/s")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds of calls per benchmark (approx.)")
+    parser.add_argument("--messages", type=int, default=2000, help="size of the message mix")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="mock LLM latency (s)")
+    parser.add_argument("--only", nargs="*", help="run benchmarks whose name contains any of these")
+    parser.add_argument("--save", metavar="NAME", help="write results to benchmarks/results/micro-NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against a saved run (name or path)")
+    args = parser.parse_args()
+
+    mock = MockOpenRouter(MockConfig(latency=args.latency, seed=args.seed)).start()
+    try:
+        backend = setup_pipeline(mock.url)
+        messages = sample_messages(args.messages, list(backend.ROLE_DATA), args.seed)
+        results = run(backend, messages, args.rounds, args.min_time, args.only)
+    finally:
+        mock.stop()
+
+    if args.save:
+        print("saved", save_results(args.save, "micro", results, vars(args)))
+    if args.compare:
+        print_comparison(results, load_results(args.compare, "micro"))
+
+if __name__ == "__main__":
+    main()
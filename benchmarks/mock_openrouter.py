@@ -0,0 +1,210 @@
+# benchmarks/mock_openrouter.py
+"""
+Local stand-in for the OpenRouter chat completions endpoint.
+
+Answers both plain and `stream: true` requests with configurable latency,
+jitter, slow tail answers, injected 429/503 errors and an optional req/s
+quota, so the pipeline can be measured without the network or the
+free-tier quota.
+
+    python benchmarks/mock_openrouter.py --port 8765 --latency 0.4 --error-rate 0.05
+    OPENROUTER_URL=http://127.0.0.1:8765/api/v1/chat/completions OPENROUTER_API_KEY=x streamlit run app/main.py
+"""
+import argparse
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+DEFAULT_ANSWER = (
+    "<s>### Overview\n- A mock answer from the local OpenRouter stand-in.\n\n"
+    "### Details\n- First point\n- Second point\n- Third point</s>"
+)
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.2             # seconds before the response (or first chunk)
+    jitter: float = 0.0              # +/- uniform seconds added to latency
+    tail_rate: float = 0.0           # share of requests that take tail_latency extra
+    tail_latency: float = 2.0
+    error_rate: float = 0.0          # share of requests answered with an error
+    error_codes: Tuple[int, ...] = (429, 503)
+    rate_limit: float = 0.0          # req/s allowed before answering 429 (0 = no limit)
+    chunk_delay: float = 0.02        # seconds between streamed chunks
+    chunk_chars: int = 12            # characters per streamed chunk
+    answer: str = DEFAULT_ANSWER
+    seed: int = 0
+
+
+def _answer(cfg: MockConfig, body: dict) -> Tuple[str, dict]:
+    """The answer, cut at max_tokens, and its usage (~4 characters per token)."""
+    text = cfg.answer
+    max_tokens = body.get("max_tokens")
+    if isinstance(max_tokens, int) and len(text) > max_tokens * 4:
+        text = text[:max_tokens * 4]
+    prompt = sum(len(str(m.get("content", ""))) // 4 + 4 for m in body.get("messages") or [] if isinstance(m, dict))
+    return text, {"prompt_tokens": prompt, "completion_tokens": len(text) // 4}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockOpenRouter"
+
+    def setup(self):
+        super().setup()
+        # headers and body go out in separate writes; without this, Nagle +
+        # delayed ACK add ~40 ms to every keep-alive response
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        mock = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+        cfg = mock.config
+
+        with mock.lock:
+            mock.counters["requests"] += 1
+            fail = mock.rng.random() < cfg.error_rate
+            code = mock.rng.choice(cfg.error_codes) if fail else 200
+            if not fail and cfg.rate_limit > 0:
+                # server-side token bucket, one second of burst
+                now = time.monotonic()
+                mock.allowance = min(cfg.rate_limit, mock.allowance + (now - mock.allowance_at) * cfg.rate_limit)
+                mock.allowance_at = now
+                if mock.allowance < 1:
+                    fail, code = True, 429
+                else:
+                    mock.allowance -= 1
+            delay = max(0.0, cfg.latency + mock.rng.uniform(-cfg.jitter, cfg.jitter))
+            if mock.rng.random() < cfg.tail_rate:
+                delay += cfg.tail_latency
+            if fail:
+                mock.counters[f"errors_{code}"] = mock.counters.get(f"errors_{code}", 0) + 1
+
+        time.sleep(delay)
+        if fail:
+            out = json.dumps({"error": {"code": code, "message": "injected by mock"}}).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+            return
+
+        text, usage = _answer(cfg, body)
+        if body.get("stream"):
+            self._stream(cfg, text, usage if (body.get("usage") or {}).get("include") else None)
+            return
+
+        out = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": text}}],
+            "usage": usage,
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def _stream(self, cfg: MockConfig, text: str, usage: Optional[dict]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(data: bytes) -> None:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        write(b": OPENROUTER PROCESSING\n\n")
+        for i in range(0, len(text), cfg.chunk_chars):
+            delta = {"choices": [{"delta": {"content": text[i:i + cfg.chunk_chars]}}]}
+            write(("data: " + json.dumps(delta) + "\n\n").encode())
+            if cfg.chunk_delay:
+                time.sleep(cfg.chunk_delay)
+        if usage:
+            # OpenRouter sends usage in a last event without choices
+            write(("data: " + json.dumps({"choices": [], "usage": usage}) + "\n\n").encode())
+        write(b"data: [DONE]\n\n")
+        write(b"")
+
+    def log_message(self, *args):
+        pass
+
+
+class MockOpenRouter(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.config = config or MockConfig()
+        self.rng = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0}
+        self.allowance = self.config.rate_limit
+        self.allowance_at = time.monotonic()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v1/chat/completions"
+
+    def start(self) -> "MockOpenRouter":
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-openrouter", daemon=True)
+        self._thread.start()
+        return self
+
+    def handle_error(self, request, client_address):
+        # clients hanging up early (cancelled hedges, timeouts) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=MockConfig.latency, help="mock response latency (s)")
+    parser.add_argument("--jitter", type=float, default=MockConfig.jitter, help="mock latency jitter (s)")
+    parser.add_argument("--tail-rate", type=float, default=MockConfig.tail_rate, help="share of slow (tail) answers")
+    parser.add_argument("--tail-latency", type=float, default=MockConfig.tail_latency, help="extra latency of a tail answer (s)")
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate, help="share of 429/503 answers")
+    parser.add_argument("--rate-limit", type=float, default=MockConfig.rate_limit, help="mock req/s quota, 429 above it")
+    parser.add_argument("--chunk-delay", type=float, default=MockConfig.chunk_delay, help="delay between streamed chunks (s)")
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(latency=args.latency, jitter=args.jitter, tail_rate=args.tail_rate,
+                      tail_latency=args.tail_latency, error_rate=args.error_rate,
+                      rate_limit=args.rate_limit, chunk_delay=args.chunk_delay)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockOpenRouter(config_from_args(args), args.host, args.port)
+    print(f"mock OpenRouter on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.counters))
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/sanitize.py
+"""
+clean_llm_text before and after the single-scan sanitizer.
+
+"legacy" is the previous implementation (14 re.sub calls in sequence,
+patterns looked up in re's cache on every call); "sanitizer" is
+sanitizer.Sanitizer. Inputs are the typical outputs from harness plus
+large ones (~100 KB with and without artifacts). Also checks both give
+the same text, and that streaming through StreamCleaner in random chunk
+sizes matches the one-shot result.
+
+    python benchmarks/sanitize.py --save after
+"""
+import argparse
+import itertools
+import random
+import re
+
+from harness import bench, fmt_seconds, load_results, print_comparison, save_results, LLM_OUTPUTS
+
+import sanitizer
+
+LEGACY_PATTERNS = [
+    r"<s>", r"</s>",
+    r"\[INST\]", r"\[/INST\]",
+    r"\[B_INST\]", r"\[/B_INST\]",
+    r"<<SYS>>", r"<</SYS>>",
+    r"<\|im_start\|>", r"<\|im_end\|>",
+    r"<\|assistant\|>", r"<\|user\|>",
+    r"</?think>", r"</?think_detail>"
+]
+
+def legacy_clean(text):
+    if not text:
+        return text
+    for pat in LEGACY_PATTERNS:
+        text = re.sub(pat, "", text, flags=re.IGNORECASE)
+    return text.strip()
+
+def inputs():
+    artifacts = "".join(LLM_OUTPUTS)
+    return {
+        "typical": LLM_OUTPUTS,
+        "large+artifacts": [artifacts * (100_000 // len(artifacts))],
+        "large-plain": ["Plain answer without any artifacts. " * 2800],
+        "large-markdown": [("### Step\n- Learn [SQL](https://example.com) <b>today</b>\n" * 1800)],
+    }
+
+def check(texts, rng):
+    s = sanitizer.get_sanitizer()
+    for text in texts:
+        expected = legacy_clean(text)
+        assert s.clean(text) == expected, "one-shot output differs from legacy"
+        cleaner = s.stream(max_chars=len(text) + 1)
+        pos, out = 0, []
+        while pos < len(text):
+            step = rng.randint(1, 24)
+            out.append(cleaner.feed(text[pos:pos + step]))
+            pos += step
+        out.append(cleaner.finish())
+        assert "".join(out) == expected, "streamed output differs from one-shot"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="NAME", help="write results to benchmarks/results/sanitize-NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against a saved run (name or path)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    s = sanitizer.get_sanitizer()
+    results = {}
+    for name, texts in inputs().items():
+        check(texts, rng)
+        size = sum(len(t) for t in texts)
+        timings = {}
+        for impl, fn in (("legacy", legacy_clean), ("sanitizer", s.clean)):
+            next_text = itertools.cycle(texts).__next__
+            stats = bench(lambda: fn(next_text()), rounds=args.rounds, min_time=args.min_time)
+            results[f"{name}[{impl}]"] = timings[impl] = stats
+        speedup = timings["legacy"]["p50"] / timings["sanitizer"]["p50"]
+        print(f"{name:<16} {size:>8} chars  legacy {fmt_seconds(timings['legacy']['p50']):>10}  "
+              f"sanitizer {fmt_seconds(timings['sanitizer']['p50']):>10}  x{speedup:.1f}")
+
+    if args.save:
+        print("saved", save_results(args.save, "sanitize", results, vars(args)))
+    if args.compare:
+        print_comparison(results, load_results(args.compare, "sanitize"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/startup.py
+"""
+Cold-start cost of the backend, each sample in a fresh interpreter.
+
+    import_backend        `import backend` (what main.py / a worker pays first)
+    first_deterministic   import + first ROLE_DATA answer
+    first_semantic        import + first message only the semantic fallback resolves
+    warm_up               import + backend.warm_up() (dataset, semantic index,
+                          answer pack, LLM cache, HTTP client)
+
+--importtime prints the modules that dominate `import backend`
+(python -X importtime), by cumulative and by self time.
+
+    python benchmarks/startup.py --save before
+    ... change something ...
+    python benchmarks/startup.py --save after --compare before
+    python benchmarks/startup.py --importtime --top 25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from harness import APP_DIR, fmt_seconds, load_results, print_comparison, sample_data_path, save_results, summarize
+
+DETERMINISTIC = "What skills are needed for Data Scientist?"
+SEMANTIC = "i like drawing interfaces and talking to users"
+
+# each snippet runs after `import time; t0 = time.perf_counter()`
+# and leaves the elapsed seconds in `elapsed`
+SNIPPETS = {
+    "import_backend": "import backend",
+    "first_deterministic": (
+        "import backend\n"
+        f"backend.get_response({DETERMINISTIC!r}, backend.get_intent({DETERMINISTIC!r}))"
+    ),
+    "first_semantic": f"import backend\nbackend.analyze_message({SEMANTIC!r})",
+    "warm_up": "import backend\nbackend.warm_up()",
+}
+
+CHILD = """\
+import json, sys, time
+t0 = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - t0
+loaded = [m for m in ("numpy", "requests", "asyncio", "http.server") if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded}}))
+"""
+
+
+def run_child(body: str, *flags: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, CHATBOT_WARMUP="0", CHATBOT_METRICS="0")
+    if sample_data_path():
+        # before anything touches the dataset (import backend alone does not)
+        body = body.replace("import backend", f"import backend\nbackend.DATA_PATH = {sample_data_path()!r}", 1)
+    return subprocess.run(
+        [sys.executable, *flags, "-c", CHILD.format(body=body)],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+
+def measure(rounds: int, only=None):
+    results, loaded = {}, {}
+    for name, body in SNIPPETS.items():
+        if only and not any(o in name for o in only):
+            continue
+        samples = []
+        for _ in range(rounds):
+            out = json.loads(run_child(body).stdout.strip().splitlines()[-1])
+            samples.append(out["elapsed"])
+            loaded[name] = out["loaded"]
+        results[name] = summarize(samples)
+    return results, loaded
+
+
+# ---------------------------------------
+# -X importtime
+# ---------------------------------------
+def import_profile(body: str = "import backend"):
+    """[(module, self_seconds, cumulative_seconds, depth)] from python -X importtime."""
+    rows = []
+    # lines are in completion order; everything up to `site` is interpreter startup
+    for line in run_child(body, "-X", "importtime").stderr.splitlines():
+        # "import time:   self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        name = fields[2].rstrip()
+        depth = len(name) - len(name.lstrip())
+        if name.strip() == "site" and depth == 1:
+            rows = []
+            continue
+        rows.append((name.strip(), int(fields[0]) / 1e6, int(fields[1]) / 1e6, depth))
+    return rows
+
+def print_import_profile(rows, top: int) -> None:
+    # only top-level imports add up to the total
+    total = sum(cumulative for _, _, cumulative, depth in rows if depth == 1)
+    print(f"import backend: {fmt_seconds(total)} in {len(rows)} modules")
+    for title, key in (("cumulative", 2), ("self", 1)):
+        print(f"\n{'module (by ' + title + ')':<44} {'self':>10} {'cumulative':>11}")
+        for name, self_s, cumulative, _ in sorted(rows, key=lambda r: r[key], reverse=True)[:top]:
+            print(f"{name:<44} {fmt_seconds(self_s):>10} {fmt_seconds(cumulative):>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10, help="fresh interpreters per measurement")
+    parser.add_argument("--only", nargs="*", help="run measurements whose name contains any of these")
+    parser.add_argument("--importtime", action="store_true", help="print the -X importtime profile instead")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save", metavar="NAME", help="write results to benchmarks/results/startup-NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against a saved run (name or path)")
+    args = parser.parse_args()
+
+    if args.importtime:
+        print_import_profile(import_profile(), args.top)
+        return
+
+    results, loaded = measure(args.rounds, args.only)
+    print(f"{'measurement':<24} {'p50':>10} {'p95':>10}  loaded")
+    for name, stats in results.items():
+        print(f"{name:<24} {fmt_seconds(stats['p50']):>10} {fmt_seconds(stats['p95']):>10}  {', '.join(loaded[name]) or '-'}")
+    if args.save:
+        print("saved", save_results(args.save, "startup", results, vars(args)))
+    if args.compare:
+        print_comparison(results, load_results(args.compare, "startup"))
+
+if __name__ == "__main__":
+    main()
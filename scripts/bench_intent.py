@@ -0,0 +1,276 @@
+# scripts/bench_intent.py
+"""
+Equivalence check + micro-benchmark for backend.scan_message, plus a
+few expected / rejected semantic fallback matches (analyze_message).
+
+Replays the baseline keyword corpus (every phrase the INTENT_KEYWORDS /
+EXPAND_KEYWORDS patterns match, alone and around every role name and
+alias), a large generated corpus and any saved sessions under
+data/sessions/ through the original per-pattern implementations of
+get_intent / extract_role_from_text / user_wants_expansion and through
+the single-pass matcher, reports every disagreement and the timings.
+
+One difference is intended: the old role lookup was a plain substring
+test, so aliases also matched inside other words ("smle", "html
+engineer" -> Machine Learning Engineer). Roles now have to start on a
+word boundary; those messages are counted separately, not as mismatches.
+
+    python scripts/bench_intent.py --n 200000
+    python scripts/bench_intent.py --check      # equivalence only; exit 1 on a mismatch
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+from functools import partial
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import backend
+
+if not os.path.exists(backend.DATA_PATH):
+    # synthetic placeholder roles, enough for the matcher checks
+    backend.DATA_PATH = os.path.join(backend.BASE_DIR, "benchmarks", "fixtures", "sample_role_skill_map.json")
+from backend import INTENT_KEYWORDS, EXPAND_KEYWORDS, ROLE_ALIASES, ROLE_DATA
+from phrase_matcher import expand_keyword_pattern
+from role_index import RoleIndex
+
+# ---------------------------------------
+# Original implementations (reference)
+# ---------------------------------------
+LEGACY_PATTERNS = {
+    intent: [re.compile(pat, flags=re.IGNORECASE) for pat in patterns]
+    for intent, patterns in INTENT_KEYWORDS.items()
+}
+
+def legacy_get_intent(message):
+    msg = (message or "").strip()
+    if not msg:
+        return "general"
+    for pat in LEGACY_PATTERNS["compare_roles"]:
+        if pat.search(msg):
+            return "compare_roles"
+    # added after the original loops, ranked right below compare_roles
+    for pat in LEGACY_PATTERNS["skill_roles"]:
+        if pat.search(msg):
+            return "skill_roles"
+    for pat in LEGACY_PATTERNS["resume_tip"]:
+        if pat.search(msg):
+            return "resume_tip"
+    for intent in ["skills_needed", "roadmap", "projects", "role_info"]:
+        for pat in LEGACY_PATTERNS[intent]:
+            if pat.search(msg):
+                return intent
+    return "general"
+
+def legacy_extract_role(message, word_start=False):
+    """The old substring lookup; `word_start` skips hits inside a word (the intended change)."""
+    msg = (message or "").lower()
+    found = (lambda name: re.search(r"(?<!\w)" + re.escape(name), msg)) if word_start else (lambda name: name in msg)
+    for alias, full_role in ROLE_ALIASES.items():
+        if found(alias):
+            return full_role
+    for role in ROLE_DATA.keys():
+        if found(role.lower()):
+            return role
+    return None
+
+def legacy_wants_expansion(message):
+    return bool(EXPAND_KEYWORDS.search(message or ""))
+
+# ---------------------------------------
+# Corpus
+# ---------------------------------------
+TEMPLATES = [
+    "What skills are needed for {role}?",
+    "what skills do I need",
+    "Give me the roadmap for {role}",
+    "Project ideas for {role}",
+    "Explain the role of {role}",
+    "Difference between {role} and {role2}",
+    "{role} vs {role2}",
+    "{role} versus {role2} - which is better?",
+    "Give me resume tips for {role}",
+    "How to write a resume",
+    "how to start as a {role}",
+    "steps to become {role}",
+    "Can you explain {role} in more detail?",
+    "Why should I become a {role}?",
+    "what is a {role}",
+    "who is a {role} and what is their job role",
+    "required skills and competencies for {role}",
+    "learning path for {role}, elaborate please",
+    "build a portfolio project for {role}",
+    "project suggestions for {role}",
+    "cover letter for {role}",
+    "get started with {role} projects",
+    "hello",
+    "thanks!",
+    "tell me about salaries for {role}",
+]
+NOISE = ["please", "asap", "pls", "I am a student", "in 2024", "for beginners", ":)", "??", "thx"]
+
+def keyword_corpus():
+    """Every literal keyword phrase, alone, around each role name / alias and glued to a word."""
+    phrases = [p for patterns in INTENT_KEYWORDS.values() for pat in patterns for p in expand_keyword_pattern(pat)]
+    phrases += expand_keyword_pattern(EXPAND_KEYWORDS.pattern)
+    names = list(ROLE_ALIASES) + list(ROLE_DATA)
+    corpus = []
+    for phrase in phrases:
+        corpus += [phrase, phrase.upper(), f"{phrase}?", f"x{phrase}", f"{phrase}s"]
+        for name in names:
+            corpus += [f"{phrase} {name}", f"{name} {phrase}", f"{phrase} s{name}"]
+    return corpus
+
+def build_corpus(n, seed=0):
+    rng = random.Random(seed)
+    names = list(ROLE_DATA.keys()) + list(ROLE_ALIASES.keys()) + ["data science", "cybersecurity", "Doctor"]
+    corpus = []
+    for _ in range(n):
+        msg = rng.choice(TEMPLATES).format(role=rng.choice(names), role2=rng.choice(names))
+        if rng.random() < 0.3:
+            msg = msg + " " + rng.choice(NOISE)
+        r = rng.random()
+        if r < 0.2:
+            msg = msg.upper()
+        elif r < 0.4:
+            msg = msg.lower()
+        corpus.append(msg)
+    return corpus
+
+# semantic fallback (analyze_message): paraphrases it should resolve, and
+# messages that only share a skill or a generic word with a role (None)
+SEMANTIC_CASES = [
+    ("skills for a machine learning person", "Machine Learning Engineer"),
+    ("roadmap for cloud stuff", "Cloud Engineer"),
+    ("how do i become a scientist of data", "Data Scientist"),
+    ("projects for a devops guy", "DevOps Engineer"),
+    ("roadmap for learning linux", None),
+    ("roadmap for learning python", None),
+    ("what is kubernetes", None),
+    ("how do i become an engineer", None),
+    ("learning path for security work", None),
+    ("skills for a plumber", None),
+]
+
+def session_messages():
+    pattern = os.path.join(backend.BASE_DIR, "data", "sessions", "*.json")
+    for path in glob.glob(pattern):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for msg in json.load(f):
+                    if msg.get("role") == "user":
+                        yield msg.get("content", "")
+        except (OSError, ValueError):
+            continue
+
+def bench_role_catalogue(corpus, n_roles, seed=0):
+    """Role lookup cost as the catalogue grows: linear scan vs RoleIndex."""
+    rng = random.Random(seed)
+    words = ["data", "cloud", "security", "platform", "product", "quantum", "mobile", "game",
+             "embedded", "robotics", "network", "research", "solutions", "support", "site"]
+    kinds = ["engineer", "analyst", "developer", "architect", "scientist", "designer", "manager"]
+    roles = list(ROLE_DATA.keys())
+    while len(roles) < n_roles:
+        roles.append(f"{rng.choice(words).title()} {rng.choice(words).title()} {rng.choice(kinds).title()} {len(roles)}")
+
+    index = RoleIndex(roles, ROLE_ALIASES)
+    lowered = [r.lower() for r in roles]
+
+    def linear(msg):
+        low = msg.lower()
+        for alias, role in ROLE_ALIASES.items():
+            if alias in low:
+                return role
+        for role, name in zip(roles, lowered):
+            if name in low:
+                return role
+        return None
+
+    sample = corpus[:20000]
+    start = time.perf_counter()
+    for msg in sample:
+        linear(msg)
+    linear_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for msg in sample:
+        index.find_role(msg)
+    index_s = time.perf_counter() - start
+
+    per_msg = lambda s: s / len(sample) * 1e6
+    print(f"roles={n_roles:>6}: linear {per_msg(linear_s):8.2f} us/msg | RoleIndex {per_msg(index_s):6.2f} us/msg")
+
+# ---------------------------------------
+# Run
+# ---------------------------------------
+def check_equivalence(corpus):
+    """Print disagreements with the old loops; returns (mismatches, mid-word role hits dropped)."""
+    mismatches = mid_word = 0
+    for msg in corpus:
+        got = backend.scan_message(msg.strip())
+        want = (legacy_get_intent(msg), legacy_wants_expansion(msg), legacy_extract_role(msg, word_start=True))
+        if (got.intent, got.wants_expansion, got.role) != want:
+            mismatches += 1
+            if mismatches <= 20:
+                print(f"  MISMATCH {msg!r}: new={tuple(got)} old={want}")
+        elif legacy_extract_role(msg) != want[2]:
+            mid_word += 1
+    return mismatches, mid_word
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000, help="generated messages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--roles", type=int, nargs="*", default=[100, 1000, 10000],
+                        help="synthetic role catalogue sizes for the role lookup benchmark")
+    parser.add_argument("--check", action="store_true",
+                        help="only run the equivalence checks; exit status 1 on any mismatch")
+    args = parser.parse_args()
+
+    corpus = keyword_corpus() + build_corpus(args.n, args.seed) + list(session_messages())
+    print(f"corpus: {len(corpus)} messages")
+
+    mismatches, mid_word = check_equivalence(corpus)
+    print(f"mismatches: {mismatches} (plus {mid_word} mid-word role hits no longer matched, as intended)")
+
+    wrong = 0
+    for msg, want_role in SEMANTIC_CASES:
+        got = backend.analyze_message(msg)
+        if got.role != want_role:
+            wrong += 1
+            print(f"  SEMANTIC {msg!r}: role={got.role!r}, expected {want_role!r}")
+    print(f"semantic cases: {len(SEMANTIC_CASES) - wrong}/{len(SEMANTIC_CASES)} as expected")
+    if args.check:
+        sys.exit(1 if mismatches or wrong else 0)
+
+    # fresh analysis, no memoisation
+    analyze = partial(backend._scan_message, backend.current_snapshot())
+
+    start = time.perf_counter()
+    for msg in corpus:
+        legacy_get_intent(msg)
+        legacy_extract_role(msg)
+        legacy_wants_expansion(msg)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for msg in corpus:
+        analyze(msg)
+    new_s = time.perf_counter() - start
+
+    per_msg = lambda s: s / len(corpus) * 1e6
+    print(f"legacy 3-pass: {legacy_s:.3f}s ({per_msg(legacy_s):.2f} us/msg)")
+    print(f"single-pass:   {new_s:.3f}s ({per_msg(new_s):.2f} us/msg)")
+    if new_s:
+        print(f"speedup: {legacy_s / new_s:.2f}x")
+
+    for n_roles in args.roles:
+        bench_role_catalogue(corpus, n_roles, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# scripts/build_knowledge_store.py
+"""
+Compile data/role_skill_map.json (+ data/raw/*.csv|xlsx) into the
+memory-mapped role store the app reads (data/cache/role_store.bin).
+
+The app recompiles a stale store on its own; run this as a build/deploy
+step so no worker pays for it on first import.
+
+    python scripts/build_knowledge_store.py
+    python scripts/build_knowledge_store.py --no-raw --out /tmp/role_store.bin
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import knowledge_store as ks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=ks.SOURCE_PATH, help="role map JSON")
+    parser.add_argument("--raw", default=ks.RAW_DIR, help="directory of curated CSV/XLSX tables")
+    parser.add_argument("--no-raw", action="store_true", help="compile the JSON map only")
+    parser.add_argument("--out", default=ks.STORE_PATH, help="store file to write")
+    args = parser.parse_args()
+    raw_dir = None if args.no_raw else args.raw
+
+    start = time.perf_counter()
+    role_data = ks.load_sources(args.source, raw_dir)
+    paths = ks.source_files(args.source, raw_dir)
+    data = ks.compile_store(role_data, ks.stat_signature(paths), ks.content_fingerprint(paths))
+    ks.write_store(data, args.out)
+    build_s = time.perf_counter() - start
+
+    # read everything back and compare with the sources
+    store = ks.KnowledgeStore.open(args.out)
+    if store.to_dict() != role_data:
+        sys.exit("store does not round-trip the sources")
+
+    start = time.perf_counter()
+    with open(args.source, "r", encoding="utf-8") as f:
+        json.load(f)
+    json_s = time.perf_counter() - start
+    start = time.perf_counter()
+    ks.KnowledgeStore.open(args.out).close()
+    open_s = time.perf_counter() - start
+
+    print(f"sources: {', '.join(os.path.relpath(p) for p in paths)}")
+    print(f"roles: {len(store)} | fields: {', '.join(store.fields)}")
+    print(f"wrote {args.out} ({len(data) / 1024:.1f} KiB) in {build_s:.3f}s")
+    print(f"json.load: {json_s * 1e3:.2f} ms | store open: {open_s * 1e3:.2f} ms")
+    store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# scripts/precompute_answers.py
+"""
+Precompute every enumerable LLM answer into the answer pack that
+get_response serves before calling OpenRouter:
+
+    role_summary / roadmap_expansion / projects_expansion   per role
+    compare_roles                                           per ordered role pair
+
+Requests go through a bounded worker pool with a shared request-rate cap.
+When OpenRouter still answers 429/503 after call_openrouter_chat's own
+retries, every worker pauses, the rate is halved and the request is
+queued for the next round. Finished answers are appended to a checkpoint
+file right away, so an interrupted run resumes where it stopped. Calls go
+out at PRIORITY_BACKGROUND: in llm's shared scheduler they queue behind
+user-facing requests and are never shed.
+
+    python scripts/precompute_answers.py --workers 4 --rps 1
+    python scripts/precompute_answers.py --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import permutations
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import backend
+from answer_pack import PACK_PATH, read_entries, write_pack
+from llm import PRIORITY_BACKGROUND
+
+RATE_LIMIT_CODES = (429, 503, "circuit_open")   # retried next round, after the cooldown
+
+# (intent, message) per role; the message carries an expansion keyword so
+# plan_response picks the LLM template exactly as it would for a user
+ROLE_QUESTIONS = [
+    ("skills_needed", "explain the skills for {role}"),
+    ("roadmap", "explain the roadmap for {role}"),
+    ("projects", "explain project ideas for {role}"),
+]
+# without an expansion keyword a comparison is answered from the skill index
+PAIR_QUESTION = "{a} vs {b} in detail"
+
+
+# ---------------------------------------
+# Jobs
+# ---------------------------------------
+def build_jobs(max_pairs=0, templates=None):
+    """
+    Plan every answer through plan_response itself, so the pack keys are
+    the ones get_response will look up. Returns ({key: job}, skipped).
+    """
+    snapshot = backend.current_snapshot()
+    roles = list(snapshot.role_data)
+    plans = []
+    for role in roles:
+        for intent, question in ROLE_QUESTIONS:
+            plans.append((backend.plan_response(question.format(role=role), intent), {role}))
+    pairs = permutations(roles, 2)
+    for n, (a, b) in enumerate(pairs):
+        if max_pairs and n >= max_pairs:
+            break
+        plans.append((backend.plan_response(PAIR_QUESTION.format(a=a, b=b), "compare_roles"), {a, b}))
+
+    jobs, skipped = {}, 0
+    for plan, expected in plans:
+        if not plan.template_key:
+            skipped += 1
+            continue
+        # a role name containing another role's name resolves elsewhere
+        if set(v for k, v in plan.payload.items() if k.startswith("role")) != expected:
+            skipped += 1
+            continue
+        if templates and plan.template_key not in templates:
+            continue
+        max_tokens = plan.max_tokens or backend.template_max_tokens(plan.template_key, plan.payload)
+        key = backend.template_cache_key(plan.template_key, plan.payload, plan.model, max_tokens)
+        jobs[key] = {
+            "template": plan.template_key,
+            "payload": plan.payload,
+            "model": plan.model or backend.DEFAULT_MODEL,
+            "max_tokens": max_tokens,
+        }
+    return jobs, skipped
+
+
+# ---------------------------------------
+# Checkpoints
+# ---------------------------------------
+def read_checkpoint(path):
+    done = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    done[entry.pop("key")] = entry
+                except (ValueError, KeyError):
+                    continue   # torn last line from an interrupted run
+    except OSError:
+        pass
+    return done
+
+class Checkpoint:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._f = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def append(self, key, entry):
+        line = json.dumps(dict(entry, key=key), ensure_ascii=False)
+        with self._lock:
+            self._f.write(line + "\n")
+            self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+# ---------------------------------------
+# Rate limiting
+# ---------------------------------------
+class Throttle:
+    """
+    Shared pacing for all workers: at most `rps` request starts per second
+    (0 = unpaced), and a global pause after a rate-limit response.
+    """
+
+    def __init__(self, rps):
+        self.rps = rps
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+        self._paused_until = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at, self._paused_until)
+            if self.rps > 0:
+                self._next_at = start + 1.0 / self.rps
+        if start > now:
+            time.sleep(start - now)
+
+    def rate_limited(self, pause):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            if self.rps > 0:
+                self.rps = max(self.rps / 2, 0.05)
+
+
+# ---------------------------------------
+# Run
+# ---------------------------------------
+def run_round(pending, jobs, throttle, checkpoint, workers, cooldown):
+    """One pass over `pending`; returns (rate_limited_keys, failures)."""
+    retry, failures = [], {}
+    lock = threading.Lock()
+
+    def work(key):
+        job = jobs[key]
+        throttle.wait()
+        content, result = backend.call_llm_for_template(
+            job["template"], job["payload"], model=job["model"], max_tokens=job["max_tokens"],
+            use_cache=False, priority=PRIORITY_BACKGROUND,
+        )
+        if content:
+            checkpoint.append(key, dict(job, content=content))
+            return
+        with lock:
+            if result.get("code") in RATE_LIMIT_CODES:
+                retry.append(key)
+                throttle.rate_limited(cooldown)
+            else:
+                failures[key] = result.get("error") or result.get("code")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(work, pending))
+    return retry, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="concurrent requests")
+    parser.add_argument("--rps", type=float, default=1.0, help="max request starts per second (0 = unpaced)")
+    parser.add_argument("--cooldown", type=float, default=30.0, help="pause (s) after a rate-limit response")
+    parser.add_argument("--rounds", type=int, default=5, help="passes over rate-limited requests")
+    parser.add_argument("--max-pairs", type=int, default=0, help="limit compare_roles pairs (0 = all)")
+    parser.add_argument("--templates", nargs="*", help="only these templates")
+    parser.add_argument("--out", default=PACK_PATH, help="answer pack to write")
+    parser.add_argument("--refresh", action="store_true", help="ignore answers already in the pack")
+    parser.add_argument("--dry-run", action="store_true", help="list the jobs and exit")
+    args = parser.parse_args()
+
+    snapshot = backend.current_snapshot()
+    jobs, skipped = build_jobs(args.max_pairs, args.templates)
+    print(f"dataset {snapshot.fingerprint} (version {snapshot.version}): {len(jobs)} answers, {skipped} skipped")
+    if args.dry_run:
+        for key, job in jobs.items():
+            print(f"  {key[:12]} {job['template']:<20} {json.dumps(job['payload'], ensure_ascii=False)}")
+        return
+
+    # resume: answers from a pack of the same dataset, then the checkpoint
+    previous = read_entries(args.out)
+    done = {}
+    if not args.refresh and previous.get("dataset_fingerprint") == snapshot.fingerprint:
+        done.update({k: v for k, v in previous.get("entries", {}).items() if k in jobs})
+    checkpoint_path = os.path.join(backend.BASE_DIR, "data", "cache", f"answer_pack.{snapshot.fingerprint}.jsonl")
+    if args.refresh and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    done.update({k: v for k, v in read_checkpoint(checkpoint_path).items() if k in jobs})
+
+    pending = [key for key in jobs if key not in done]
+    print(f"resuming with {len(done)} done, {len(pending)} to go")
+
+    throttle = Throttle(args.rps)
+    checkpoint = Checkpoint(checkpoint_path)
+    failures = {}
+    started = time.perf_counter()
+    try:
+        for n in range(1, args.rounds + 1):
+            if not pending:
+                break
+            pending, round_failures = run_round(pending, jobs, throttle, checkpoint, args.workers, args.cooldown)
+            failures.update(round_failures)
+            print(f"round {n}: {len(pending)} rate-limited, {len(failures)} failed, rps now {throttle.rps:g}")
+    except KeyboardInterrupt:
+        print("interrupted; progress is checkpointed, run again to resume")
+    finally:
+        checkpoint.close()
+
+    done.update({k: v for k, v in read_checkpoint(checkpoint_path).items() if k in jobs})
+    version = int(previous.get("version", 0)) + 1
+    write_pack(done, snapshot.fingerprint, version, args.out)
+    print(f"wrote {args.out}: version {version}, {len(done)}/{len(jobs)} answers in {time.perf_counter() - started:.1f}s")
+
+    missing = len(jobs) - len(done)
+    if missing:
+        for key, error in list(failures.items())[:10]:
+            print(f"  failed {jobs[key]['template']} {jobs[key]['payload']}: {error}")
+        sys.exit(f"{missing} answers missing; run again to resume")
+    os.remove(checkpoint_path)
+
+if __name__ == "__main__":
+    main()
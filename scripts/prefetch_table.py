@@ -0,0 +1,97 @@
+# scripts/prefetch_table.py
+"""
+Learn the prefetcher's transition table from saved chat sessions.
+
+For every user message the current backend resolves intent and role
+(plan_response, follow-ups included, no LLM calls); a transition
+`a -> b` is counted when the next user message of the same session
+asks `b` about the same role. P(b | a) = transitions / answered `a`.
+The table goes to data/prefetch_transitions.json, which the prefetcher
+(CHATBOT_PREFETCH=1) loads instead of its built-in defaults.
+
+    python scripts/prefetch_table.py --since 2025-01-01
+    python scripts/prefetch_table.py --min-count 50 --dry-run
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import backend
+from conversation import ConversationState
+from prefetch import DEFAULT_TRANSITIONS, TRANSITIONS_PATH, TransitionTable
+from session_store import SESSIONS_DB, SessionStore
+
+
+def count_transitions(turns: Iterable[Dict]) -> Tuple[Counter, Counter, int]:
+    """(pairs, totals, user messages) from turns in time order."""
+    pairs: Counter = Counter()
+    totals: Counter = Counter()
+    # per session: (intent, role) of the previous user message; intent is
+    # None after a turn without a role, which still leaves the role to refer to
+    last: Dict[str, Tuple[Optional[str], str]] = {}
+    messages = 0
+    for turn in turns:
+        if turn["role"] != "user":
+            continue
+        messages += 1
+        message = (turn["content"] or "").strip()
+        sid = turn["session_id"]
+        prev = last.get(sid)
+        state = ConversationState()
+        if prev:
+            state.last_intent, state.last_role = prev
+        plan = backend.plan_response(message, backend.get_intent(message), state)
+        if not plan.role:
+            if prev:
+                last[sid] = (None, prev[1])
+            continue
+        totals[plan.intent] += 1
+        if prev and prev[0] and prev[1] == plan.role:
+            pairs[(prev[0], plan.intent)] += 1
+        last[sid] = (plan.intent, plan.role)
+    return pairs, totals, messages
+
+def parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").timestamp() if value else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=SESSIONS_DB, help="session database")
+    parser.add_argument("--since", help="YYYY-MM-DD")
+    parser.add_argument("--until", help="YYYY-MM-DD (exclusive)")
+    parser.add_argument("--min-count", type=int, default=20, help="answered turns an intent needs to get learned transitions")
+    parser.add_argument("--out", default=TRANSITIONS_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="print the table without writing it")
+    args = parser.parse_args()
+
+    store = SessionStore(args.db)
+    if not store.enabled:
+        sys.exit(f"cannot open {args.db}")
+    try:
+        pairs, totals, messages = count_transitions(store.iter_turns(parse_day(args.since), parse_day(args.until)))
+    finally:
+        store.close()
+
+    table = TransitionTable.from_counts(pairs, totals, args.min_count)
+    learned = table.to_dict()
+    # intents without enough data keep their default row
+    for intent, nexts in DEFAULT_TRANSITIONS.items():
+        if totals.get(intent, 0) < args.min_count:
+            learned[intent] = dict(nexts)
+    table = TransitionTable(learned, source="learned")
+
+    print(f"{messages} user messages, {sum(totals.values())} answered for a role")
+    for intent, nexts in sorted(table.transitions.items()):
+        shown = ", ".join(f"{nxt} {p:.2f}" for nxt, p in nexts) or "-"
+        print(f"  {intent:<14} n={totals.get(intent, 0):<7} -> {shown}")
+    if not args.dry_run:
+        table.save(args.out, messages=messages, answered=dict(totals), min_count=args.min_count)
+        print("saved", args.out)
+
+if __name__ == "__main__":
+    main()
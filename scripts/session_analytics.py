@@ -0,0 +1,260 @@
+# scripts/session_analytics.py
+"""
+Aggregate saved chat sessions into Parquet tables that show what users
+actually ask:
+
+    intents.parquet       intent, messages, semantic (resolved by the semantic fallback), share
+    roles.parquet         role, intent, messages
+    unresolved.parquet    message, intent, reason, count   (no role found / general LLM branch)
+    llm_outcomes.parquet  template, intent, attempts, llm, fallback, fallback_rate
+
+Turns are streamed from the session store (and old JSON exports) and
+processed `--chunk` rows at a time with pandas: each distinct user
+message is classified once per chunk with the current backend
+(analyze_message + plan_response, no LLM calls), and the per-chunk
+counts are merged into running totals, so memory depends on the chunk
+size and the number of distinct intents / roles, not on the number of
+messages. Unresolved messages are kept as a bounded top-N.
+
+Use the tables to pick aliases to add (unresolved.parquet) and answers
+worth precomputing (llm_outcomes.parquet).
+
+    python scripts/session_analytics.py --since 2025-01-01
+    python scripts/session_analytics.py --json data/sessions/*.json --out data/analytics
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Optional
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+import backend
+from session_store import BASE_DIR, SESSIONS_DB, SessionStore
+
+OUT_DIR = os.path.join(BASE_DIR, "data", "analytics")
+DEFAULT_CHUNK = 50_000
+DEFAULT_TOP_UNRESOLVED = 5_000
+# chunks an unanswered question is carried before its session counts as abandoned
+TAIL_CHUNKS = 2
+
+TURN_COLUMNS = ["session_id", "seq", "role", "content", "ts"]
+
+
+# ---------------------------------------
+# Sources (generators of turn dicts)
+# ---------------------------------------
+def store_turns(path: str, since: Optional[float], until: Optional[float]) -> Iterator[Dict]:
+    store = SessionStore(path)
+    if not store.enabled:
+        return
+    try:
+        yield from store.iter_turns(since, until)
+    finally:
+        store.close()
+
+def json_turns(paths: Iterable[str]) -> Iterator[Dict]:
+    """Old one-file-per-save exports; the file name is the session id."""
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                messages = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(messages, list):
+            continue
+        sid = "file:" + os.path.splitext(os.path.basename(path))[0]
+        ts = os.path.getmtime(path)
+        for seq, msg in enumerate(m for m in messages if isinstance(m, dict)):
+            yield {"session_id": sid, "seq": seq, "role": msg.get("role", ""),
+                   "content": msg.get("content", ""), "ts": msg.get("ts") or ts}
+
+def chunks(turns: Iterator[Dict], size: int) -> Iterator[pd.DataFrame]:
+    while True:
+        rows = list(islice(turns, size))
+        if not rows:
+            return
+        yield pd.DataFrame.from_records(rows, columns=TURN_COLUMNS)
+
+
+# ---------------------------------------
+# Classification
+# ---------------------------------------
+def classify(messages: Iterable[str]) -> pd.DataFrame:
+    """One row per distinct message: what the backend would do with it today."""
+    rows = []
+    for message in messages:
+        text = (message or "").strip()
+        analysis = backend.analyze_message(text)
+        template, fallback = None, ""   # blank turns never reach the backend
+        if text:
+            plan = backend.plan_response(text, analysis.intent)
+            template, fallback = plan.template_key, plan.fallback.strip()
+        if analysis.intent in backend.ROLE_SPECIFIC_INTENTS and not analysis.role:
+            reason = "no_role"
+        elif analysis.intent == "general":
+            reason = "general"
+        else:
+            reason = None
+        rows.append((
+            message, analysis.intent, analysis.role, analysis.semantic, reason,
+            template, (fallback if template else ""),
+        ))
+    return pd.DataFrame(rows, columns=["content", "intent", "role_name", "semantic", "reason", "template", "fallback"])
+
+
+def _answered_with_fallback(replies: pd.Series, fallbacks: pd.Series) -> pd.Series:
+    """Reply ends with the plan's no-LLM fallback text."""
+    return pd.Series(
+        [bool(fb) and isinstance(r, str) and r.rstrip().endswith(fb) for r, fb in zip(replies, fallbacks)],
+        index=replies.index,
+    )
+
+
+# ---------------------------------------
+# Aggregation
+# ---------------------------------------
+class Totals:
+    """Running counts merged chunk by chunk."""
+
+    def __init__(self, top_unresolved: int):
+        self.top_unresolved = top_unresolved
+        self.intents: Optional[pd.DataFrame] = None
+        self.roles: Optional[pd.Series] = None
+        self.unresolved: Optional[pd.Series] = None
+        self.outcomes: Optional[pd.DataFrame] = None
+        self.messages = 0
+        self.turns = 0
+        # sessions whose last turn so far is a question still waiting for
+        # its reply (so a reply in the next chunk is still paired), with the
+        # number of chunks each has been carried
+        self._tail = pd.DataFrame(columns=TURN_COLUMNS + ["carried"])
+
+    @staticmethod
+    def _merge(total, part):
+        return part if total is None else total.add(part, fill_value=0)
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        self.turns += len(chunk)
+        carried = len(self._tail)
+        frame = pd.concat([self._tail, chunk], ignore_index=True) if carried else chunk.reset_index(drop=True)
+        frame = frame.sort_values(["session_id", "seq"], kind="stable")
+        last = frame.groupby("session_id", sort=False).tail(1)
+        # answered sessions need nothing carried; unanswered ones age out
+        last = last[last["role"] == "user"]
+        age = last["carried"].fillna(-1) + 1 if "carried" in last else pd.Series(0, index=last.index)
+        self._tail = last.assign(carried=age)[age < TAIL_CHUNKS]
+
+        prev = frame.groupby("session_id", sort=False)[["role", "content"]].shift(1)
+        # assistant replies of this chunk, paired with the question before them
+        replies = frame[(frame["role"] == "assistant") & (prev["role"] == "user") & (frame.index >= carried)]
+        pairs = pd.DataFrame({"content": prev.loc[replies.index, "content"], "reply": replies["content"]})
+        users = chunk[chunk["role"] == "user"]
+        self.messages += len(users)
+
+        info = classify(pd.unique(pd.concat([users["content"], pairs["content"]])))
+        if not users.empty:
+            self._add_questions(users[["content"]].merge(info, on="content", how="left"))
+        if not pairs.empty:
+            self._add_outcomes(pairs.merge(info, on="content", how="left"))
+
+    def _add_questions(self, asked: pd.DataFrame) -> None:
+        # intent frequency (and how many only the semantic fallback resolved)
+        intents = asked.groupby("intent").agg(messages=("content", "size"), semantic=("semantic", "sum"))
+        self.intents = self._merge(self.intents, intents)
+
+        roles = asked.dropna(subset=["role_name"]).groupby(["role_name", "intent"]).size()
+        self.roles = self._merge(self.roles, roles)
+
+        unresolved = asked.dropna(subset=["reason"])
+        if not unresolved.empty:
+            key = unresolved["content"].str.strip().str.lower()
+            counts = unresolved.assign(content=key).groupby(["content", "intent", "reason"]).size()
+            self.unresolved = self._merge(self.unresolved, counts)
+            if len(self.unresolved) > 2 * self.top_unresolved:
+                # keep memory bounded: the long tail of one-off questions goes
+                self.unresolved = self.unresolved.nlargest(self.top_unresolved)
+
+    def _add_outcomes(self, pairs: pd.DataFrame) -> None:
+        pairs = pairs.dropna(subset=["template"])
+        if pairs.empty:
+            return
+        pairs = pairs.assign(fallback_used=_answered_with_fallback(pairs["reply"], pairs["fallback"]))
+        outcomes = pairs.groupby(["template", "intent"]).agg(
+            attempts=("reply", "size"), fallback=("fallback_used", "sum")
+        )
+        self.outcomes = self._merge(self.outcomes, outcomes)
+
+    # -- results -------------------------------------------------------
+    def tables(self) -> Dict[str, pd.DataFrame]:
+        out = {
+            "intents": pd.DataFrame(columns=["intent", "messages", "semantic", "share"]),
+            "roles": pd.DataFrame(columns=["role", "intent", "messages"]),
+            "unresolved": pd.DataFrame(columns=["message", "intent", "reason", "count"]),
+            "llm_outcomes": pd.DataFrame(columns=["template", "intent", "attempts", "llm", "fallback", "fallback_rate"]),
+        }
+        if self.intents is not None:
+            intents = self.intents.astype("int64").sort_values("messages", ascending=False).reset_index()
+            intents["share"] = intents["messages"] / max(1, self.messages)
+            out["intents"] = intents
+        if self.roles is not None and len(self.roles):
+            out["roles"] = (
+                self.roles.astype("int64").rename("messages").sort_values(ascending=False)
+                .rename_axis(["role", "intent"]).reset_index()
+            )
+        if self.unresolved is not None:
+            out["unresolved"] = (
+                self.unresolved.nlargest(self.top_unresolved).astype("int64").rename("count")
+                .rename_axis(["message", "intent", "reason"]).reset_index()
+            )
+        if self.outcomes is not None:
+            outcomes = self.outcomes.astype("int64").reset_index()
+            outcomes["llm"] = outcomes["attempts"] - outcomes["fallback"]
+            outcomes["fallback_rate"] = outcomes["fallback"] / outcomes["attempts"].clip(lower=1)
+            out["llm_outcomes"] = outcomes.sort_values("attempts", ascending=False)[out["llm_outcomes"].columns]
+        return out
+
+
+def parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").timestamp() if value else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=SESSIONS_DB, help="session database ('' to skip)")
+    parser.add_argument("--json", nargs="*", default=[], help="old JSON session exports to include")
+    parser.add_argument("--since", help="YYYY-MM-DD")
+    parser.add_argument("--until", help="YYYY-MM-DD (exclusive)")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="turns per processing chunk")
+    parser.add_argument("--top-unresolved", type=int, default=DEFAULT_TOP_UNRESOLVED)
+    parser.add_argument("--out", default=OUT_DIR, help="output directory for the Parquet tables")
+    args = parser.parse_args()
+
+    def turns() -> Iterator[Dict]:
+        if args.db:
+            yield from store_turns(args.db, parse_day(args.since), parse_day(args.until))
+        yield from json_turns(args.json)
+
+    started = time.perf_counter()
+    totals = Totals(args.top_unresolved)
+    for chunk in chunks(turns(), args.chunk):
+        totals.add(chunk)
+
+    os.makedirs(args.out, exist_ok=True)
+    tables = totals.tables()
+    for name, table in tables.items():
+        table.to_parquet(os.path.join(args.out, f"{name}.parquet"), engine="pyarrow", index=False)
+
+    print(f"{totals.turns} turns, {totals.messages} user messages in {time.perf_counter() - started:.1f}s -> {args.out}")
+    for name, table in tables.items():
+        print(f"\n{name} ({len(table)} rows)")
+        if len(table):
+            print(table.head(10).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
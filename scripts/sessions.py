@@ -0,0 +1,77 @@
+# scripts/sessions.py
+"""
+Inspect and maintain the chat session store (data/sessions/sessions.sqlite3).
+
+    python scripts/sessions.py list --since 2025-01-01 --limit 20
+    python scripts/sessions.py show <session id>
+    python scripts/sessions.py import data/sessions/*.json   # old one-file-per-save exports
+    python scripts/sessions.py compact --max-age-days 180
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from session_store import SESSIONS_DB, SESSIONS_DIR, SessionStore
+
+
+def parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").timestamp() if value else None
+
+def fmt_time(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+def _wal_size(path):
+    wal = path + "-wal"
+    return os.path.getsize(wal) if os.path.exists(wal) else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=SESSIONS_DB, help="session database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="sessions updated in a date range, newest first")
+    p.add_argument("--since", help="YYYY-MM-DD")
+    p.add_argument("--until", help="YYYY-MM-DD (exclusive)")
+    p.add_argument("--limit", type=int, default=50)
+
+    p = sub.add_parser("show", help="print one session as JSON")
+    p.add_argument("session_id")
+
+    p = sub.add_parser("import", help="load old JSON session files")
+    p.add_argument("files", nargs="*", help=f"default: {SESSIONS_DIR}/*.json")
+
+    p = sub.add_parser("compact", help="drop old sessions, checkpoint the WAL, vacuum")
+    p.add_argument("--max-age-days", type=float)
+
+    sub.add_parser("stats")
+    args = parser.parse_args()
+
+    store = SessionStore(args.db)
+    if not store.enabled:
+        sys.exit(f"cannot open {args.db}")
+    try:
+        if args.command == "list":
+            for s in store.sessions(parse_day(args.since), parse_day(args.until), args.limit):
+                print(f"{s['id']:<34} {fmt_time(s['created'])}  {fmt_time(s['updated'])}  {s['turns']:>5} turns")
+        elif args.command == "show":
+            print(json.dumps(store.get(args.session_id), indent=2, ensure_ascii=False))
+        elif args.command == "import":
+            files = args.files or sorted(glob.glob(os.path.join(SESSIONS_DIR, "*.json")))
+            print(f"imported {store.import_json(files)} of {len(files)} files")
+        elif args.command == "compact":
+            before = os.path.getsize(args.db) + _wal_size(args.db)
+            result = store.compact(args.max_age_days)
+            after = os.path.getsize(args.db) + _wal_size(args.db)
+            print(f"removed {result['sessions_removed']} sessions, {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB")
+        elif args.command == "stats":
+            print(json.dumps(store.stats(), indent=2))
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,22 @@ import os
 import sys
 sys.path.append("app")
 
-from llm import call_openrouter_chat
+from llm import call_openrouter_chat, get_client
 
 messages = [
     {"role": "system", "content": "You are a helpful assistant that provides short, structured career advice."},
     {"role": "user", "content": "Give me 3 short project ideas for a Cloud Engineer beginner."}
 ]
 
-resp = call_openrouter_chat(messages)
+client = get_client()
+
+resp = call_openrouter_chat(messages, client=client)
 print(resp)
+print("\n== TIMING (cold) ===\n", resp.get("timing"))
+
+# second call reuses the pooled keep-alive connection
+resp_warm = call_openrouter_chat(messages, client=client)
+print("\n== TIMING (warm) ===\n", resp_warm.get("timing"))
 if resp.get("ok"):
     print("\n== ASSISTANT ===\n", resp["content"])
 else: